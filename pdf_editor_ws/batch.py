@@ -0,0 +1,273 @@
+# batch.py
+"""
+Run many page-operation jobs across a pool of worker processes.
+
+A manifest is a JSON file with a list of jobs (relative paths are
+relative to the manifest):
+
+    {
+      "jobs": [
+        {"id": "inv-001", "input": "in/inv-001.pdf",
+         "merge": ["cover.pdf"],
+         "operations": ["select 2-3", "rotate 90"],
+         "output": "out/inv-001.pdf"},
+        ...
+      ]
+    }
+
+"operations" uses the operation script syntax of cli.py. "merge" files
+are appended after the input and "output" saves all pages at the end;
+both are shorthands for the matching operations. "flatten" is true,
+or flattening options such as {"dpi": 200, "colorspace": "gray"} (see
+pdf_operations.FlattenOptions); "optimize": true stores objects the
+written pages share only once. Each job runs on its own: a failing
+job is retried and then reported, it never stops the batch.
+
+    python batch.py manifest.json --workers 8 --retries 1
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from document_model import Document, DocumentPool
+import cli
+import edit_mode.pdf_operations as pdf_ops
+
+# Handles are kept open across the jobs a worker runs, so jobs that
+# share an input (a cover page, a letterhead...) do not reopen it.
+_worker_pool = None
+
+
+class JobResult:
+    def __init__(self, job_id, ok, pages=0, seconds=0.0, attempts=1, error=None):
+        self.job_id = job_id
+        self.ok = ok
+        self.pages = pages
+        self.seconds = seconds
+        self.attempts = attempts
+        self.error = error
+
+    def to_dict(self):
+        return {
+            "id": self.job_id,
+            "ok": self.ok,
+            "pages": self.pages,
+            "seconds": round(self.seconds, 4),
+            "attempts": self.attempts,
+            "error": self.error,
+        }
+
+
+class BatchSummary:
+    def __init__(self, results, wall_seconds, workers):
+        self.results = results
+        self.wall_seconds = wall_seconds
+        self.workers = workers
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    def to_dict(self):
+        pages = sum(r.pages for r in self.results)
+        wall = self.wall_seconds or 1e-9
+        return {
+            "jobs": len(self.results),
+            "succeeded": len(self.results) - len(self.failed),
+            "failed": len(self.failed),
+            "pages_written": pages,
+            "workers": self.workers,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "jobs_per_second": round(len(self.results) / wall, 2),
+            "pages_per_second": round(pages / wall, 2),
+            "results": [r.to_dict() for r in self.results],
+        }
+
+
+# ---------------------------
+# Manifest
+# ---------------------------
+def load_manifest(path):
+    """Read a manifest and return its jobs with paths made absolute."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    jobs = data["jobs"] if isinstance(data, dict) else data
+    base = os.path.dirname(os.path.abspath(path))
+    return [_prepare_job(job, number, base) for number, job in enumerate(jobs, 1)]
+
+
+def _prepare_job(job, number, base):
+    def resolve(p):
+        return p if os.path.isabs(p) else os.path.join(base, p)
+
+    if "input" not in job:
+        raise ValueError(f"job {number} has no input")
+
+    operations = []
+    for path in job.get("merge", []):
+        operations.append(("merge", [resolve(path), "end"]))
+    for line in job.get("operations", []):
+        operations += cli.parse_script([line])
+    if "output" in job:
+        operations.append(("save", [job["output"]]))
+
+    # Files named in operations are relative to the manifest too
+    operations = [
+        (name, [resolve(args[0])] + args[1:]) if name in ("export", "save", "merge") and args
+        else (name, args)
+        for name, args in operations
+    ]
+    return {
+        "id": str(job.get("id", number)),
+        "input": resolve(job["input"]),
+        "operations": operations,
+        # true, or flattening options, e.g. {"dpi": 200, "colorspace": "gray"}
+        "flatten": pdf_ops.FlattenOptions.from_value(job.get("flatten", False)),
+        "optimize": bool(job.get("optimize", False)),
+    }
+
+
+# ---------------------------
+# Worker side
+# ---------------------------
+def _init_worker():
+    global _worker_pool
+    _worker_pool = DocumentPool()
+
+
+def _run_job(job):
+    for name, args in job["operations"]:
+        if name in ("export", "save") and args:
+            os.makedirs(os.path.dirname(os.path.abspath(args[0])), exist_ok=True)
+
+    document = Document(job["input"], pool=_worker_pool)
+    try:
+        return cli.run_operations(document, job["operations"], rasterize=job["flatten"],
+                                  optimize=job["optimize"])
+    finally:
+        document.close()
+
+
+def _run_chunk(jobs, retries):
+    """Run a chunk of jobs in one worker, isolating each job's errors."""
+    results = []
+    for job in jobs:
+        started = time.perf_counter()
+        for attempt in range(1, retries + 2):
+            try:
+                pages = _run_job(job)
+            except Exception as exc:  # noqa: BLE001 - reported per job
+                error = f"{type(exc).__name__}: {exc}"
+                # A broken handle must not poison the retry
+                _worker_pool.close(job["input"])
+                continue
+            results.append(JobResult(job["id"], True, pages,
+                                     time.perf_counter() - started, attempt))
+            break
+        else:
+            results.append(JobResult(job["id"], False, 0,
+                                     time.perf_counter() - started, attempt, error))
+    return results
+
+
+# ---------------------------
+# Scheduler
+# ---------------------------
+def _chunks(jobs, workers, chunk_size=None):
+    # Jobs on the same input end up next to each other, and so mostly in
+    # the same chunk and worker, where the open handle is reused.
+    ordered = sorted(jobs, key=lambda job: job["input"])
+    if chunk_size is None:
+        chunk_size = max(1, min(16, len(ordered) // (workers * 4)))
+    return [ordered[i:i + chunk_size] for i in range(0, len(ordered), chunk_size)]
+
+
+def run_batch(jobs, workers=None, retries=1, chunk_size=None, progress=None) -> BatchSummary:
+    """
+    Execute jobs on a process pool and return a BatchSummary.
+
+    progress, if given, is called in this process as
+    progress(done, total, result) after every finished job.
+    If a worker process dies, its chunk is rerun one job at a time so
+    that only the job that crashes it is reported as failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+    results = []
+    pending = deque(_chunks(jobs, workers, chunk_size))
+
+    while pending:
+        crashed = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = {executor.submit(_run_chunk, chunk, retries): chunk for chunk in pending}
+            pending.clear()
+            for future in as_completed(futures):
+                try:
+                    chunk_results = future.result()
+                except BrokenProcessPool:
+                    crashed.append(futures[future])
+                    continue
+                for result in chunk_results:
+                    results.append(result)
+                    if progress:
+                        progress(len(results), len(jobs), result)
+
+        for chunk in crashed:
+            if len(chunk) > 1:
+                pending.extend([job] for job in chunk)
+                continue
+            result = JobResult(chunk[0]["id"], False, error="worker process crashed")
+            results.append(result)
+            if progress:
+                progress(len(results), len(jobs), result)
+
+    return BatchSummary(results, time.perf_counter() - started, workers)
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="pdf-editor batch",
+        description="Run the jobs of a JSON manifest in parallel.",
+    )
+    parser.add_argument("manifest", help="JSON file with a list of jobs")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--retries", type=int, default=1,
+                        help="extra attempts for a failing job (default 1)")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="write the summary, with per-job results, as JSON")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    options = parser.parse_args(argv)
+
+    try:
+        jobs = load_manifest(options.manifest)
+    except (OSError, ValueError, KeyError) as exc:
+        parser.error(f"cannot load manifest: {exc}")
+
+    def report(done, total, result):
+        status = "ok" if result.ok else f"FAILED ({result.error})"
+        print(f"[{done}/{total}] {result.job_id}: {status} {result.seconds:.2f}s", file=sys.stderr)
+
+    summary = run_batch(jobs, workers=options.workers, retries=options.retries,
+                        progress=None if options.quiet else report)
+    data = summary.to_dict()
+    print(f"{data['succeeded']}/{data['jobs']} jobs succeeded in {data['wall_seconds']}s "
+          f"({data['jobs_per_second']} jobs/s, {data['pages_per_second']} pages/s, "
+          f"{data['workers']} workers)", file=sys.stderr)
+
+    if options.summary:
+        with open(options.summary, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
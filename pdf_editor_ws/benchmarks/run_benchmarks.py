@@ -0,0 +1,351 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks for the open, render, edit and save paths.
+
+Every case runs in its own process, on synthetic PDFs written to a
+work directory (and reused by later runs), with Qt on the offscreen
+platform. A case reports its wall time, the peak RSS of its process
+and, when it writes a PDF, the output size. Results are written as
+JSON so two versions can be compared:
+
+    python benchmarks/run_benchmarks.py -o before.json
+    python benchmarks/run_benchmarks.py -o after.json
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+
+    python benchmarks/run_benchmarks.py --quick            # up to 1,000 pages
+    python benchmarks/run_benchmarks.py -k save -k open    # cases by name
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+import synthetic  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Cases with more pages than this are left out by --quick.
+QUICK_MAX_PAGES = 1000
+# Pages rendered by the render cases, whatever the document size.
+RENDER_PAGES = 100
+
+
+# ---------------------------
+# Cases (run in the child process)
+# ---------------------------
+def _qt_app():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+def case_open(ctx):
+    from document_model import Document
+    path = ctx.pdf()
+    with ctx.timed():
+        Document(path)
+
+
+def case_metadata(ctx):
+    from document_model import Document
+    document = Document(ctx.pdf())
+    with ctx.timed():
+        for page_obj in document.pages:
+            document.page_size(page_obj)
+
+
+def case_thumbnails(ctx):
+    _qt_app()
+    from document_model import Document
+    from edit_mode.editor import render_page_thumbnail
+    document = Document(ctx.pdf())
+    pages = list(document.pages)[:RENDER_PAGES]
+    with ctx.timed():
+        for page_obj in pages:
+            render_page_thumbnail(document, page_obj)
+
+
+def case_viewer(ctx, zoom=1.0):
+    _qt_app()
+    from document_model import Document
+    from viewer import PDFViewer
+    viewer = PDFViewer()
+    viewer.document = Document(ctx.pdf())
+    viewer.zoom = zoom
+    viewer.resize(900, 700)
+    try:
+        with ctx.timed():
+            for index in range(min(RENDER_PAGES, len(viewer.document.pages))):
+                viewer.document.current_index = index
+                viewer.render_page()
+                # Tiles are rendered when painted
+                viewer.scroll.viewport().grab()
+    finally:
+        viewer.prefetcher.shutdown()
+
+
+def case_viewer_zoomed(ctx):
+    case_viewer(ctx, zoom=6.0)
+
+
+def _edit_case(operation):
+    def run(ctx):
+        from document_model import Document
+        import edit_mode.pdf_operations as pdf_ops
+        document = Document(ctx.pdf())
+        pages = list(document.pages)
+        other = ctx.pdf(seed=1) if operation == "merge" else None
+        with ctx.timed():
+            if operation == "delete":
+                pdf_ops.delete_pages(document, pages[::2])
+            elif operation == "rotate":
+                pdf_ops.rotate_pages(document, pages, 90)
+            elif operation == "duplicate":
+                pdf_ops.duplicate_pages(document, pages[::2])
+            elif operation == "merge":
+                pdf_ops.merge_pdf(document, other, len(pages) // 2)
+    return run
+
+
+def _save_case(rasterize, optimize=False):
+    def run(ctx):
+        from document_model import Document
+        import edit_mode.pdf_operations as pdf_ops
+        document = Document(ctx.pdf())
+        pdf_ops.rotate_pages(document, list(document.pages)[::3], 90)
+        output = ctx.output()
+        with ctx.timed():
+            # What PDFEditor's save job does once a file name is chosen
+            pdf_ops.write_pages(document, document.pages, output, rasterize=rasterize,
+                                optimize=optimize)
+        ctx.result["output_bytes"] = os.path.getsize(output)
+    return run
+
+
+def case_merge_sources(ctx, sources=40):
+    """Merge many files into one document, then save it."""
+    from document_model import Document
+    import edit_mode.pdf_operations as pdf_ops
+    per_file = max(1, ctx.pages // sources)
+    paths = [ctx.pdf(pages=per_file, seed=seed) for seed in range(sources)]
+    output = ctx.output()
+    with ctx.timed():
+        document = Document(paths[0])
+        for path in paths[1:]:
+            pdf_ops.merge_pdf(document, path)
+        pdf_ops.save_pages(document, document.pages, output)
+    ctx.result["output_bytes"] = os.path.getsize(output)
+
+
+# name -> (function, kind, page counts)
+CASES = {
+    "open": (case_open, "text", [10, 1000, 50000]),
+    "metadata": (case_metadata, "text", [1000, 50000]),
+    "thumbnails-text": (case_thumbnails, "text", [1000]),
+    "thumbnails-image": (case_thumbnails, "image", [100]),
+    "viewer-text": (case_viewer, "text", [1000]),
+    "viewer-image": (case_viewer, "image", [100]),
+    "viewer-zoomed": (case_viewer_zoomed, "image", [10]),
+    "delete": (_edit_case("delete"), "text", [1000, 50000]),
+    "rotate": (_edit_case("rotate"), "text", [1000, 50000]),
+    "duplicate": (_edit_case("duplicate"), "text", [1000, 50000]),
+    "merge": (_edit_case("merge"), "text", [1000, 50000]),
+    "save-text": (_save_case(False), "text", [10, 1000, 50000]),
+    "save-image": (_save_case(False), "image", [100, 1000]),
+    "save-image-optimized": (_save_case(False, optimize=True), "image", [100, 1000]),
+    "save-flattened": (_save_case(True), "text", [10, 100]),
+    "merge-sources": (case_merge_sources, "text", [1000, 10000]),
+}
+
+
+class CaseContext:
+    def __init__(self, name, kind, pages, workdir):
+        self.name = name
+        self.kind = kind
+        self.pages = pages
+        self.workdir = workdir
+        self.result = {"case": name, "kind": kind, "pages": pages}
+
+    def pdf(self, pages=None, seed=0):
+        return synthetic.ensure_pdf(os.path.join(self.workdir, "inputs"), self.kind,
+                                    pages or self.pages, seed)
+
+    def output(self):
+        folder = os.path.join(self.workdir, "outputs")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"{self.name}-{self.pages}.pdf")
+
+    def timed(self):
+        return _Timer(self.result)
+
+
+class _Timer:
+    def __init__(self, result):
+        self.result = result
+
+    def __enter__(self):
+        self.result["rss_before_kb"] = _peak_rss_kb()
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.result["wall_seconds"] = time.perf_counter() - self.started
+        self.result["peak_rss_kb"] = _peak_rss_kb()
+        return False
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS
+
+
+def _run_child(name, pages, workdir):
+    function, kind, _ = CASES[name]
+    ctx = CaseContext(name, kind, pages, workdir)
+    function(ctx)
+    print(json.dumps(ctx.result))
+
+
+# ---------------------------
+# Driver
+# ---------------------------
+def _selected_cases(names, quick):
+    for name, (_, kind, sizes) in CASES.items():
+        if names and not any(n in name for n in names):
+            continue
+        for pages in sizes:
+            if quick and pages > QUICK_MAX_PAGES:
+                continue
+            yield name, kind, pages
+
+
+def run_case(name, kind, pages, workdir, repeat=1, timeout=None):
+    """Run one case in fresh processes; keep the fastest of `repeat` runs."""
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    # Inputs are written once, outside of any measured run
+    synthetic.ensure_pdf(os.path.join(workdir, "inputs"), kind, pages)
+    best = None
+    for _ in range(repeat):
+        try:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", name, str(pages),
+                 "--workdir", workdir],
+                capture_output=True, text=True, env=env, cwd=APP_DIR, timeout=timeout,
+            )
+        except subprocess.TimeoutExpired:
+            return {"case": name, "kind": kind, "pages": pages, "error": "timeout"}
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ["failed"])[-1]
+            return {"case": name, "kind": kind, "pages": pages, "error": error}
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        if best is None or result["wall_seconds"] < best["wall_seconds"]:
+            best = result
+    return best
+
+
+def environment():
+    try:
+        import fitz
+        pymupdf = fitz.VersionBind
+    except (ImportError, AttributeError):
+        pymupdf = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pymupdf": pymupdf,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(old_path, new_path):
+    """Print the change of every case found in both result files."""
+    with open(old_path, encoding="utf-8") as f:
+        old = {(r["case"], r["pages"]): r for r in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {(r["case"], r["pages"]): r for r in json.load(f)["results"]}
+
+    print(f"{'case':<20}{'pages':>7}{'old s':>10}{'new s':>10}{'change':>9}"
+          f"{'old MB':>9}{'new MB':>9}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        if "error" in a or "error" in b:
+            print(f"{key[0]:<20}{key[1]:>7}   error: {a.get('error') or b.get('error')}")
+            continue
+        change = (b["wall_seconds"] / a["wall_seconds"] - 1) * 100 if a["wall_seconds"] else 0.0
+        rss = [r["peak_rss_kb"] / 1024 if r.get("peak_rss_kb") else float("nan") for r in (a, b)]
+        print(f"{key[0]:<20}{key[1]:>7}{a['wall_seconds']:>10.3f}{b['wall_seconds']:>10.3f}"
+              f"{change:>+8.1f}%{rss[0]:>9.1f}{rss[1]:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PDF editor's hot paths.")
+    parser.add_argument("-k", dest="names", action="append", metavar="NAME",
+                        help="only cases whose name contains NAME (repeatable)")
+    parser.add_argument("--quick", action="store_true",
+                        help=f"skip cases above {QUICK_MAX_PAGES} pages")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the fastest is kept")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per run")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "pdf-editor-bench"),
+                        help="where synthetic inputs and outputs are kept")
+    parser.add_argument("-o", "--output", metavar="FILE", help="write the results as JSON")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files and exit")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "PAGES"), help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    if options.child:
+        _run_child(options.child[0], int(options.child[1]), options.workdir)
+        return 0
+    if options.compare:
+        compare(*options.compare)
+        return 0
+    if options.list:
+        for name, kind, pages in _selected_cases(options.names, options.quick):
+            print(f"{name:<20}{kind:<7}{pages:>7}")
+        return 0
+
+    results = []
+    for name, kind, pages in _selected_cases(options.names, options.quick):
+        result = run_case(name, kind, pages, options.workdir, options.repeat, options.timeout)
+        results.append(result)
+        if "error" in result:
+            print(f"{name:<20}{pages:>7}  ERROR {result['error']}", file=sys.stderr)
+        else:
+            extra = f"  {result['output_bytes'] / 1e6:.1f} MB out" if "output_bytes" in result else ""
+            rss = result.get("peak_rss_kb")
+            rss = f"{rss / 1024:8.1f} MB peak" if rss else ""
+            print(f"{name:<20}{pages:>7}  {result['wall_seconds']:9.4f} s {rss}{extra}",
+                  file=sys.stderr)
+
+    report = {"environment": environment(), "results": results}
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 1 if any("error" in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
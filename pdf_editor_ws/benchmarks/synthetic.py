@@ -0,0 +1,132 @@
+# benchmarks/synthetic.py
+"""
+Synthetic PDFs for the benchmarks.
+
+The files are written directly, object by object, instead of through
+PyMuPDF: appending tens of thousands of pages with fitz takes minutes,
+writing them takes seconds. Every page gets its own content stream.
+
+    text   60 lines of text per page (standard Helvetica, not embedded)
+    image  a full-page RGB image per page, from a set of IMAGE_VARIANTS
+           incompressible images shared between pages
+
+Every 7th page is landscape and the page tree has two levels, like
+files written by common producers.
+"""
+import os
+import random
+import zlib
+
+PAGES_PER_NODE = 256
+IMAGE_VARIANTS = 16
+IMAGE_SIZE = (600, 800)
+
+_LINE = "Page {page}, line {line}: the quick brown fox jumps over the lazy dog {n:08d}."
+
+
+def _text_content(page, landscape):
+    top = 560 if landscape else 800
+    lines = [f"BT /F1 8 Tf 10 TL 40 {top} Td"]
+    for line in range(60):
+        lines.append(f"({_LINE.format(page=page + 1, line=line + 1, n=page * 60 + line)}) Tj T*")
+    lines.append("ET")
+    return "\n".join(lines).encode()
+
+
+def _image_content(landscape):
+    width, height = (842, 595) if landscape else (595, 842)
+    return f"q {width - 40} 0 0 {height - 40} 20 20 cm /Im0 Do Q".encode()
+
+
+class _Writer:
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.position = 0
+        self._write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.f.write(data)
+        self.position += len(data)
+
+    def obj(self, number, body, stream=None):
+        self.offsets[number] = self.position
+        if stream is None:
+            self._write(f"{number} 0 obj\n{body}\nendobj\n".encode())
+        else:
+            head = body[:-2] + f" /Length {len(stream)} >>"
+            self._write(f"{number} 0 obj\n{head}\nstream\n".encode())
+            self._write(stream)
+            self._write(b"\nendstream\nendobj\n")
+
+    def finish(self, size, root):
+        xref = self.position
+        lines = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+        lines += [f"{self.offsets.get(n, 0):010d} 00000 n \n" for n in range(1, size)]
+        lines.append(f"trailer\n<< /Size {size} /Root {root} 0 R >>\nstartxref\n{xref}\n%%EOF\n")
+        self._write("".join(lines).encode())
+
+
+def write_pdf(path, kind, pages, seed=0):
+    """Write a synthetic PDF of the given kind ("text" or "image")."""
+    if kind not in ("text", "image"):
+        raise ValueError(f"unknown kind: {kind}")
+    rng = random.Random(seed)
+
+    # Object numbers: 1 catalog, 2 root node, 3 font, then images,
+    # then the intermediate nodes, then (page, content) pairs.
+    images = IMAGE_VARIANTS if kind == "image" else 0
+    first_image = 4
+    first_node = first_image + images
+    nodes = (pages + PAGES_PER_NODE - 1) // PAGES_PER_NODE
+    first_page = first_node + nodes
+    size = first_page + 2 * pages
+
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        w = _Writer(f)
+        w.obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{first_node + n} 0 R" for n in range(nodes))
+        w.obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+        w.obj(3, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        width, height = IMAGE_SIZE
+        for n in range(images):
+            samples = rng.randbytes(width * height * 3)
+            w.obj(first_image + n,
+                  f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                  f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode >>",
+                  zlib.compress(samples, 1))
+
+        for n in range(nodes):
+            first = n * PAGES_PER_NODE
+            count = min(PAGES_PER_NODE, pages - first)
+            kids = " ".join(f"{first_page + 2 * p} 0 R" for p in range(first, first + count))
+            w.obj(first_node + n, f"<< /Type /Pages /Parent 2 0 R /Kids [{kids}] /Count {count} >>")
+
+        for page in range(pages):
+            landscape = page % 7 == 6
+            box = "[0 0 842 595]" if landscape else "[0 0 595 842]"
+            number = first_page + 2 * page
+            if kind == "text":
+                resources = "<< /Font << /F1 3 0 R >> >>"
+                content = _text_content(page, landscape)
+            else:
+                resources = f"<< /XObject << /Im0 {first_image + page % images} 0 R >> >>"
+                content = _image_content(landscape)
+            w.obj(number, f"<< /Type /Page /Parent {first_node + page // PAGES_PER_NODE} 0 R "
+                          f"/MediaBox {box} /Resources {resources} /Contents {number + 1} 0 R >>")
+            w.obj(number + 1, "<< /Filter /FlateDecode >>", zlib.compress(content, 6))
+
+        w.finish(size, 1)
+    os.replace(tmp, path)
+    return path
+
+
+def ensure_pdf(directory, kind, pages, seed=0):
+    """Path of a synthetic PDF in directory, written on first use."""
+    path = os.path.join(directory, f"{kind}-{pages}-{seed}.pdf")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        write_pdf(path, kind, pages, seed)
+    return path
@@ -0,0 +1,317 @@
+# cli.py
+"""
+Headless command line for page operations.
+
+Runs the same operations as the editor on a Document, without Qt:
+
+    python cli.py input.pdf --select 1-3 --rotate 90 --merge extra.pdf --save out.pdf
+    python cli.py input.pdf --script operations.txt
+    python cli.py batch manifest.json      # many jobs, see batch.py
+    python cli.py merge -o all.pdf 'scans/*.pdf' appendix.pdf
+
+Operations run in the order given. Each one applies to the current
+selection, which is every page until --select changes it. Page numbers
+in --select refer to the page order at that point.
+Saving or exporting over the input file reopens it: later operations
+work on the file as written, with every page selected.
+
+An operation script has one operation per line, '#' starts a comment:
+
+    select 1-3,8                 # see edit_mode/selection.py for the syntax
+    rotate 90
+    duplicate
+    delete
+    merge extra.pdf end          # or: start, after <page>
+    export selected.pdf
+    save out.pdf
+"""
+import argparse
+import shlex
+import sys
+
+from document_model import Document
+import instrumentation
+import edit_mode.pdf_operations as pdf_ops
+from edit_mode.selection import SelectionError, parse_selection
+
+
+class OperationError(ValueError):
+    """An operation or script line that cannot be run."""
+
+
+# ---------------------------
+# Operations
+# ---------------------------
+def _merge_position(args):
+    """Parse the position words of a merge: [], [start], [end], [after, N]."""
+    if not args or args == ["end"]:
+        return "end"
+    if args == ["start"]:
+        return "start"
+    if len(args) == 2 and args[0] == "after":
+        try:
+            return int(args[1])
+        except ValueError:
+            pass
+    raise OperationError(f"invalid merge position: {' '.join(args)}")
+
+
+def run_operations(document: Document, operations, rasterize=False, log=None,
+                   optimize=False, linearize=False):
+    """
+    Apply (name, args) operations to document in order. rasterize
+    (True or pdf_ops.FlattenOptions), optimize and linearize apply to
+    the files export and save write, see pdf_ops.write_pages.
+    log, if given, is called with a short message after each one.
+    Returns the number of pages written by export and save.
+    """
+    selection = list(document.pages)
+    written = 0
+
+    for name, args in operations:
+        if name == "select":
+            if len(args) != 1:
+                raise OperationError("select takes one page range, e.g. 1,3-5")
+            try:
+                rows = parse_selection(args[0], len(document.pages), document)
+            except SelectionError as exc:
+                raise OperationError(str(exc)) from None
+            selection = [document.pages[row] for row in rows]
+            message = f"selected {len(selection)} pages"
+
+        elif name == "delete":
+            pdf_ops.delete_pages(document, selection)
+            message = f"deleted {len(selection)} pages"
+            selection = []
+
+        elif name == "rotate":
+            try:
+                angle = int(args[0]) if args else 90
+            except ValueError:
+                raise OperationError(f"invalid angle: {args[0]}") from None
+            if angle % 90:
+                raise OperationError("rotation angle must be a multiple of 90")
+            pdf_ops.rotate_pages(document, selection, angle)
+            message = f"rotated {len(selection)} pages by {angle}"
+
+        elif name == "duplicate":
+            pdf_ops.duplicate_pages(document, selection)
+            message = f"duplicated {len(selection)} pages"
+
+        elif name == "merge":
+            if not args:
+                raise OperationError("merge needs a PDF file")
+            pdf_ops.merge_pdf(document, args[0], _merge_position(args[1:]))
+            message = f"merged {args[0]}"
+
+        elif name in ("export", "save"):
+            if len(args) != 1:
+                raise OperationError(f"{name} needs an output file")
+            pages = selection if name == "export" else document.pages
+            if not pages:
+                raise OperationError(f"nothing to {name}: no pages")
+            pdf_ops.write_pages(document, pages, args[0], rasterize=rasterize,
+                                optimize=optimize, linearize=linearize)
+            written += len(pages)
+            message = f"wrote {len(pages)} pages to {args[0]}"
+            if pdf_ops.writes_over(document, args[0]):
+                # Later operations work on the file as written
+                document.reload()
+                selection = list(document.pages)
+
+        else:
+            raise OperationError(f"unknown operation: {name}")
+
+        if log:
+            log(message)
+
+    return written
+
+
+def parse_script(lines):
+    """Turn operation script lines into (name, args) tuples."""
+    operations = []
+    for number, line in enumerate(lines, 1):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as exc:
+            raise OperationError(f"line {number}: {exc}") from None
+        if words:
+            operations.append((words[0].lower(), words[1:]))
+    return operations
+
+
+# ---------------------------
+# Command line
+# ---------------------------
+class _AppendOperation(argparse.Action):
+    """Collect options into namespace.operations, keeping their order."""
+    def __call__(self, parser, namespace, values, option_string=None):
+        if values is None:
+            values = []
+        elif isinstance(values, str):
+            values = [values]
+        operations = getattr(namespace, "operations", None) or []
+        operations.append((self.dest, list(values)))
+        namespace.operations = operations
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pdf-editor",
+        description="Run page operations on a PDF without opening the editor.",
+    )
+    parser.add_argument("input", help="PDF file to start from")
+    parser.add_argument("--script", metavar="FILE",
+                        help="read operations from FILE ('-' for stdin), after any options")
+    parser.add_argument("--flatten", action="store_true",
+                        help="rasterize pages when saving or exporting")
+    parser.add_argument("--optimize", action="store_true",
+                        help="store fonts, images and other objects used repeatedly only once")
+    parser.add_argument("--linearize", action="store_true",
+                        help="linearize written files for fast web view (needs pikepdf)")
+    flatten = parser.add_argument_group("flattening (with --flatten)")
+    flatten.add_argument("--dpi", type=int, help="resolution of flattened pages (default 150)")
+    flatten.add_argument("--colorspace", choices=pdf_ops.FlattenOptions.COLORSPACES,
+                         help="auto stores pages without colour in gray (default auto)")
+    flatten.add_argument("--compression", choices=pdf_ops.FlattenOptions.COMPRESSIONS,
+                         help="image compression; jpx is JPEG 2000 (default jpeg)")
+    flatten.add_argument("--quality", type=int, help="jpeg/jpx quality, 1-100 (default 80)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report progress")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write timings as a Chrome trace (JSON) to FILE")
+
+    ops = parser.add_argument_group("operations (run in the order given)")
+    ops.add_argument("--select", action=_AppendOperation, metavar="RANGES",
+                     help="select pages, e.g. 1,3-5,8  1-100:2  5-last  !2  "
+                          "odd  landscape  file:NAME")
+    ops.add_argument("--delete", action=_AppendOperation, nargs=0,
+                     help="delete the selected pages")
+    ops.add_argument("--rotate", action=_AppendOperation, nargs="?", metavar="ANGLE",
+                     help="rotate the selected pages (default 90)")
+    ops.add_argument("--duplicate", action=_AppendOperation, nargs=0,
+                     help="duplicate the selected pages")
+    ops.add_argument("--merge", action=_AppendOperation, metavar="PDF",
+                     help="append another PDF")
+    ops.add_argument("--merge-start", action=_AppendOperation, metavar="PDF",
+                     help="insert another PDF before the first page")
+    ops.add_argument("--merge-after", action=_AppendOperation, nargs=2, metavar=("PAGE", "PDF"),
+                     help="insert another PDF after page PAGE")
+    ops.add_argument("--export", action=_AppendOperation, metavar="PDF",
+                     help="write the selected pages to PDF")
+    ops.add_argument("--save", "-o", action=_AppendOperation, metavar="PDF",
+                     help="write all pages to PDF")
+    return parser
+
+
+def _normalize(name, args):
+    """Map the --merge-* options onto the script form: merge PDF <position>."""
+    if name == "merge_start":
+        return ("merge", [args[0], "start"])
+    if name == "merge_after":
+        return ("merge", [args[1], "after", args[0]])
+    return (name, args)
+
+
+def merge_main(argv=None):
+    """pdf-editor merge: concatenate whole files, streaming the pages."""
+    parser = argparse.ArgumentParser(
+        prog="pdf-editor merge",
+        description="Concatenate PDFs into one file, a batch of pages at a time, "
+                    "with memory use independent of the number and size of the inputs.",
+    )
+    parser.add_argument("inputs", nargs="+", metavar="PDF",
+                        help="files to merge, in order; glob patterns expand sorted")
+    parser.add_argument("--output", "-o", required=True, metavar="PDF", help="file to write")
+    parser.add_argument("--batch-size", type=int, default=pdf_ops.WRITE_BATCH_SIZE, metavar="N",
+                        help=f"pages copied per incremental save (default {pdf_ops.WRITE_BATCH_SIZE})")
+    parser.add_argument("--optimize", action="store_true",
+                        help="store fonts, images and other objects the inputs share only once")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report the result")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write timings as a Chrome trace (JSON) to FILE")
+    options = parser.parse_args(argv)
+    if options.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    if options.trace:
+        instrumentation.enable()
+    try:
+        pages = pdf_ops.merge_files(options.inputs, options.output, batch_size=options.batch_size,
+                                    optimize=options.optimize)
+    except (OSError, RuntimeError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if options.trace:
+            instrumentation.dump_trace(options.trace)
+    if not options.quiet:
+        print(f"wrote {pages} pages to {options.output}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ["batch"]:
+        import batch
+        return batch.main(argv[1:])
+    if argv[:1] == ["merge"]:
+        return merge_main(argv[1:])
+
+    parser = build_parser()
+    options = parser.parse_args(argv)
+
+    operations = [_normalize(name, args) for name, args in getattr(options, "operations", None) or []]
+    if options.script:
+        try:
+            if options.script == "-":
+                operations += parse_script(sys.stdin)
+            else:
+                with open(options.script, encoding="utf-8") as script:
+                    operations += parse_script(script)
+        except OSError as exc:
+            parser.error(f"cannot read script: {exc}")
+        except OperationError as exc:
+            parser.error(f"{options.script}: {exc}")
+
+    if not operations:
+        parser.error("no operations given")
+
+    rasterize = False
+    if options.flatten:
+        settings = {name: getattr(options, name)
+                    for name in ("dpi", "colorspace", "compression", "quality")
+                    if getattr(options, name) is not None}
+        try:
+            rasterize = pdf_ops.FlattenOptions(**settings)
+        except ValueError as exc:
+            parser.error(str(exc))
+    if options.linearize:
+        try:
+            pdf_ops.check_linearize()
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    log = None if options.quiet else (lambda message: print(message, file=sys.stderr))
+    if options.trace:
+        instrumentation.enable()
+    try:
+        document = Document(options.input)
+        run_operations(document, operations, rasterize=rasterize, log=log,
+                       optimize=options.optimize, linearize=options.linearize)
+    except OperationError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    except (OSError, RuntimeError, ValueError) as exc:
+        # fitz reports unreadable or broken PDFs as RuntimeError/ValueError
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if options.trace:
+            instrumentation.dump_trace(options.trace)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# disk_cache.py
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+
+import instrumentation
+
+# Size cap of the thumbnail cache on disk, in megabytes.
+DISK_CACHE_MB = 512
+# Share of the cap kept after an eviction, so it does not run on every write.
+EVICT_TO = 0.9
+# Thumbnails are small and only shown scaled down; JPEG keeps them compact.
+JPEG_QUALITY = 80
+
+
+def default_cache_dir():
+    """Per-user cache directory; PDF_EDITOR_CACHE_DIR overrides it."""
+    override = os.environ.get("PDF_EDITOR_CACHE_DIR")
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "pdf-editor", "thumbnails")
+
+
+class DiskThumbnailCache:
+    """
+    Encoded thumbnails kept on disk across sessions.
+
+    Entries are keyed by a hash of the source file's content, so a
+    modified file never matches the thumbnails of its old version; they
+    are simply never read again and age out. The hash is computed once
+    per file version (path, size, mtime, inode), in the background, and
+    kept next to the thumbnails (see source_digest). Values are
+    encoded image bytes (JPEG, or PNG with alpha) that the caller
+    decodes. Sources that are not files on disk are not cached.
+
+    The cache is capped at max_megabytes; least recently used entries
+    (by file mtime, refreshed on every hit) are removed first.
+    """
+    def __init__(self, directory=None, max_megabytes=DISK_CACHE_MB):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self._digests = {}  # (path, size, mtime_ns, inode) -> content hash
+        self._hashing = set()  # signatures being hashed in the background
+        self._lock = threading.Lock()
+        self._total_bytes = None  # scanned on the first write
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- Keys ----------
+    def source_digest(self, source):
+        """
+        Content hash of a source file, or None if it cannot be cached or
+        is not known yet. A file is hashed once per version, on a
+        background thread, and the hash is kept in the cache directory
+        for later sessions: asking never waits for a large file to be
+        read, its thumbnails are just not cached until the hash is in.
+        """
+        if not isinstance(source, (str, os.PathLike)):
+            return None
+        try:
+            st = os.stat(source)
+        except OSError:
+            return None
+        signature = (os.path.realpath(source), st.st_size, st.st_mtime_ns, st.st_ino)
+        digest = self._digests.get(signature)
+        if digest is None and signature not in self._hashing:
+            digest = self._read_digest(signature)
+            if digest is None:
+                self._start_hashing(signature)
+            else:
+                self._digests[signature] = digest
+        return digest
+
+    def _digest_file(self, signature):
+        name = hashlib.blake2b(repr(signature).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, "sources", name)
+
+    def _read_digest(self, signature):
+        try:
+            with open(self._digest_file(signature), encoding="ascii") as f:
+                digest = f.read().strip()
+        except (OSError, ValueError):
+            return None
+        return digest or None
+
+    def _start_hashing(self, signature):
+        with self._lock:
+            if signature in self._hashing:
+                return
+            self._hashing.add(signature)
+        threading.Thread(target=self._hash, args=(signature,), name="thumbnail-cache-hash",
+                         daemon=True).start()
+
+    def _hash(self, signature):
+        """Background thread: hash a file version and remember the result."""
+        path = signature[0]
+        try:
+            with instrumentation.span("cache.disk.hash"):
+                h = hashlib.blake2b(digest_size=20)
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+            digest = h.hexdigest()
+            self._digests[signature] = digest
+            target = self._digest_file(signature)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="ascii") as f:
+                f.write(digest)
+            os.replace(tmp, target)
+        except OSError:
+            pass  # not cached then, or hashed again next session
+        finally:
+            with self._lock:
+                self._hashing.discard(signature)
+
+    def _path(self, key):
+        """File of a (source, page_index, rotation, zoom) key, or None."""
+        source, page_index, rotation, zoom = key
+        digest = self.source_digest(source)
+        if digest is None:
+            return None
+        name = f"{page_index}-{rotation % 360}-{zoom:g}"
+        return os.path.join(self.directory, digest[:2], digest, name)
+
+    # ---------- Access ----------
+    def get(self, key):
+        path = self._path(key)
+        if path is None:
+            return None
+        with instrumentation.span("cache.disk.get"):
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)  # recently used
+            except OSError:
+                self.misses += 1
+                instrumentation.count("cache.disk.miss")
+                return None
+        self.hits += 1
+        instrumentation.count("cache.disk.hit")
+        return data
+
+    def put(self, key, data: bytes):
+        path = self._path(key)
+        if path is None or len(data) > self.max_bytes:
+            return
+        folder = os.path.dirname(path)
+        instrumentation.count("cache.disk.put")
+        try:
+            os.makedirs(folder, exist_ok=True)
+            # Written aside and renamed: readers never see half a file
+            fd, tmp = tempfile.mkstemp(dir=folder, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return  # a cache that cannot be written is just a miss later
+
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, _, size in self._scan())
+        else:
+            self._total_bytes += len(data)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _scan(self):
+        """(mtime, path, size) of every entry."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, path, st.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * EVICT_TO
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+            instrumentation.count("cache.disk.eviction")
+        self._total_bytes = total
+
+    def clear(self):
+        for _, path, _ in self._scan():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
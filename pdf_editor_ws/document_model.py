@@ -1,24 +1,869 @@
 # document_model.py
+import itertools
+import mmap
+import os
+import re
+import weakref
+from array import array
+from collections import OrderedDict
 import fitz  # PyMuPDF
+import instrumentation
+
+# Default limit of simultaneously open source PDFs per pool.
+MAX_OPEN_DOCUMENTS = 64
+
 
 class Page:
     """
     Represents a logical page in a PDF document.
     Does NOT store rendered data, only metadata.
+
+    A Page created directly holds its own values. Pages read from a
+    PageTable (e.g. document.pages[i]) are views on a table row: they
+    read and write the table, and stay attached to the same logical
+    page when rows around it are inserted, removed or moved. Once their
+    page is removed, reading them raises LookupError.
     """
+    __slots__ = ("_table", "_uid", "_row",
+                 "_source_document", "_source_page_index", "_rotation", "_overlays")
+
     def __init__(self, source_document, source_page_index, rotation=0):
-        self.source_document = source_document  # path or identifier
-        self.source_page_index = source_page_index  # 0-based
-        self.rotation = rotation
-        self.overlays = []  # optional images/signatures
+        self._table = None
+        self._uid = None
+        self._row = -1
+        self._source_document = source_document  # path or identifier
+        self._source_page_index = source_page_index  # 0-based
+        self._rotation = rotation
+        self._overlays = []  # optional images/signatures
+
+    @classmethod
+    def _view(cls, table, uid, row):
+        page = cls.__new__(cls)
+        page._table = table
+        page._uid = uid
+        page._row = row
+        return page
+
+    def _table_row(self):
+        table = self._table
+        row = self._row
+        # The row is only a hint: check it still holds this page
+        if not (0 <= row < len(table._uid) and table._uid[row] == self._uid):
+            row = self._row = table.row_of_uid(self._uid)
+        return row
+
+    @property
+    def source_document(self):
+        if self._table is None:
+            return self._source_document
+        table = self._table
+        return table._sources[table._src[self._table_row()]]
+
+    @property
+    def source_page_index(self):
+        if self._table is None:
+            return self._source_page_index
+        return self._table._idx[self._table_row()]
+
+    @property
+    def rotation(self):
+        if self._table is None:
+            return self._rotation
+        return self._table._rot[self._table_row()]
+
+    @rotation.setter
+    def rotation(self, value):
+        if self._table is None:
+            self._rotation = value
+        else:
+            self._table._rot[self._table_row()] = value % 360
+
+    @property
+    def overlays(self):
+        """
+        Overlays of the page. A page of a table without any reads as an
+        empty tuple and takes no memory; assign a list to add some.
+        """
+        if self._table is None:
+            return self._overlays
+        self._table_row()  # LookupError once the page is removed
+        return self._table._overlays.get(self._uid, ())
+
+    @overlays.setter
+    def overlays(self, overlays):
+        overlays = list(overlays)
+        if self._table is None:
+            self._overlays = overlays
+            return
+        self._table_row()
+        if overlays:
+            self._table._overlays[self._uid] = overlays
+        else:
+            self._table._overlays.pop(self._uid, None)
+
+    def __eq__(self, other):
+        if not isinstance(other, Page):
+            return NotImplemented
+        if self._table is None:
+            return self is other
+        return self._table is other._table and self._uid == other._uid
+
+    def __hash__(self):
+        if self._table is None:
+            return id(self)
+        return hash((id(self._table), self._uid))
+
+    def __repr__(self):
+        return (f"Page({self.source_document!r}, {self.source_page_index}, "
+                f"rotation={self.rotation})")
+
+
+class PageTable:
+    """
+    Ordered list of pages stored in typed arrays.
+
+    Each row costs a few bytes: an interned source id, the source page
+    index, the rotation and a row identity. Overlays are kept only for
+    the pages that have some. It behaves like a list of Page objects
+    (indexing, slicing, iteration, len, insert, del, +, ==) and adds
+    bulk edits on row numbers that work on whole array runs at once.
+    Tables, and a table and a list of pages, compare equal when their
+    pages have the same sources, page indexes, rotations and overlays.
+
+    Slicing returns a PageTable that keeps the row identities. Putting
+    such rows back (slice assignment or extend) after they were removed,
+    i.e. a move, keeps their identities, so Page views of them stay
+    attached; rows that are still in the table come back as copies with
+    new identities. Page views of removed rows raise LookupError.
+    """
+    def __init__(self, pages=()):
+        self._sources = []  # source id -> source_document
+        self._source_ids = {}  # source_document -> source id
+        self._src = array("I")  # source id per row
+        self._idx = array("I")  # source page index per row
+        self._rot = array("H")  # rotation in degrees per row
+        self._uid = array("Q")  # identity per row, stable across edits
+        self._overlays = {}  # uid -> overlays, sparse
+        self._next_uid = 0
+        self._uid_rows = None  # uid -> row, rebuilt lazily after edits
+        self._origin = None  # weakref to the table slices were taken from
+        if pages:
+            self.extend(pages)
+
+    # ---------- Internals ----------
+    def _intern(self, source):
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = self._source_ids[source] = len(self._sources)
+            self._sources.append(source)
+        return source_id
+
+    def _new_uids(self, count):
+        start = self._next_uid
+        self._next_uid += count
+        return array("Q", range(start, start + count))
+
+    def _changed(self):
+        self._uid_rows = None
+
+    def _columns(self):
+        return (self._src, self._idx, self._rot, self._uid)
+
+    def _set_columns(self, columns):
+        self._src, self._idx, self._rot, self._uid = columns
+        self._changed()
+
+    def _segment(self, start, stop):
+        """
+        Copy of rows start..stop, keeping uids and overlays. The source
+        list is shared, not copied: it only ever grows, so source ids
+        stay valid in both tables and a slice costs only its rows.
+        """
+        segment = PageTable()
+        segment._sources = self._sources
+        segment._source_ids = self._source_ids
+        segment._src = self._src[start:stop]
+        segment._idx = self._idx[start:stop]
+        segment._rot = self._rot[start:stop]
+        segment._uid = self._uid[start:stop]
+        segment._next_uid = self._next_uid
+        segment._origin = self._origin or weakref.ref(self)
+        if self._overlays:
+            for uid in segment._uid:
+                if uid in self._overlays:
+                    segment._overlays[uid] = self._overlays[uid]
+        return segment
+
+    def _keeps_uids(self, other):
+        """
+        Whether other holds rows taken out of this table (a slice of it)
+        that are no longer in it, so putting them back is a move.
+        """
+        if other._origin is None or other._origin() is not self:
+            return False
+        current = self._uid_rows_map()
+        return (len(set(other._uid)) == len(other._uid)
+                and not any(uid in current for uid in other._uid))
+
+    def _uid_rows_map(self):
+        if self._uid_rows is None:
+            self._uid_rows = {uid: row for row, uid in enumerate(self._uid)}
+        return self._uid_rows
+
+    def row_of_uid(self, uid):
+        try:
+            return self._uid_rows_map()[uid]
+        except KeyError:
+            raise LookupError("page is no longer in the document") from None
+
+    # ---------- List protocol ----------
+    def __len__(self):
+        return len(self._uid)
+
+    def __iter__(self):
+        view = Page._view
+        for row, uid in enumerate(self._uid):
+            yield view(self, uid, row)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self._rows(range(start, stop, step))
+            return self._segment(start, stop)
+        row = range(len(self))[key]  # IndexError and negative indices as in lists
+        return Page._view(self, self._uid[row], row)
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("extended slice assignment is not supported")
+            # Read the new pages before removing anything
+            incoming = value if isinstance(value, PageTable) else self._from_pages(value)
+            if incoming is self:
+                incoming = self.copy()
+            self.delete_range(start, max(start, stop))
+            self.insert_table(start, incoming, keep_uids=self._keeps_uids(incoming))
+            return
+        row = range(len(self))[key]
+        incoming = self._from_pages([value])
+        self.delete_range(row, row + 1)
+        self.insert_table(row, incoming)
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                self.delete_rows(range(start, stop, step))
+            else:
+                self.delete_range(start, max(start, stop))
+            return
+        row = range(len(self))[key]
+        self.delete_range(row, row + 1)
+
+    def __contains__(self, page):
+        return self.row_of(page) is not None
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            other = self._from_pages(other)
+        elif not isinstance(other, PageTable):
+            return NotImplemented
+        if other is self:
+            return True
+        if len(other) != len(self) or other._idx != self._idx or other._rot != self._rot:
+            return False
+        if other._sources is self._sources:
+            if other._src != self._src:
+                return False
+        elif ([self._sources[i] for i in self._src]
+              != [other._sources[i] for i in other._src]):
+            return False
+        if not (self._overlays or other._overlays):
+            return True
+        return ([self._overlays.get(uid, []) for uid in self._uid]
+                == [other._overlays.get(uid, []) for uid in other._uid])
+
+    __hash__ = None  # mutable, like a list
+
+    def __add__(self, pages):
+        if not isinstance(pages, (list, PageTable)):
+            return NotImplemented
+        table = self.copy()
+        table.extend(pages)
+        return table
+
+    def __radd__(self, pages):
+        if not isinstance(pages, list):
+            return NotImplemented
+        table = PageTable(pages)
+        table.extend(self)
+        return table
+
+    def __iadd__(self, pages):
+        self.extend(pages)
+        return self
+
+    def index(self, page):
+        row = self.row_of(page)
+        if row is None:
+            raise ValueError("page is not in the document")
+        return row
+
+    def append(self, page):
+        self.insert(len(self), page)
+
+    def extend(self, pages):
+        incoming = pages if isinstance(pages, PageTable) else self._from_pages(pages)
+        self.insert_table(len(self), incoming, keep_uids=self._keeps_uids(incoming))
+
+    def insert(self, row, page):
+        row = min(max(row if row >= 0 else len(self) + row, 0), len(self))
+        self.insert_table(row, self._from_pages([page]))
+
+    def _from_pages(self, pages):
+        pages = list(pages)
+        owner = pages[0]._table if pages else None
+        if owner is not None and all(page._table is owner for page in pages):
+            # Views of one table: a slice of it, with their identities
+            return owner._rows([page._table_row() for page in pages])
+        table = PageTable()
+        for page in pages:
+            table._src.append(table._intern(page.source_document))
+            table._idx.append(page.source_page_index)
+            table._rot.append(page.rotation % 360)
+            overlays = page.overlays if page._table is None else page._table._overlays.get(page._uid)
+            if overlays:
+                table._overlays[len(table._uid)] = overlays
+            table._uid.append(len(table._uid))
+        table._next_uid = len(table._uid)
+        return table
+
+    def _rows(self, rows):
+        """Like _segment(), for any rows in any order."""
+        table = self._segment(0, 0)
+        for column, own in zip(table._columns(), self._columns()):
+            column.extend(own[row] for row in rows)
+        if self._overlays:
+            for uid in table._uid:
+                if uid in self._overlays:
+                    table._overlays[uid] = self._overlays[uid]
+        return table
+
+    def copy(self):
+        return self._segment(0, len(self))
+
+    # ---------- Row lookups ----------
+    def row_of(self, page):
+        """Row of a Page view of this table, or None."""
+        if not isinstance(page, Page) or page._table is not self:
+            return None
+        try:
+            return page._table_row()
+        except LookupError:
+            return None
+
+    def rows_of(self, pages):
+        """Sorted rows of the given Page views (others are ignored)."""
+        rows = {self.row_of(page) for page in pages}
+        rows.discard(None)
+        return sorted(rows)
+
+    # ---------- Columns ----------
+    # Read-only access for code that scans every row (selections,
+    # saving); edits go through the methods below.
+    def source_documents(self):
+        """(sources, ids): the distinct sources and a source id per row."""
+        return self._sources, self._src
+
+    def rotations(self):
+        """Rotation per row, as an array."""
+        return self._rot
+
+    # ---------- Bulk edits ----------
+    def insert_table(self, row, other, keep_uids=False):
+        """
+        Insert all rows of another PageTable before row.
+
+        With keep_uids the rows keep their identity, for rows that were
+        taken out of this table before (a move, an undo); otherwise they
+        get new identities, like newly created pages.
+        """
+        if not isinstance(other, PageTable):
+            other = self._from_pages(other)
+        count = len(other)
+        if not count:
+            return
+
+        # Map the other table's source ids onto ours; slices of this
+        # table share its source list and are copied as they are.
+        if other._sources is self._sources:
+            src = other._src
+        else:
+            mapping = array("I", (self._intern(source) for source in other._sources))
+            if mapping == array("I", range(len(mapping))):
+                src = other._src
+            else:
+                src = array("I", (mapping[i] for i in other._src))
+
+        if keep_uids:
+            uids = other._uid
+            overlays = other._overlays
+            self._next_uid = max(self._next_uid, max(uids) + 1)
+        else:
+            uids = self._new_uids(count)
+            overlays = {
+                uids[n]: list(other._overlays[uid])
+                for n, uid in enumerate(other._uid) if uid in other._overlays
+            } if other._overlays else {}
+
+        self._src[row:row] = src
+        self._idx[row:row] = other._idx
+        self._rot[row:row] = other._rot
+        self._uid[row:row] = uids
+        self._overlays.update(overlays)
+        self._changed()
+
+    def insert_run(self, row, source_document, first, count, rotation=0):
+        """Insert pages first..first+count-1 of one source before row."""
+        source_id = self._intern(source_document)
+        self._src[row:row] = array("I", [source_id]) * count
+        self._idx[row:row] = array("I", range(first, first + count))
+        self._rot[row:row] = array("H", [rotation % 360]) * count
+        self._uid[row:row] = self._new_uids(count)
+        self._changed()
+
+    def delete_range(self, start, stop):
+        for uid in self._uid[start:stop]:
+            self._overlays.pop(uid, None)
+        for column in self._columns():
+            del column[start:stop]
+        self._changed()
+
+    def delete_rows(self, rows):
+        """Remove the given rows; the rest is copied run by run."""
+        rows = sorted(set(rows))
+        if not rows:
+            return
+        keep = []
+        previous = 0
+        for row in rows:
+            if row > previous:
+                keep.append((previous, row))
+            previous = row + 1
+        if previous < len(self):
+            keep.append((previous, len(self)))
+
+        if self._overlays:
+            for row in rows:
+                self._overlays.pop(self._uid[row], None)
+        columns = []
+        for column in self._columns():
+            new = array(column.typecode)
+            for start, stop in keep:
+                new += column[start:stop]
+            columns.append(new)
+        self._set_columns(columns)
+
+    def rotate_rows(self, rows, angle):
+        rot = self._rot
+        for row in rows:
+            rot[row] = (rot[row] + angle) % 360
+
+    def duplicate_rows(self, rows):
+        """
+        Insert a copy of each given row right after it.
+        Returns the rows of the copies in the new order.
+        """
+        rows = sorted(set(rows))
+        if not rows:
+            return []
+        columns = [array(column.typecode) for column in self._columns()]
+        new_uids = self._new_uids(len(rows))
+        inserted = []
+        previous = 0
+        for n, row in enumerate(rows):
+            for new, column in zip(columns, self._columns()):
+                new += column[previous:row + 1]
+            inserted.append(len(columns[3]))
+            columns[0].append(self._src[row])
+            columns[1].append(self._idx[row])
+            columns[2].append(self._rot[row])
+            columns[3].append(new_uids[n])
+            previous = row + 1
+        for new, column in zip(columns, self._columns()):
+            new += column[previous:]
+        self._set_columns(columns)
+        return inserted
+
+    def move_rows(self, start, count, destination):
+        """
+        Move rows start..start+count-1 before row `destination`
+        (a row number from before the move), like QAbstractItemModel.moveRows.
+        """
+        segment = self._segment(start, start + count)
+        self.delete_range(start, start + count)
+        if destination > start:
+            destination -= count
+        self.insert_table(destination, segment, keep_uids=True)
+
+    def nbytes(self):
+        """Memory used by the row arrays, in bytes."""
+        return sum(column.itemsize * len(column) for column in self._columns())
+
+
+class PageMetadata:
+    """
+    Page sizes and /Rotate of one source PDF, read on demand.
+
+    Only the page dictionaries are read (no page is loaded or parsed),
+    each page once; the values are kept in arrays allocated on first
+    use. Sizes are those of the unrotated crop box.
+    """
+    def __init__(self, pool, source, page_count):
+        self._pool = pool
+        self._source = source
+        self._width = array("f", bytes(4 * page_count))
+        self._height = array("f", bytes(4 * page_count))
+        self._rotate = array("H", bytes(2 * page_count))
+        self._known = bytearray(page_count)
+        self._inherited = {}  # page tree node xref -> (crop box, media box, rotate)
+        self.reads = 0  # pages actually read
+
+    def __len__(self):
+        return len(self._known)
+
+    def _read(self, index):
+        doc = self._pool.get(self._source)
+        try:
+            box, rotate = self._page_entries(doc, doc.page_xref(index))
+        except (ValueError, RuntimeError):
+            box, rotate = None, None
+        if box is None:
+            # Unusual dictionaries: let MuPDF resolve the box
+            rect = doc.page_cropbox(index)
+            box = (rect.x0, rect.y0, rect.x1, rect.y1)
+        self._width[index] = abs(box[2] - box[0])
+        self._height[index] = abs(box[3] - box[1])
+        self._rotate[index] = (rotate or 0) % 360
+        self._known[index] = 1
+        self.reads += 1
+        instrumentation.count("metadata.read")
+
+    def _page_entries(self, doc, xref):
+        """(box, rotate) of a page, taking inherited values from its parents."""
+        crop, media, rotate, parent = _dict_entries(doc, xref)
+        if parent is not None and None in (crop, media, rotate):
+            p_crop, p_media, p_rotate = self._node_entries(doc, parent)
+            crop = crop or p_crop
+            media = media or p_media
+            rotate = p_rotate if rotate is None else rotate
+        if media is None:
+            return None, rotate
+        if crop is None:
+            return media, rotate
+        # The crop box is clipped to the media box, as viewers do
+        box = (max(crop[0], media[0]), max(crop[1], media[1]),
+               min(crop[2], media[2]), min(crop[3], media[3]))
+        return (box if box[0] < box[2] and box[1] < box[3] else media), rotate
+
+    def _node_entries(self, doc, xref, depth=0):
+        entries = self._inherited.get(xref)
+        if entries is None:
+            crop, media, rotate, parent = _dict_entries(doc, xref)
+            if parent is not None and depth < 64:  # guards against Parent loops
+                p_crop, p_media, p_rotate = self._node_entries(doc, parent, depth + 1)
+                crop = crop or p_crop
+                media = media or p_media
+                rotate = p_rotate if rotate is None else rotate
+            entries = self._inherited[xref] = (crop, media, rotate)
+        return entries
+
+    def size(self, index):
+        """(width, height) of the crop box, before any rotation."""
+        if not self._known[index]:
+            self._read(index)
+        return self._width[index], self._height[index]
+
+    def rotation(self, index):
+        """The page's own /Rotate, inherited from the page tree if needed."""
+        if not self._known[index]:
+            self._read(index)
+        return self._rotate[index]
+
+
+_REF = re.compile(r"^(\d+) \d+ R$")
+_ENTRY = {
+    key: re.compile(r"/%s\s*(\[[^\]]*\]|\d+ \d+ R|-?[\d.]+)" % key)
+    for key in ("CropBox", "MediaBox", "Rotate", "Parent")
+}
+
+
+def _dict_entries(doc, xref):
+    """(crop box, media box, rotate, parent xref) of a page tree object."""
+    text = doc.xref_object(xref, compressed=True)
+    if text.count("<<") == 1:
+        # Flat dictionary, the usual case: read the keys from its text
+        values = {}
+        for key, pattern in _ENTRY.items():
+            match = pattern.search(text)
+            values[key] = match.group(1) if match else None
+    else:
+        # Nested dictionaries could hold keys of the same name
+        values = {}
+        for key in _ENTRY:
+            kind, value = doc.xref_get_key(xref, key)
+            values[key] = None if kind == "null" else value
+
+    def resolve(value):
+        match = _REF.match(value) if value else None
+        return doc.xref_object(int(match.group(1)), compressed=True).strip() if match else value
+
+    def box(value):
+        value = resolve(value)
+        if not value:
+            return None
+        numbers = [float(n) for n in value.strip("[] ").split()]
+        if len(numbers) != 4:
+            raise ValueError(f"bad box {value!r}")
+        x0, y0, x1, y1 = numbers
+        return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+    rotate = resolve(values["Rotate"])
+    parent = _REF.match(values["Parent"]) if values["Parent"] else None
+    return (box(values["CropBox"]), box(values["MediaBox"]),
+            None if rotate is None else int(float(rotate)),
+            int(parent.group(1)) if parent else None)
+
+
+_memory_ids = itertools.count(1)
+
+
+class MemorySource:
+    """
+    A source PDF held in memory: bytes, a bytearray, a memoryview or an
+    mmap.mmap of a file. It goes wherever a path does (Document,
+    merge_pdf, merge_files, Page.source_document) and is identified by
+    name, not by its data: sources with the same name are the same.
+
+    PyMuPDF reads the buffer in place, without a copy, for as long as a
+    document opened from it is open; the buffer must not change then.
+    """
+    def __init__(self, data, name=None):
+        if isinstance(data, (bytearray, mmap.mmap)):
+            data = memoryview(data)  # fitz.open copies a bytearray, not a view
+        elif not isinstance(data, (bytes, memoryview)):
+            raise TypeError(f"cannot read a PDF from {type(data).__name__}")
+        if isinstance(data, memoryview) and (data.ndim != 1 or data.itemsize != 1):
+            data = data.cast("B")
+        self.data = data
+        self.name = name if name is not None else f"<memory {next(_memory_ids)}>"
+
+    def open(self) -> fitz.Document:
+        return fitz.open(stream=self.data, filetype="pdf")
+
+    def __eq__(self, other):
+        return isinstance(other, MemorySource) and other.name == self.name
+
+    def __hash__(self):
+        return hash((MemorySource, self.name))
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"MemorySource({self.name!r}, {len(self.data)} bytes)"
+
+    def __reduce__(self):
+        # Copying the data to another process would defeat the purpose
+        raise TypeError(f"{self.name} is in memory and cannot be sent to another process")
+
+
+def as_source(source):
+    """A path or MemorySource as is; bytes-like data as a new MemorySource."""
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return MemorySource(source)
+    return source
+
+
+def is_file(source) -> bool:
+    """Whether source is a path, which other processes can open too."""
+    return isinstance(source, (str, os.PathLike))
+
+
+def _file_state(source):
+    """(size, mtime) of a source file, to notice it being rewritten; None otherwise."""
+    if not is_file(source):
+        return None
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def open_source(source) -> fitz.Document:
+    return source.open() if isinstance(source, MemorySource) else fitz.open(source)
+
+
+class DocumentPool:
+    """
+    Opens every source PDF once and shares the handle.
+
+    At most max_open documents are kept open; when the limit is reached
+    the least recently used one is closed (it is simply reopened if
+    needed again). Pinned documents, such as a Document's own file, are
+    never closed by the limit.
+    """
+    def __init__(self, max_open=MAX_OPEN_DOCUMENTS):
+        self.max_open = max_open
+        self._docs = OrderedDict()  # source -> fitz.Document, LRU order
+        self._pins = {}  # source -> pin count
+        self._metadata = {}  # source -> PageMetadata, kept when the handle closes
+        self.opens = 0  # how many times a file was actually opened
+
+    def __contains__(self, source):
+        return source in self._docs
+
+    def get(self, source) -> fitz.Document:
+        doc = self._docs.get(source)
+        if doc is None:
+            with instrumentation.span("document.open", source=str(source)):
+                doc = open_source(source)
+            self.opens += 1
+            self._docs[source] = doc
+            self._close_unused()
+        else:
+            self._docs.move_to_end(source)
+        return doc
+
+    def pin(self, source) -> fitz.Document:
+        """Open source and keep it open until unpin() is called as often."""
+        self._pins[source] = self._pins.get(source, 0) + 1
+        return self.get(source)
+
+    def unpin(self, source):
+        count = self._pins.get(source, 0) - 1
+        if count > 0:
+            self._pins[source] = count
+        else:
+            self._pins.pop(source, None)
+            self._close_unused()
+
+    def page_count(self, source):
+        metadata = self._metadata.get(source)
+        if metadata is not None:
+            return len(metadata)
+        return len(self.get(source))
+
+    def metadata(self, source) -> PageMetadata:
+        """Page sizes and rotations of source, shared by every user of the pool."""
+        metadata = self._metadata.get(source)
+        if metadata is None:
+            metadata = self._metadata[source] = PageMetadata(self, source, self.page_count(source))
+        return metadata
+
+    def close(self, source):
+        self._pins.pop(source, None)
+        self._metadata.pop(source, None)
+        doc = self._docs.pop(source, None)
+        if doc is not None:
+            doc.close()
+
+    def close_all(self):
+        for doc in self._docs.values():
+            doc.close()
+        self._docs.clear()
+        self._pins.clear()
+        self._metadata.clear()
+
+    def _close_unused(self):
+        if len(self._docs) <= self.max_open:
+            return
+        for source in list(self._docs):
+            if len(self._docs) <= self.max_open:
+                break
+            if source not in self._pins:
+                self._docs.pop(source).close()
+                instrumentation.count("document.evicted")
+
 
 class Document:
     """
     Represents a PDF document in the viewer/editor.
-    Maintains an ordered list of Page objects.
+    Maintains an ordered PageTable of pages.
+
+    All source PDFs (the opened file and any merged ones) are reached
+    through self.pool, so each file is opened once however many pages,
+    renders or saves refer to it.
+
+    Opening only reads the page count; page sizes and rotations are
+    read when first asked for (page_size) and cached in the pool.
+
+    file_path may also be a MemorySource, or bytes-like data that is
+    wrapped in one: then the document is never written to a file.
     """
-    def __init__(self, file_path):
+    def __init__(self, file_path, pool: DocumentPool = None):
+        file_path = as_source(file_path)
         self.file_path = file_path
-        self.doc = fitz.open(file_path)  # PyMuPDF document
-        self.pages = [Page(file_path, i) for i in range(len(self.doc))]
+        self.pool = pool if pool is not None else DocumentPool()
+        with instrumentation.span("document.load"):
+            self._file_state = _file_state(file_path)
+            self.doc = self.pool.pin(file_path)  # PyMuPDF document
+            self._pages = PageTable()
+            self._pages.insert_run(0, file_path, 0, len(self.doc))
         self.current_index = 0
+
+    @property
+    def pages(self) -> PageTable:
+        return self._pages
+
+    @pages.setter
+    def pages(self, pages):
+        # Replaced in place, so Page views of pages that are kept stay
+        # attached (see PageTable); plain lists of Page objects work too
+        self._pages[:] = pages
+
+    def source(self, source_document) -> fitz.Document:
+        """Open fitz document for a Page.source_document."""
+        if source_document is None or source_document == self.file_path:
+            return self.doc
+        return self.pool.get(source_document)
+
+    def load_page(self, page_obj: Page) -> fitz.Page:
+        """The fitz page a logical Page refers to, from its own source."""
+        return self.source(page_obj.source_document)[page_obj.source_page_index]
+
+    def page_size(self, page_obj: Page):
+        """
+        (width, height) of a Page as shown: its crop box turned by the
+        page's own /Rotate and by Page.rotation. No page is loaded.
+        """
+        metadata = self.pool.metadata(page_obj.source_document or self.file_path)
+        index = page_obj.source_page_index
+        width, height = metadata.size(index)
+        if (metadata.rotation(index) + page_obj.rotation) % 180:
+            width, height = height, width
+        return width, height
+
+    def reload(self):
+        """
+        Reopen file_path after it was rewritten on disk (saved over):
+        the pages become the file's own pages again, in its new order.
+        Open handles, metadata and renders of the old file are stale.
+        """
+        with instrumentation.span("document.load"):
+            self.pool.close(self.file_path)
+            self._file_state = _file_state(self.file_path)
+            self.doc = self.pool.pin(self.file_path)
+            self._pages = PageTable()
+            self._pages.insert_run(0, self.file_path, 0, len(self.doc))
+        self.current_index = min(self.current_index, max(len(self._pages) - 1, 0))
+
+    def file_changed(self) -> bool:
+        """Whether file_path was written to since it was opened or reloaded."""
+        return _file_state(self.file_path) != self._file_state
+
+    def close(self):
+        self.pool.unpin(self.file_path)
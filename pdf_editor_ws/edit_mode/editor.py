@@ -1,89 +1,133 @@
 # edit_mode/editor.py
+import os
 import sys
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QListWidget, QListWidgetItem, QWidget, QLabel,
+    QApplication, QMainWindow, QListView, QWidget,
     QVBoxLayout, QToolBar, QFileDialog, QDockWidget, QGroupBox,
-    QPushButton, QInputDialog
+    QPushButton, QInputDialog, QMessageBox, QProgressDialog
 )
-from PySide6.QtGui import QPixmap, QImage, QAction
-from PySide6.QtCore import Qt, QSize
+from PySide6.QtGui import QPixmap, QImage, QAction, QColor, QKeySequence
+from PySide6.QtCore import Qt, QItemSelection, QItemSelectionModel, QTimer, Signal
 import fitz  # PyMuPDF
-from document_model import Document, Page
+from document_model import Document, Page, is_file
+from render_cache import RenderCache, page_key
+from render_service import RenderService
+from disk_cache import DiskThumbnailCache, JPEG_QUALITY
+from edit_mode.page_list_model import PageListModel, PageDelegate, ITEM_SIZE
+from edit_mode.history import EditHistory, MoveGroup, MoveStep
+from edit_mode.selection import PageSelection, SelectionError, parse_selection
+from edit_mode.save_job import SaveJob
+from edit_mode.flatten_dialog import FlattenDialog
 import edit_mode.pdf_operations as pdf_ops  # your pdf_operations.py
+from stats_panel import create_stats_dock
+import instrumentation
 
+# Memory budget for rendered thumbnails, in megabytes.
+THUMBNAIL_CACHE_MB = 128
 
-def render_page_thumbnail(document: Document, page_obj: Page, zoom=0.2) -> QPixmap:
+
+def render_page_thumbnail(document: Document, page_obj: Page, zoom=0.2,
+                          cache: RenderCache = None,
+                          disk_cache: DiskThumbnailCache = None) -> QPixmap:
     """
     Render thumbnail from the correct source PDF,
     not always from document.doc.
+    When a cache is given, unchanged pages are served from it; a
+    disk_cache is consulted next and keeps new thumbnails for later
+    sessions.
     """
+    key = page_key(page_obj, zoom)
+    if cache is not None:
+        pixmap = cache.get(key)
+        if pixmap is not None:
+            return pixmap
 
-    # Lazily create a cache for opened PDFs
-    if not hasattr(document, "_doc_cache"):
-        document._doc_cache = {}
-
-    src = page_obj.source_document
-
-    # Determine which PDF to read from
-    if src is None or src == document.file_path:
-        pdf = document.doc
-    else:
-        if src not in document._doc_cache:
-            document._doc_cache[src] = fitz.open(src)
-        pdf = document._doc_cache[src]
+    pixmap = None
+    if disk_cache is not None:
+        data = disk_cache.get(key)
+        if data is not None:
+            pixmap = QPixmap()
+            if not pixmap.loadFromData(data):
+                pixmap = None
 
-    # Now this index is guaranteed to be correct
-    page = pdf[page_obj.source_page_index]
+    if pixmap is None:
+        # Read from the page's own source PDF, shared through document.pool
+        page = document.load_page(page_obj)
 
-    mat = fitz.Matrix(zoom, zoom).prerotate(page_obj.rotation)
-    pix = page.get_pixmap(matrix=mat)
+        mat = fitz.Matrix(zoom, zoom).prerotate(page_obj.rotation)
+        with instrumentation.span("render.thumbnail", page=page_obj.source_page_index):
+            pix = page.get_pixmap(matrix=mat)
 
-    fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
-    img = QImage(pix.samples, pix.width, pix.height, pix.stride, fmt)
+        fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
+        img = QImage(pix.samples, pix.width, pix.height, pix.stride, fmt)
+        pixmap = QPixmap.fromImage(img)
 
-    return QPixmap.fromImage(img)
-
-
-class PageItemWidget(QWidget):
-    """Thumbnail + page number widget."""
-    def __init__(self, pixmap: QPixmap, page_number: int):
-        super().__init__()
-        self.image_label = QLabel()
-        self.image_label.setPixmap(pixmap)
-        self.image_label.setAlignment(Qt.AlignCenter)
+        if disk_cache is not None:
+            data = pix.tobytes("png") if pix.alpha else pix.tobytes("jpeg", jpg_quality=JPEG_QUALITY)
+            disk_cache.put(key, data)
 
-        self.text_label = QLabel(f"Page {page_number}")
-        self.text_label.setAlignment(Qt.AlignCenter)
+    if cache is not None:
+        cache.put(key, pixmap, pixmap.width() * pixmap.height() * pixmap.depth() // 8)
 
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(6)
-        layout.addWidget(self.image_label)
-        layout.addWidget(self.text_label)
+    return pixmap
 
 
 class PDFEditor(QMainWindow):
+    # The document's file was saved over and the document reloaded
+    document_reloaded = Signal()
+
     def __init__(self, document: Document):
         super().__init__()
         self.setWindowTitle("PDF Editor – Pages")
         self.resize(1000, 700)
 
         self.document = document
-
-        # Main list widget
-        self.list_widget = QListWidget()
-        self.setCentralWidget(self.list_widget)
-        self.list_widget.setViewMode(QListWidget.ListMode)
-        self.list_widget.setFlow(QListWidget.LeftToRight)
-        self.list_widget.setWrapping(True)
-        self.list_widget.setIconSize(QSize(160, 220))
-        self.list_widget.setGridSize(QSize(180, 240))
-        self.list_widget.setResizeMode(QListWidget.Adjust)
-        self.list_widget.setDragDropMode(QListWidget.InternalMove)
-        self.list_widget.setSelectionMode(QListWidget.MultiSelection)
-
-        self.list_widget.model().rowsMoved.connect(self.on_rows_moved)
-
+        self.thumbnail_cache = RenderCache(max_megabytes=THUMBNAIL_CACHE_MB, name="thumbnails")
+        # Thumbnails of earlier sessions, kept on disk
+        self.disk_cache = DiskThumbnailCache()
+
+        # Thumbnails are rendered in worker processes; rows show a
+        # placeholder until their pixmap arrives.
+        self.renderer = RenderService(parent=self, pool=self.document.pool)
+        placeholder = QPixmap(120, 170)
+        placeholder.fill(QColor(225, 225, 225))
+
+        # Page grid: the model only touches rows the view paints
+        self.page_model = PageListModel(self.document, self.thumbnail_cache,
+                                        self.renderer, placeholder, parent=self,
+                                        disk_cache=self.disk_cache)
+        self.list_view = QListView()
+        self.setCentralWidget(self.list_view)
+        self.list_view.setModel(self.page_model)
+        self.list_view.setItemDelegate(PageDelegate(self.list_view))
+        self.list_view.setViewMode(QListView.ListMode)
+        self.list_view.setFlow(QListView.LeftToRight)
+        self.list_view.setWrapping(True)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setGridSize(ITEM_SIZE)
+        self.list_view.setResizeMode(QListView.Adjust)
+        self.list_view.setDragDropMode(QListView.InternalMove)
+        self.list_view.setDefaultDropAction(Qt.MoveAction)
+        self.list_view.setSelectionMode(QListView.MultiSelection)
+
+        # Scrolling changes what is visible: drop queued renders, the
+        # newly painted rows request their own.
+        self.list_view.verticalScrollBar().valueChanged.connect(self.page_model.forget_requests)
+
+        # Undo/redo of page edits; drag moves are recorded as they happen
+        self.history = EditHistory(self.document)
+        self._drag_moves = []  # moves of the drop being handled
+        self.page_model.rowsMoved.connect(self._record_move)
+
+        # Timings and counters of instrumentation, hidden until asked for
+        self.stats_dock = create_stats_dock(self)
+
+        # Saves and exports run in the background, one at a time
+        self.save_job = None
+        self.flatten_options = None  # last choice of the flatten dialog
+
+        self._editable = True  # see _set_editable
         self._create_toolbar()
         self._create_sidebar()
         self._load_pages()
@@ -95,8 +139,27 @@ class PDFEditor(QMainWindow):
         toolbar = QToolBar("Edit Toolbar")
         self.addToolBar(toolbar)
         save_action = QAction("Save PDF", self)
-        save_action.triggered.connect(self.save_pdf)
+        save_action.triggered.connect(lambda: self.save_pdf())
         toolbar.addAction(save_action)
+        flatten_action = QAction("Save Flattened PDF", self)
+        flatten_action.triggered.connect(lambda: self.save_pdf(rasterize=True))
+        toolbar.addAction(flatten_action)
+        self.optimize_action = QAction("Optimize Output", self)
+        self.optimize_action.setCheckable(True)
+        self.optimize_action.setToolTip("Store fonts, images and other objects used repeatedly only once")
+        toolbar.addAction(self.optimize_action)
+        toolbar.addSeparator()
+        self.undo_action = QAction("Undo", self)
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.undo_action.triggered.connect(self.undo)
+        toolbar.addAction(self.undo_action)
+        self.redo_action = QAction("Redo", self)
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        self.redo_action.triggered.connect(self.redo)
+        toolbar.addAction(self.redo_action)
+        self._update_undo_actions()
+        toolbar.addSeparator()
+        toolbar.addAction(self.stats_dock.toggleViewAction())
 
     # --------------------------
     # Sidebar
@@ -161,6 +224,8 @@ class PDFEditor(QMainWindow):
         merge_layout.addWidget(btn_export)
         merge_group.setLayout(merge_layout)
         sidebar_layout.addWidget(merge_group)
+        self._edit_buttons = [btn_delete, btn_rotate, btn_duplicate,
+                              btn_merge_start, btn_merge_end, btn_merge_after]
 
         dock.setWidget(sidebar_widget)
         self.addDockWidget(Qt.LeftDockWidgetArea, dock)
@@ -169,142 +234,99 @@ class PDFEditor(QMainWindow):
     # Load / refresh
     # --------------------------
     def _load_pages(self):
-        self.list_widget.clear()
-        for idx, page_obj in enumerate(self.document.pages):
-            pixmap = render_page_thumbnail(self.document, page_obj)
-            item = QListWidgetItem()
-            item.setSizeHint(QSize(180, 240))
-            item.setFlags(item.flags() | Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            item.setData(Qt.UserRole, page_obj)
-            widget = PageItemWidget(pixmap, idx + 1)
-            self.list_widget.addItem(item)
-            self.list_widget.setItemWidget(item, widget)
-
-    def on_rows_moved(self, parent, start, end, destination, row):
-        new_order = []
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            page_obj = item.data(Qt.UserRole)
-            new_order.append(page_obj)
-        self.document.pages = new_order
-        self.refresh_page_numbers()
+        self.page_model.forget_requests()
+        self.page_model.reload()
 
     def refresh_page_numbers(self):
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            widget = self.list_widget.itemWidget(item)
-            widget.text_label.setText(f"Page {i + 1}")
+        self.page_model.refresh_page_numbers()
 
     # --------------------------
     # Selection handling
     # --------------------------
+    def _apply_selection(self, selection):
+        """
+        Replace the selection with the given PageSelection (or rows) in
+        one change, one range per run of consecutive rows.
+        """
+        if not isinstance(selection, PageSelection):
+            selection = PageSelection.from_rows(selection)
+        item_selection = QItemSelection()
+        for start, stop in selection.ranges:
+            item_selection.select(self.page_model.index(start), self.page_model.index(stop - 1))
+        self.list_view.selectionModel().select(item_selection, QItemSelectionModel.ClearAndSelect)
+
     def select_pages(self, mode):
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            if mode == "all":
-                item.setSelected(True)
-            elif mode == "even":
-                item.setSelected((i + 1) % 2 == 0)
-            elif mode == "odd":
-                item.setSelected((i + 1) % 2 == 1)
-            elif mode == "clear":
-                item.setSelected(False)
+        if mode == "clear":
+            self.list_view.selectionModel().clearSelection()
+        else:
+            self._apply_selection(parse_selection(mode, self.page_model.rowCount()))
 
     def select_custom_pages(self):
         text, ok = QInputDialog.getText(
             self,
             "Custom Page Selection",
-            "Enter pages (e.g. 1,3-5,8):"
+            "Enter pages (e.g. 1,3-5,8  1-100:2  !last  landscape  file:scan*.pdf):"
         )
         if not ok or not text.strip():
             return
 
-        max_pages = len(self.document.pages)
-        selected_indices = set()
-
-        parts = text.split(",")
-
-        for part in parts:
-            part = part.strip()
-            if not part:
-                continue
-
-            # Handle ranges like 3-7
-            if "-" in part:
-                try:
-                    start_str, end_str = part.split("-", 1)
-                    start = int(start_str.strip())
-                    end = int(end_str.strip())
-
-                    if start > end:
-                        start, end = end, start
-
-                    for page_num in range(start, end + 1):
-                        idx = page_num - 1
-                        if 0 <= idx < max_pages:
-                            selected_indices.add(idx)
-                except ValueError:
-                    continue
-
-            # Handle single numbers
-            else:
-                try:
-                    page_num = int(part)
-                    idx = page_num - 1
-                    if 0 <= idx < max_pages:
-                        selected_indices.add(idx)
-                except ValueError:
-                    continue
-
-        # Clear existing selection
-        for i in range(self.list_widget.count()):
-            self.list_widget.item(i).setSelected(False)
+        try:
+            selection = parse_selection(text, len(self.document.pages), self.document)
+        except SelectionError as exc:
+            QMessageBox.warning(self, "Custom Page Selection", str(exc))
+            return
+        self._apply_selection(selection)
 
-        # Apply new selection
-        for idx in sorted(selected_indices):
-            self.list_widget.item(idx).setSelected(True)
+    def get_selection(self) -> PageSelection:
+        """The selected rows, read from the view's selection ranges."""
+        return PageSelection((r.top(), r.bottom() + 1)
+                             for r in self.list_view.selectionModel().selection())
 
+    def _selected_rows(self):
+        return list(self.get_selection())
 
     def get_selected_pages(self):
-        selected = []
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            if item.isSelected():
-                selected.append(item.data(Qt.UserRole))
-        return selected
+        return [self.document.pages[row] for row in self._selected_rows()]
 
     # --------------------------
     # Actions
     # --------------------------
+    def _edit(self, label, operation, *args, rows=()):
+        """Run a pdf_operations edit, record it for undo and update the views."""
+        if not self._editable:
+            return
+        with instrumentation.span("editor.edit", label=label):
+            pending = self.history.begin(rows)
+            diff = operation(self.document, *args)
+            self.history.commit(label, pending, diff)
+            with instrumentation.span("editor.apply_diff"):
+                self.page_model.apply_diff(diff)
+        self._update_undo_actions()
+
     def delete_selected(self):
         pages = self.get_selected_pages()
-        pdf_ops.delete_pages(self.document, pages)
-        self._load_pages()
+        self._edit("Delete Pages", pdf_ops.delete_pages, pages, rows=self._selected_rows())
 
     def rotate_selected(self, angle=90):
         pages = self.get_selected_pages()
-        pdf_ops.rotate_pages(self.document, pages, angle)
-        self._load_pages()
+        self._edit("Rotate Pages", pdf_ops.rotate_pages, pages, angle, rows=self._selected_rows())
 
     def duplicate_selected(self):
         pages = self.get_selected_pages()
-        pdf_ops.duplicate_pages(self.document, pages)
-        self._load_pages()
+        self._edit("Duplicate Pages", pdf_ops.duplicate_pages, pages)
     
     def export_pages(self):
         pages = self.get_selected_pages()
         path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "", "PDF Files (*.pdf)")
-        if not (path or pages):
+        if not path or not pages:
             return
-        pdf_ops.export_selected_pages(self.document, pages, path)
-        self._load_pages()
+        self._start_save(pages, path, "Exporting")
 
     def merge_pdf(self, position='end'):
         path, _ = QFileDialog.getOpenFileName(self, "Select PDF to Merge", "", "PDF Files (*.pdf)")
         if not path:
             return
-        pdf_ops.merge_pdf(self.document, path, position)
-        self._load_pages()
+        self._edit("Merge PDF", pdf_ops.merge_pdf, path, position)
 
     def merge_after_page(self):
         # Ask user for page number
@@ -325,41 +347,157 @@ class PDFEditor(QMainWindow):
             return
 
         # Merge after the given page (subtract 1 to get 0-based index)
-        pdf_ops.merge_pdf(self.document, path, position=page_num)
-        self._load_pages()
+        self._edit("Merge PDF", pdf_ops.merge_pdf, path, page_num)
 
+    # --------------------------
+    # Undo / redo
+    # --------------------------
+    def _record_move(self, parent, start, end, destination, row):
+        # A drop of several rows moves them one by one, all before the
+        # event loop runs again; they become a single undo step then.
+        if not self._drag_moves:
+            QTimer.singleShot(0, self._finish_drag)
+        self._drag_moves.append(MoveStep("Move Pages", start, end - start + 1, row))
+
+    def _finish_drag(self):
+        moves, self._drag_moves = self._drag_moves, []
+        self.history.push(moves[0] if len(moves) == 1 else MoveGroup("Move Pages", moves))
+        self._update_undo_actions()
+
+    def _update_undo_actions(self):
+        label = self.history.undo_label()
+        self.undo_action.setEnabled(self._editable and label is not None)
+        self.undo_action.setText(f"Undo {label}" if label else "Undo")
+        label = self.history.redo_label()
+        self.redo_action.setEnabled(self._editable and label is not None)
+        self.redo_action.setText(f"Redo {label}" if label else "Redo")
+
+    def undo(self):
+        if not self._editable or not self.history.can_undo():
+            return
+        self.list_view.selectionModel().clearSelection()
+        with instrumentation.span("editor.undo"):
+            self.page_model.apply_diff(self.history.undo())
+        self._update_undo_actions()
+
+    def redo(self):
+        if not self._editable or not self.history.can_redo():
+            return
+        self.list_view.selectionModel().clearSelection()
+        with instrumentation.span("editor.redo"):
+            self.page_model.apply_diff(self.history.redo())
+        self._update_undo_actions()
+
+    def closeEvent(self, event):
+        if self.save_job is not None:
+            # The job would outlive the window it reports to
+            self.statusBar().showMessage("Wait for the save to finish, or cancel it, before closing.")
+            event.ignore()
+            return
+        self.renderer.shutdown()
+        super().closeEvent(event)
 
     # --------------------------
     # Save PDF
     # --------------------------
-    def save_pdf(self):
+    def save_pdf(self, rasterize=False):
+        if rasterize:
+            dialog = FlattenDialog(self.flatten_options, self)
+            if dialog.exec() != FlattenDialog.Accepted:
+                return
+            rasterize = self.flatten_options = dialog.options()
+
         file_path, _ = QFileDialog.getSaveFileName(self, "Save PDF", "", "PDF Files (*.pdf)")
         if not file_path:
             return
 
-        new_doc = fitz.open()
+        self._start_save(self.document.pages, file_path,
+                         "Flattening" if rasterize else "Saving", rasterize=rasterize)
 
-        for page_obj in self.document.pages:
-            # Resolve correct source document
-            if page_obj.source_document == self.document.file_path:
-                src_doc = self.document.doc
+    def _start_save(self, pages, path, label, rasterize=False):
+        """Write pages to path with a SaveJob, showing its progress."""
+        if self.save_job is not None:
+            QMessageBox.information(self, "Save PDF", "Another save is still running.")
+            return
+        optimize = self.optimize_action.isChecked()
+        in_place = not rasterize and not optimize and pdf_ops.can_save_in_place(self.document, pages, path)
+        in_memory = not is_file(self.document.file_path) or not all(
+            is_file(p.source_document or self.document.file_path) for p in pages)
+        if in_place or in_memory:
+            # Appending the changes to the open file is quick, and the
+            # writer process cannot open sources held in memory: write here
+            error = None
+            try:
+                pdf_ops.write_pages(self.document, pages, path, rasterize=rasterize, optimize=optimize)
+            except (OSError, RuntimeError, ValueError) as exc:
+                error = exc
+            message = f"Save failed: {error}" if error else f"Wrote {len(pages)} pages to {path}"
+            if in_place:
+                self.document.reload()
+                self._document_reloaded(message)
             else:
-                src_doc = fitz.open(page_obj.source_document)
-
-            src_page = src_doc[page_obj.source_page_index]
-
-            new_page = new_doc.new_page(
-                width=src_page.rect.width,
-                height=src_page.rect.height
-            )
-
-            mat = fitz.Matrix(1, 1).prerotate(page_obj.rotation)
-            pix = src_page.get_pixmap(matrix=mat)
-
-            new_page.insert_image(src_page.rect, pixmap=pix)
-
-            if src_doc is not self.document.doc:
-                src_doc.close()
-
-        new_doc.save(file_path)
-        new_doc.close()
+                self.statusBar().showMessage(message, 10000)
+            if error is not None:
+                QMessageBox.warning(self, "Save PDF", f"Could not save the PDF:\n{error}")
+            return
+        job = SaveJob(self.document, pages, path, rasterize=rasterize,
+                      optimize=optimize, parent=self)
+        progress = QProgressDialog(f"{label} {os.path.basename(path)}...", "Cancel",
+                                   0, len(pages), self)
+        progress.setWindowTitle("Save PDF")
+        progress.setWindowModality(Qt.NonModal)
+        progress.setAutoClose(False)
+        progress.setMinimumDuration(500)
+        progress.canceled.connect(job.cancel)
+        job.progress.connect(lambda done, total: progress.setValue(done))
+        job.finished.connect(lambda path: self._save_finished(job, path))
+        job.cancelled.connect(lambda: self._save_done("Save cancelled"))
+        job.failed.connect(lambda error: self._save_done(f"Save failed: {error}", error))
+        self.save_job = job
+        self._save_progress = progress
+        if pdf_ops.writes_over(self.document, path):
+            # The document is reloaded from the file when the job ends,
+            # which would drop edits made in the meantime
+            self._set_editable(False)
+        job.start()
+
+    def _save_finished(self, job, path):
+        message = f"Wrote {job.page_count} pages to {path}"
+        self._save_done(message)
+        if pdf_ops.writes_over(self.document, path):
+            # Nothing was edited meanwhile (see _start_save)
+            self.document.reload()
+            self._document_reloaded(message)
+
+    def _set_editable(self, editable):
+        """Allow or block page edits: their buttons, undo/redo, drag and drop."""
+        self._editable = editable
+        for button in self._edit_buttons:
+            button.setEnabled(editable)
+        self.list_view.setDragDropMode(QListView.InternalMove if editable else QListView.NoDragDrop)
+        self._update_undo_actions()
+
+    def _document_reloaded(self, message):
+        """
+        Show the document after it was saved over its own file: the pages
+        are the file's own again, so thumbnails, queued renders and undo
+        steps of the old pages are dropped.
+        """
+        self.list_view.selectionModel().clearSelection()
+        self.thumbnail_cache.clear()
+        self.renderer.shutdown()
+        self.history.clear()
+        self._update_undo_actions()
+        self._load_pages()
+        self.statusBar().showMessage(message, 10000)
+        self.document_reloaded.emit()
+
+    def _save_done(self, message, error=None):
+        self._save_progress.reset()
+        self._save_progress.deleteLater()
+        self.save_job.deleteLater()
+        self.save_job = None
+        self._set_editable(True)
+        self.statusBar().showMessage(message, 10000)
+        if error is not None:
+            QMessageBox.warning(self, "Save PDF", f"Could not save the PDF:\n{error}")
@@ -0,0 +1,70 @@
+# edit_mode/flatten_dialog.py
+from PySide6.QtWidgets import (
+    QDialog, QFormLayout, QSpinBox, QComboBox, QDialogButtonBox, QMessageBox
+)
+from edit_mode.pdf_operations import FlattenOptions
+
+
+class FlattenDialog(QDialog):
+    """Asks how flattened pages are rendered and stored (see FlattenOptions)."""
+    COLORSPACES = (("Automatic", "auto"), ("Color", "rgb"), ("Grayscale", "gray"))
+    COMPRESSIONS = (("JPEG", "jpeg"), ("JPEG 2000", "jpx"), ("Lossless (Flate)", "flate"))
+
+    def __init__(self, options: FlattenOptions = None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Save Flattened PDF")
+        options = options or FlattenOptions()
+        self._options = None
+
+        layout = QFormLayout(self)
+        self.dpi = QSpinBox()
+        self.dpi.setRange(18, 1200)
+        self.dpi.setSuffix(" dpi")
+        self.dpi.setValue(options.dpi)
+        layout.addRow("Resolution:", self.dpi)
+
+        self.colorspace = QComboBox()
+        for label, value in self.COLORSPACES:
+            self.colorspace.addItem(label, value)
+        self.colorspace.setCurrentIndex(self.colorspace.findData(options.colorspace))
+        self.colorspace.setToolTip("Automatic stores pages without colour in grayscale")
+        layout.addRow("Color:", self.colorspace)
+
+        self.compression = QComboBox()
+        for label, value in self.COMPRESSIONS:
+            self.compression.addItem(label, value)
+        self.compression.setCurrentIndex(self.compression.findData(options.compression))
+        self.compression.currentIndexChanged.connect(self._update_quality)
+        layout.addRow("Compression:", self.compression)
+
+        self.quality = QSpinBox()
+        self.quality.setRange(1, 100)
+        self.quality.setValue(options.quality)
+        layout.addRow("Quality:", self.quality)
+        self._update_quality()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def _update_quality(self):
+        # Flate is lossless: there is no quality to choose
+        self.quality.setEnabled(self.compression.currentData() != "flate")
+
+    def accept(self):
+        try:
+            self._options = FlattenOptions(
+                dpi=self.dpi.value(),
+                colorspace=self.colorspace.currentData(),
+                compression=self.compression.currentData(),
+                quality=self.quality.value(),
+            )
+        except ValueError as exc:
+            QMessageBox.warning(self, "Save Flattened PDF", str(exc))
+            return
+        super().accept()
+
+    def options(self) -> FlattenOptions:
+        """The chosen options, once the dialog was accepted."""
+        return self._options
@@ -0,0 +1,184 @@
+# edit_mode/history.py
+"""
+Undo/redo for edits of document.pages.
+
+Steps record what an operation did, not copies of the page list: the
+rows it removed or changed (as PageTable slices of just those rows) and
+the rows it inserted. A step costs a few bytes per touched row, however
+long the document is. Replaying a step gives back the same rows, with
+the same identities and values, so thumbnails come from the render
+cache instead of being rendered again.
+"""
+from collections import deque
+from edit_mode.pdf_operations import PageDiff, to_ranges
+
+# Number of steps kept; older ones are dropped.
+UNDO_LIMIT = 200
+
+
+def _slices(pages, ranges):
+    return [(start, pages[start:stop]) for start, stop in ranges]
+
+
+class EditStep:
+    """
+    One undoable PageDiff with the rows on both sides of it, each kept
+    as (first row, PageTable of the rows): the removed rows and the old
+    values of the changed rows, the inserted rows and their new values.
+
+    Changed rows are expected to keep their position, which holds for
+    every operation in pdf_operations.
+    """
+    def __init__(self, label, diff, removed, changed_before, inserted, changed_after):
+        self.label = label
+        self.diff = diff
+        self._removed = removed
+        self._changed_before = changed_before
+        self._inserted = inserted
+        self._changed_after = changed_after
+
+    def undo(self, pages) -> PageDiff:
+        for row, values in self._changed_before:
+            _overwrite(pages, row, values)
+        for start, stop in reversed(self.diff.inserted):
+            pages.delete_range(start, stop)
+        for row, rows in self._removed:
+            pages.insert_table(row, rows, keep_uids=True)
+        return PageDiff(removed=self.diff.inserted, inserted=self.diff.removed,
+                        changed=self.diff.changed)
+
+    def redo(self, pages) -> PageDiff:
+        for start, stop in reversed(self.diff.removed):
+            pages.delete_range(start, stop)
+        for row, rows in self._inserted:
+            pages.insert_table(row, rows, keep_uids=True)
+        for row, values in self._changed_after:
+            _overwrite(pages, row, values)
+        return self.diff
+
+
+class MoveStep:
+    """A block of rows moved, as done by drag and drop (see PageTable.move_rows)."""
+    def __init__(self, label, start, count, destination):
+        self.label = label
+        self.start = start
+        self.count = count
+        self.destination = destination
+
+    def _moved_to(self):
+        return self.destination - self.count if self.destination > self.start else self.destination
+
+    def _move(self, pages, start, final):
+        # The destination of move_rows is a row number from before the move
+        pages.move_rows(start, self.count, final + self.count if final > start else final)
+        return PageDiff(removed=[(start, start + self.count)],
+                        inserted=[(final, final + self.count)])
+
+    def undo(self, pages) -> PageDiff:
+        return self._move(pages, self._moved_to(), self.start)
+
+    def redo(self, pages) -> PageDiff:
+        return self._move(pages, self.start, self._moved_to())
+
+
+class MoveGroup:
+    """
+    Moves done as one, e.g. the rows of a multi-row drag, which the view
+    moves one at a time. Undone and redone together.
+    """
+    def __init__(self, label, moves):
+        self.label = label
+        self.moves = list(moves)
+
+    def _diff(self):
+        # Every row between the first and the last one touched may have moved
+        first = min(min(move.start, move._moved_to()) for move in self.moves)
+        stop = max(max(move.start, move._moved_to()) + move.count for move in self.moves)
+        return PageDiff(removed=[(first, stop)], inserted=[(first, stop)])
+
+    def undo(self, pages) -> PageDiff:
+        for move in reversed(self.moves):
+            move.undo(pages)
+        return self._diff()
+
+    def redo(self, pages) -> PageDiff:
+        for move in self.moves:
+            move.redo(pages)
+        return self._diff()
+
+
+def _overwrite(pages, row, values):
+    pages.delete_range(row, row + len(values))
+    pages.insert_table(row, values, keep_uids=True)
+
+
+class EditHistory:
+    """
+    Undo and redo stacks for one Document.
+
+    Operations are recorded in two halves, since removed rows only
+    exist before the operation and inserted rows only after it:
+
+        pending = history.begin(rows_to_remove_or_change)
+        diff = pdf_ops.delete_pages(document, pages)
+        history.commit("Delete Pages", pending, diff)
+    """
+    def __init__(self, document, limit=UNDO_LIMIT):
+        self.document = document
+        self._undo = deque(maxlen=limit)
+        self._redo = []
+
+    def begin(self, rows):
+        """Keep the current values of the rows an operation will remove or change."""
+        pages = self.document.pages
+        return {start: pages[start:stop] for start, stop in to_ranges(sorted(set(rows)))}
+
+    def commit(self, label, pending, diff: PageDiff):
+        if diff.is_empty():
+            return
+        pages = self.document.pages
+        removed = [(start, pending[start]) for start, _ in diff.removed]
+        changed_before = [(start, pending[start]) for start, _ in diff.changed]
+        self.push(EditStep(label, diff, removed, changed_before,
+                           _slices(pages, diff.inserted), _slices(pages, diff.changed)))
+
+    def push(self, step):
+        self._undo.append(step)
+        self._redo.clear()
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo_label(self):
+        return self._undo[-1].label if self._undo else None
+
+    def redo_label(self):
+        return self._redo[-1].label if self._redo else None
+
+    def undo(self) -> PageDiff:
+        """Revert the last step and return the PageDiff views should replay."""
+        step = self._undo.pop()
+        self._redo.append(step)
+        return step.undo(self.document.pages)
+
+    def redo(self) -> PageDiff:
+        step = self._redo.pop()
+        self._undo.append(step)
+        return step.redo(self.document.pages)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+
+    def nbytes(self):
+        """Approximate memory held by the recorded rows, in bytes."""
+        total = 0
+        for step in list(self._undo) + self._redo:
+            if isinstance(step, EditStep):
+                for _, rows in (step._removed + step._changed_before
+                                + step._inserted + step._changed_after):
+                    total += rows.nbytes()
+        return total
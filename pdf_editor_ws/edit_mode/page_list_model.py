@@ -0,0 +1,240 @@
+# edit_mode/page_list_model.py
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QMimeData, QSize, QRect, QBuffer, QByteArray, QIODevice
+)
+from PySide6.QtGui import QPixmap, QImage, QPalette
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle, QApplication
+from document_model import Document
+from render_cache import RenderCache, page_key
+from render_service import RenderService
+from disk_cache import DiskThumbnailCache, JPEG_QUALITY
+import instrumentation
+
+ROWS_MIME_TYPE = "application/x-pdf-editor-rows"
+
+THUMBNAIL_ZOOM = 0.2
+ITEM_SIZE = QSize(180, 240)
+
+
+def encode_image(image: QImage) -> bytes:
+    """Bytes for the disk cache: JPEG, or PNG when the image has alpha."""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(buffer, "PNG")
+    else:
+        image.save(buffer, "JPEG", JPEG_QUALITY)
+    return bytes(data)
+
+
+class PageListModel(QAbstractListModel):
+    """
+    List model over Document.pages.
+
+    No per-page widgets or pixmaps are created up front: thumbnails are
+    looked up in the cache (or requested from the renderer) only when
+    the view asks for a row's decoration, i.e. when the row is painted.
+    With a disk_cache, thumbnails of earlier sessions are read from disk
+    before anything is rendered, and new ones are written to it.
+    """
+    def __init__(self, document: Document, cache: RenderCache, renderer: RenderService,
+                 placeholder: QPixmap, parent=None, disk_cache: DiskThumbnailCache = None):
+        super().__init__(parent)
+        self.document = document
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self.renderer = renderer
+        self.placeholder = placeholder
+        self._requested = {}  # thumbnail key -> rows waiting for it
+        # Row count as announced to views; follows document.pages one
+        # begin/end signal pair at a time while a diff is replayed.
+        self._rows = len(document.pages)
+        renderer.rendered.connect(self.on_thumbnail_rendered)
+        renderer.failed.connect(self.on_thumbnail_failed)
+
+    # --------------------------
+    # Read access
+    # --------------------------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        page_obj = self.document.pages[row]
+
+        if role == Qt.DisplayRole:
+            return f"Page {row + 1}"
+        if role == Qt.DecorationRole:
+            return self._thumbnail(row, page_obj)
+        if role == Qt.UserRole:
+            return page_obj
+        return None
+
+    def _thumbnail(self, row, page_obj):
+        key = page_key(page_obj, THUMBNAIL_ZOOM)
+        waiting = self._requested.get(key)
+        if waiting is None:
+            pixmap = self.cache.get(key)
+            if pixmap is None:
+                pixmap = self._from_disk(key)
+            if pixmap is not None:
+                return pixmap
+            waiting = self._requested[key] = set()
+            self.renderer.request(key)
+        waiting.add(row)
+        return self.placeholder
+
+    def _from_disk(self, key):
+        if self.disk_cache is None:
+            return None
+        data = self.disk_cache.get(key)
+        pixmap = QPixmap()
+        if data is None:
+            return None
+        with instrumentation.span("cache.disk.decode"):
+            if not pixmap.loadFromData(data):
+                return None
+        self.cache.put(key, pixmap, pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+        return pixmap
+
+    def on_thumbnail_rendered(self, key, image: QImage):
+        pixmap = QPixmap.fromImage(image)
+        self.cache.put(key, pixmap, pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+        if self.disk_cache is not None:
+            with instrumentation.span("cache.disk.store"):
+                self.disk_cache.put(key, encode_image(image))
+        # Rows may have shifted since the request; repainting a wrong
+        # row is harmless, it just reads the cache again.
+        count = self.rowCount()
+        for row in self._requested.pop(key, ()):
+            if row < count:
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def on_thumbnail_failed(self, key, message):
+        # Keep the placeholder; the next repaint asks again.
+        self._requested.pop(key, None)
+
+    def forget_requests(self):
+        """Drop queued renders, e.g. when the visible rows change."""
+        self.renderer.cancel_pending()
+        self._requested = {
+            key: rows for key, rows in self._requested.items()
+            if self.renderer.is_in_flight(key)
+        }
+
+    # --------------------------
+    # Structure
+    # --------------------------
+    def reload(self):
+        self.beginResetModel()
+        self._requested = {}
+        self._rows = len(self.document.pages)
+        self.endResetModel()
+
+    def apply_diff(self, diff):
+        """
+        Replay a pdf_operations.PageDiff on the views: only the removed,
+        inserted and changed rows are touched, plus the page numbers of
+        the rows that shifted.
+        """
+        for start, stop in reversed(diff.removed):
+            self.beginRemoveRows(QModelIndex(), start, stop - 1)
+            self._rows -= stop - start
+            self.endRemoveRows()
+        for start, stop in diff.inserted:
+            self.beginInsertRows(QModelIndex(), start, stop - 1)
+            self._rows += stop - start
+            self.endInsertRows()
+        for start, stop in diff.changed:
+            self.dataChanged.emit(self.index(start), self.index(stop - 1), [Qt.DecorationRole])
+
+        first = diff.first_shifted_row()
+        if first is not None:
+            self.refresh_page_numbers(first)
+
+    def refresh_page_numbers(self, first=0, last=None):
+        """Relabel rows first..last (inclusive, default: to the end)."""
+        if last is None:
+            last = self._rows - 1
+        if first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.DisplayRole])
+
+    # --------------------------
+    # Drag and drop reordering
+    # --------------------------
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [ROWS_MIME_TYPE]
+
+    def mimeData(self, indexes):
+        rows = sorted({index.row() for index in indexes})
+        mime = QMimeData()
+        mime.setData(ROWS_MIME_TYPE, ",".join(map(str, rows)).encode())
+        return mime
+
+    def dropMimeData(self, data, action, row, column, parent):
+        # Internal moves are done by the view through moveRows(); drops
+        # from anywhere else are not supported.
+        return False
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        if source_parent.isValid() or destination_parent.isValid():
+            return False
+        if source_row <= destination_child <= source_row + count:
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row + count - 1,
+                                  QModelIndex(), destination_child):
+            return False
+
+        self.document.pages.move_rows(source_row, count, destination_child)
+        self.endMoveRows()
+        self.refresh_page_numbers(min(source_row, destination_child),
+                                  max(source_row + count, destination_child + count) - 1)
+        return True
+
+
+class PageDelegate(QStyledItemDelegate):
+    """Paints a thumbnail with its page number below it."""
+    def sizeHint(self, option, index):
+        return ITEM_SIZE
+
+    def paint(self, painter, option, index):
+        painter.save()
+        try:
+            style = option.widget.style() if option.widget else QApplication.style()
+            style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, option.widget)
+
+            rect = option.rect.adjusted(4, 4, -4, -4)
+            text_height = option.fontMetrics.height() + 6
+            image_rect = QRect(rect.left(), rect.top(), rect.width(), rect.height() - text_height)
+
+            pixmap = index.data(Qt.DecorationRole)
+            if pixmap is not None and not pixmap.isNull():
+                size = pixmap.size()
+                if size.width() > image_rect.width() or size.height() > image_rect.height():
+                    size = size.scaled(image_rect.size(), Qt.KeepAspectRatio)
+                target = QRect(0, 0, size.width(), size.height())
+                target.moveCenter(image_rect.center())
+                painter.drawPixmap(target, pixmap)
+
+            text_rect = QRect(rect.left(), rect.bottom() - text_height, rect.width(), text_height)
+            if option.state & QStyle.State_Selected:
+                painter.setPen(option.palette.color(QPalette.HighlightedText))
+            else:
+                painter.setPen(option.palette.color(QPalette.Text))
+            painter.drawText(text_rect, Qt.AlignCenter, index.data(Qt.DisplayRole))
+        finally:
+            painter.restore()
@@ -1,91 +1,1155 @@
 # edit_mode/pdf_operations.py
-from document_model import Document, Page
+import glob
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import re
+import tempfile
+import zlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from document_model import Document, DocumentPool, Page, PageTable, as_source, is_file
+import instrumentation
 import fitz  # PyMuPDF
 
 
 # ---------------------------
-# Actions on pages
+# Page diffs
 # ---------------------------
-def delete_pages(document: Document, pages_to_delete: list[Page]):
-    """Remove pages from the logical document only."""
-    delete_set = set(pages_to_delete)
-    document.pages = [p for p in document.pages if p not in delete_set]
+def to_ranges(rows):
+    """Collapse sorted row numbers into half-open (start, stop) ranges."""
+    ranges = []
+    for row in rows:
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] = row + 1
+        else:
+            ranges.append([row, row + 1])
+    return [tuple(r) for r in ranges]
+
+
+class PageDiff:
+    """
+    What an operation changed in document.pages, as half-open row ranges.
+
+    removed:  ranges in the page order *before* the operation
+    inserted: ranges in the page order *after* the operation
+    changed:  ranges (after the operation) whose Page was modified in place
+
+    Applying removals from last to first and then insertions from first
+    to last turns the old row order into the new one, which is how
+    views should replay it.
+    """
+    def __init__(self, removed=(), inserted=(), changed=()):
+        self.removed = list(removed)
+        self.inserted = list(inserted)
+        self.changed = list(changed)
+
+    def is_empty(self):
+        return not (self.removed or self.inserted or self.changed)
 
-def rotate_pages(document: Document, pages_to_rotate: list[Page], angle: int = 90):
-    for page in pages_to_rotate:
-        page.rotation = (page.rotation + angle) % 360
+    def first_shifted_row(self):
+        """First row whose position (and so page number) may have moved, or None."""
+        starts = [start for start, _ in self.removed + self.inserted]
+        return min(starts) if starts else None
 
-def duplicate_pages(document: Document, pages_to_duplicate: list[Page]):
-    duplicate_set = set(pages_to_duplicate)
-    new_pages = []
 
-    for page in document.pages:
-        new_pages.append(page)
-        if page in duplicate_set:
-            new_pages.append(
-                Page(
-                    page.source_document,
-                    page.source_page_index,
-                    page.rotation
-                )
-            )
+# ---------------------------
+# Actions on pages
+# ---------------------------
+@instrumentation.timed("edit.delete")
+def delete_pages(document: Document, pages_to_delete: list[Page]) -> PageDiff:
+    """Remove pages from the logical document only."""
+    removed_rows = document.pages.rows_of(pages_to_delete)
+    document.pages.delete_rows(removed_rows)
+    return PageDiff(removed=to_ranges(removed_rows))
+
+@instrumentation.timed("edit.rotate")
+def rotate_pages(document: Document, pages_to_rotate: list[Page], angle: int = 90) -> PageDiff:
+    changed_rows = document.pages.rows_of(pages_to_rotate)
+    document.pages.rotate_rows(changed_rows, angle)
+    return PageDiff(changed=to_ranges(changed_rows))
 
-    document.pages = new_pages
+@instrumentation.timed("edit.duplicate")
+def duplicate_pages(document: Document, pages_to_duplicate: list[Page]) -> PageDiff:
+    """Insert a copy of every given page right after it."""
+    rows = document.pages.rows_of(pages_to_duplicate)
+    inserted_rows = document.pages.duplicate_rows(rows)
+    return PageDiff(inserted=to_ranges(inserted_rows))
 
 # ---------------------------
 # Merge PDF
 # ---------------------------
-def merge_pdf(document: Document, merge_path: str, position='end'):
+@instrumentation.timed("edit.merge")
+def merge_pdf(document: Document, merge_path: str, position='end') -> PageDiff:
     """
     Logically merge another PDF into the document.
     Does NOT rebuild document.doc.
+
+    merge_path may also be a MemorySource or bytes-like data.
     """
-    other_doc = fitz.open(merge_path)
+    merge_path = as_source(merge_path)
+    # Opened through the pool, the handle is reused for rendering and saving
+    page_count = document.pool.page_count(merge_path)
 
-    merged_pages = []
+    if position == 'start':
+        insert_at = 0
+    elif position == 'end':
+        insert_at = len(document.pages)
+    elif isinstance(position, int):
+        insert_at = len(range(len(document.pages))[:position])
+    else:
+        raise ValueError("position must be 'start', 'end', or integer index")
 
-    # Create Page objects referencing the OTHER pdf
-    external_pages = [
-        Page(
-            source_document=merge_path,
-            source_page_index=i,
-            rotation=0
-        )
-        for i in range(len(other_doc))
-    ]
+    # Pages referencing the OTHER pdf, added as one run
+    document.pages.insert_run(insert_at, merge_path, 0, page_count)
 
-    if position == 'start':
-        merged_pages.extend(external_pages)
-        merged_pages.extend(document.pages)
+    return PageDiff(inserted=[(insert_at, insert_at + page_count)] if page_count else [])
 
-    elif position == 'end':
-        merged_pages.extend(document.pages)
-        merged_pages.extend(external_pages)
+# ---------------------------
+# Save / assemble output
+# ---------------------------
+# Pages are written in batches: the first batch creates the file, every
+# following batch is appended with an incremental save. Only one batch
+# of output pages is held in memory at a time.
+WRITE_BATCH_SIZE = 500
+# Pages per stage document when pages are rasterized, or prepared by
+# worker processes: small enough to spread the work evenly over them.
+PREPARE_CHUNK_SIZE = 16
+# Batch nodes per intermediate node in the page tree of written files.
+PAGE_TREE_FANOUT = 64
 
-    elif isinstance(position, int):
-        merged_pages.extend(document.pages[:position])
-        merged_pages.extend(external_pages)
-        merged_pages.extend(document.pages[position:])
+_KID = re.compile(r"(\d+) \d+ R")
+_LENGTH = re.compile(r"/Length(?![0-9A-Za-z])\s*\d+(?:\s+\d+\s+R)?")
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+# Objects that belong to one place in the document and are never shared
+_UNSHARED = re.compile(r"/(?:Parent|P|Rect|Kids)(?![0-9A-Za-z])"
+                       r"|/Type\s*/(?:Page|Pages|Catalog|Annot)(?![0-9A-Za-z])")
+
+
+def _page_runs(pages: list[Page]):
+    """
+    Group pages into contiguous runs that can be copied with a single
+    insert_pdf call: same source, consecutive source indices.
+    Yields (source_document, first_index, last_index, run_pages).
+    """
+    run = []
+    for page_obj in pages:
+        if run:
+            last = run[-1]
+            if (page_obj.source_document == last.source_document
+                    and page_obj.source_page_index == last.source_page_index + 1):
+                run.append(page_obj)
+                continue
+            yield (run[0].source_document, run[0].source_page_index,
+                   last.source_page_index, run)
+        run = [page_obj]
+    if run:
+        yield (run[0].source_document, run[0].source_page_index,
+               run[-1].source_page_index, run)
+
+
+class FlattenOptions:
+    """
+    How flattened (rasterized) pages are rendered and stored.
+
+    dpi:          rendering resolution
+    colorspace:   "rgb", "gray", or "auto": rendered in colour and stored
+                  in gray when no pixel shows colour
+    compression:  "jpeg", "jpx" (JPEG 2000, needs Pillow) or "flate"
+                  (lossless, large for scans and photos)
+    quality:      1-100, for jpeg and jpx
+    """
+    COLORSPACES = ("auto", "rgb", "gray")
+    COMPRESSIONS = ("jpeg", "jpx", "flate")
+
+    def __init__(self, dpi=150, colorspace="auto", compression="jpeg", quality=80):
+        if not 18 <= dpi <= 1200:
+            raise ValueError(f"dpi must be between 18 and 1200, not {dpi}")
+        if colorspace not in self.COLORSPACES:
+            raise ValueError(f"colorspace must be one of {', '.join(self.COLORSPACES)}")
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"compression must be one of {', '.join(self.COMPRESSIONS)}")
+        if not 1 <= quality <= 100:
+            raise ValueError(f"quality must be between 1 and 100, not {quality}")
+        if compression == "jpx" and importlib.util.find_spec("PIL") is None:
+            raise ValueError("JPEG 2000 compression needs Pillow (pip install pillow)")
+        self.dpi = dpi
+        self.colorspace = colorspace
+        self.compression = compression
+        self.quality = quality
+
+    @classmethod
+    def from_value(cls, value):
+        """
+        FlattenOptions for a rasterize argument: False/None (no flattening,
+        returns None), True (the defaults), a dict of options or an
+        instance.
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, dict):
+            unknown = set(value) - {"dpi", "colorspace", "compression", "quality"}
+            if unknown:
+                raise ValueError(f"unknown flatten options: {', '.join(sorted(unknown))}")
+            return cls(**value)
+        return cls() if value else None
+
+    def __repr__(self):
+        return (f"FlattenOptions(dpi={self.dpi}, colorspace={self.colorspace!r}, "
+                f"compression={self.compression!r}, quality={self.quality})")
+
+
+# Largest difference between the channels of a (block-averaged) pixel
+# that still counts as gray; absorbs the colour noise of scans.
+GRAY_TOLERANCE = 12
+
+
+def _is_gray(pix):
+    """Whether an RGB pixmap shows no colour, judged on a reduced copy."""
+    small = fitz.Pixmap(pix, 0)  # a copy, without alpha
+    factor = 0
+    while small.width >> (factor + 1) >= 128:
+        factor += 1
+    if factor:
+        small.shrink(factor)
+    samples = small.samples
+    red, green, blue = samples[0::3], samples[1::3], samples[2::3]
+    if red == green == blue:
+        return True
+    return all(abs(r - g) <= GRAY_TOLERANCE and abs(g - b) <= GRAY_TOLERANCE
+               for r, g, b in zip(red, green, blue))
 
+
+def _rasterize_page(new_doc, src_page, rotation, options: FlattenOptions):
+    """Append src_page to new_doc as a single image, rendered as options say."""
+    rect = src_page.rect * fitz.Matrix(1, 1).prerotate(rotation)
+    new_page = new_doc.new_page(width=rect.width, height=rect.height)
+
+    zoom = options.dpi / 72
+    mat = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    colorspace = fitz.csGRAY if options.colorspace == "gray" else fitz.csRGB
+    pix = src_page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+    if options.colorspace == "auto" and _is_gray(pix):
+        pix = fitz.Pixmap(fitz.csGRAY, pix)
+        instrumentation.count("save.rasterize.gray")
+
+    # JPEG and JPEG 2000 data is embedded as is; pixmaps are deflated
+    if options.compression == "jpeg":
+        new_page.insert_image(new_page.rect, stream=pix.tobytes("jpeg", jpg_quality=options.quality))
+    elif options.compression == "jpx":
+        # Quality as a target signal-to-noise ratio: 1 -> 20 dB, 100 -> 50 dB
+        data = pix.pil_tobytes("JPEG2000", quality_mode="dB",
+                               quality_layers=[20 + 0.3 * options.quality])
+        new_page.insert_image(new_page.rect, stream=data)
     else:
-        raise ValueError("position must be 'start', 'end', or integer index")
+        new_page.insert_image(new_page.rect, pixmap=pix)
+
+
+def _rotate_copied_page(new_doc, index, angle):
+    """
+    Add angle to the /Rotate of a page copied by insert_pdf, without
+    loading the page (insert_pdf writes inherited values on the page).
+    """
+    xref = new_doc.page_xref(index)
+    kind, value = new_doc.xref_get_key(xref, "Rotate")
+    current = int(float(value)) if kind in ("int", "real") else 0
+    new_doc.xref_set_key(xref, "Rotate", str((current + angle) % 360))
+
+
+def _append_pages(new_doc, pages: list[Page], source, rasterize=False):
+    """
+    Append the logical pages to new_doc.
+
+    source(path) must return an open fitz document for a Page's
+    source_document. Pages are copied as PDF objects (text, vectors and
+    images are kept) in contiguous runs; the logical rotation is applied
+    as page metadata. With rasterize (True or FlattenOptions) every page
+    is rendered to an image instead, which is slow and only meant for
+    flattening.
+    """
+    options = FlattenOptions.from_value(rasterize)
+    for src_path, first, last, run in _page_runs(pages):
+        src_doc = source(src_path)
+
+        if options is not None:
+            for page_obj in run:
+                with instrumentation.span("save.rasterize", page=page_obj.source_page_index):
+                    _rasterize_page(new_doc, src_doc[page_obj.source_page_index],
+                                    page_obj.rotation, options)
+            continue
+
+        start = len(new_doc)
+        with instrumentation.span("save.copy", pages=len(run)):
+            new_doc.insert_pdf(src_doc, from_page=first, to_page=last)
+        with instrumentation.span("save.rotate"):
+            for offset, page_obj in enumerate(run):
+                if page_obj.rotation:
+                    _rotate_copied_page(new_doc, start + offset, page_obj.rotation)
+
+
+# ---------------------------
+# Page tree of written files
+# ---------------------------
+def _kids(doc, xref):
+    return [int(n) for n in _KID.findall(doc.xref_get_key(xref, "Kids")[1])]
+
+
+def _parent(doc, xref):
+    kind, value = doc.xref_get_key(xref, "Parent")
+    return int(value.split()[0]) if kind == "xref" else None
+
+
+def _reference(xref, generations=None):
+    """An indirect reference to xref; generations maps objects whose generation is not 0."""
+    return f"{xref} {generations.get(xref, 0) if generations else 0} R"
+
+
+def _set_kids(doc, xref, kids, count=None, generations=None):
+    doc.xref_set_key(xref, "Kids", "[" + " ".join(_reference(kid, generations) for kid in kids) + "]")
+    if count is not None:
+        doc.xref_set_key(xref, "Count", str(count))
+
+
+def _new_node(doc, parent, kids, count, generations=None):
+    xref = doc.get_new_xref()
+    refs = " ".join(_reference(kid, generations) for kid in kids)
+    doc.update_object(xref, f"<< /Type /Pages /Parent {_reference(parent, generations)} "
+                            f"/Kids [{refs}] /Count {count} >>")
+    return xref
+
+
+def _rightmost_path(doc):
+    """Page tree nodes from the root down to the one holding the last page."""
+    path = [int(doc.xref_get_key(doc.pdf_catalog(), "Pages")[1].split()[0])]
+    while True:
+        kids = _kids(doc, path[-1])
+        if not kids or doc.xref_get_key(kids[-1], "Type")[1] != "/Pages":
+            return path
+        path.append(kids[-1])
+
+
+def _seal_batch(doc, count):
+    """
+    Move the last count pages of doc, just appended, into a page tree
+    node of their own and return their xrefs.
+
+    MuPDF appends a page after the current last page, which it finds by
+    walking the page tree from the front; in a flat tree that visits
+    every page, so appending n pages costs O(n**2). Written files keep a
+    root -> groups of up to PAGE_TREE_FANOUT batch nodes -> pages tree
+    instead, where the walk is short and appending stays linear. The
+    root's /Kids, rewritten by every incremental save, stays small too.
+    """
+    node = _rightmost_path(doc)[-1]
+    kids = _kids(doc, node)
+    kept, batch = kids[:-count], kids[-count:]
+    group = _parent(doc, node)
+
+    if group is None:
+        # First batch: the pages sit in the root itself
+        group = _new_node(doc, node, [], count)
+        _set_kids(doc, node, kept + [group])
+        siblings = []
+    else:
+        _set_kids(doc, node, kept, len(kept))
+        siblings = _kids(doc, group)
+        if len(siblings) >= PAGE_TREE_FANOUT:
+            # The group is full: start the next one under the root
+            root = _parent(doc, group)
+            group_count = int(doc.xref_get_key(group, "Count")[1])
+            doc.xref_set_key(group, "Count", str(group_count - count))
+            group = _new_node(doc, root, [], count)
+            _set_kids(doc, root, _kids(doc, root) + [group])
+            siblings = []
+
+    batch_node = _new_node(doc, group, batch, count)
+    _set_kids(doc, group, siblings + [batch_node])
+    for page in batch:
+        doc.xref_set_key(page, "Parent", f"{batch_node} 0 R")
+    return batch
+
+
+def _copy_links(stage, out_doc, page_xrefs):
+    """
+    Carry the link annotations of the stage's pages over to their copies
+    in out_doc (page_xrefs, in page order). insert_pdf() drops links and
+    recreates them by page number, which makes MuPDF load every page of
+    out_doc; here they are copied by xref, with link targets on other
+    stage pages pointed at the copies.
+    """
+    copies = {stage.page_xref(i): xref for i, xref in enumerate(page_xrefs)}
+    for stage_xref, out_xref in copies.items():
+        if "/Annots" not in stage.xref_object(stage_xref, compressed=True):
+            continue
+        kind, value = stage.xref_get_key(stage_xref, "Annots")
+        if kind == "xref":
+            value = stage.xref_object(int(value.split()[0]), compressed=True)
+        links = []
+        for annot in _KID.findall(value):
+            annot = int(annot)
+            if stage.xref_get_key(annot, "Subtype")[1] != "/Link":
+                continue
+            text = stage.xref_object(annot, compressed=True)
+            if not {int(n) for n in _KID.findall(text)} <= copies.keys():
+                continue  # refers to objects that were not copied
+            text = _KID.sub(lambda m: f"{copies[int(m.group(1))]} 0 R", text)
+            xref = out_doc.get_new_xref()
+            out_doc.update_object(xref, text)
+            links.append(xref)
+        if links:
+            kind, value = out_doc.xref_get_key(out_xref, "Annots")
+            existing = [int(n) for n in _KID.findall(value)] if kind == "array" else []
+            out_doc.xref_set_key(out_xref, "Annots",
+                                 "[" + " ".join(f"{x} 0 R" for x in existing + links) + "]")
+
+
+def _append_stage(out_doc, stage):
+    """
+    Append the pages of a stage document to out_doc.
+
+    Pages are first assembled in a small stage document: insert_pdf()
+    copies links and the rotation is set by page number, which is cheap
+    there but would load every page of a large out_doc. The stage is
+    then copied over in one insert_pdf() call that needs no page lookups.
+    """
+    with instrumentation.span("save.append", pages=len(stage)):
+        out_doc.insert_pdf(stage, links=False)
+    with instrumentation.span("save.page_tree"):
+        page_xrefs = _seal_batch(out_doc, len(stage))
+        _copy_links(stage, out_doc, page_xrefs)
+
+
+# ---------------------------
+# Preparing pages
+# ---------------------------
+class WriteCancelled(Exception):
+    """A write stopped because its cancelled() callback returned True."""
+
+
+def default_prepare_workers():
+    """
+    Worker processes used to rasterize pages: one per CPU, or none on a
+    single CPU and inside daemonic pool workers (e.g. batch.py jobs),
+    which cannot start processes of their own.
+    """
+    cpus = os.cpu_count() or 1
+    if cpus < 2 or multiprocessing.current_process().daemon:
+        return 0
+    return cpus
+
+
+def _stages(pages, source, rasterize, size):
+    """Stage documents holding pages, size at a time, assembled here."""
+    for start in range(0, len(pages), size):
+        stage = fitz.open()
+        try:
+            _append_pages(stage, pages[start:start + size], source, rasterize=rasterize)
+        except Exception:
+            stage.close()
+            raise
+        yield stage
+
+
+_worker_pool = None  # per worker process, see _prepare_stage
+
+
+def _prepare_stage(entries, rasterize):
+    """
+    Process-pool entry point: assemble the pages given as
+    (source_document, source_page_index, rotation) into a stage
+    document and return it as PDF bytes.
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = DocumentPool()
+    stage = fitz.open()
+    try:
+        _append_pages(stage, [Page(*entry) for entry in entries], _worker_pool.get,
+                      rasterize=rasterize)
+        return stage.tobytes(deflate=True)
+    finally:
+        stage.close()
+
+
+def _prepared_stages(pages, rasterize, workers, size):
+    """
+    Stage documents holding pages, size at a time, prepared by a pool
+    of worker processes and handed back in page order.
+
+    Only two chunks per worker are queued at a time, so a slow writer
+    does not let prepared pages pile up in memory.
+    """
+    # spawn: the caller may have Qt loaded, workers must not inherit it
+    executor = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+    queued = deque()
+    try:
+        for start in range(0, len(pages), size):
+            entries = [(p.source_document, p.source_page_index, p.rotation)
+                       for p in pages[start:start + size]]
+            queued.append(executor.submit(_prepare_stage, entries, rasterize))
+            if len(queued) >= 2 * workers:
+                with instrumentation.span("save.wait"):
+                    data = queued.popleft().result()
+                yield fitz.open("pdf", data)
+        while queued:
+            with instrumentation.span("save.wait"):
+                data = queued.popleft().result()
+            yield fitz.open("pdf", data)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+def _stream_dict(text, length, compressed):
+    """A stream's dictionary with its /Length (and /Filter) set."""
+    text = _LENGTH.sub("", text).rstrip()
+    extra = f"/Length {length}" + ("" if compressed else "/Filter/FlateDecode")
+    return text[:-2] + extra + ">>"
+
+
+def _generations(doc, xrefs):
+    """
+    {xref: generation number} of the objects xrefs of doc. PyMuPDF
+    only hands out object numbers, so this asks MuPDF's cross-reference
+    table; objects in object streams have generation 0.
+    """
+    pdf = fitz.mupdf.pdf_document_from_fz_document(doc.this).m_internal
+    generations = {}
+    for xref in xrefs:
+        entry = fitz.mupdf.ll_pdf_get_xref_entry_no_null(pdf, xref)
+        generations[xref] = entry.gen if entry.type == "n" else 0
+    return generations
+
+
+def _append_update(doc, path, xrefs, level=zlib.Z_DEFAULT_COMPRESSION, free=()):
+    """
+    Append the objects xrefs of doc to the file at path, which doc was
+    opened from, as an incremental update. Objects keep their generation
+    numbers. The object numbers free are marked free, e.g. new objects
+    that were dropped: every number below /Size needs an entry somewhere
+    in the file.
+
+    This is what doc.saveIncr() writes, but MuPDF reads the whole file
+    (twice) before it appends, which makes writing a large file batch by
+    batch quadratic. Unfiltered streams are compressed, like the first
+    batch, which is written with deflate=True, at zlib level level.
+    """
+    with open(path, "r+b") as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        f.seek(max(0, end - 1024))
+        prev = int(_STARTXREF.findall(f.read())[-1])
+
+        generations = _generations(doc, xrefs)
+        offsets = []
+        position = end
+        chunks = [b"\n"]
+        position += 1
+        for xref in xrefs:
+            gen = generations[xref]
+            text = doc.xref_object(xref, compressed=True)
+            if doc.xref_is_stream(xref):
+                raw = doc.xref_stream_raw(xref)
+                compressed = "/Filter" in text
+                if not compressed:
+                    raw = zlib.compress(raw, level)
+                head = f"{xref} {gen} obj\n{_stream_dict(text, len(raw), compressed)}\nstream\n".encode()
+                data = head + raw + b"\nendstream\nendobj\n"
+            else:
+                data = f"{xref} {gen} obj\n{text}\nendobj\n".encode()
+            offsets.append((xref, position, gen))
+            chunks.append(data)
+            position += len(data)
+        offsets = sorted(offsets + [(xref, None, 1) for xref in free])
+
+        # Cross-reference section: one subsection per run of numbers
+        lines = ["xref\n"]
+        run = []
+        for xref, offset, gen in offsets + [(None, None, None)]:
+            if run and (xref is None or xref != run[-1][0] + 1):
+                lines.append(f"{run[0][0]} {len(run)}\n")
+                lines.extend(f"{o:010d} {g:05d} n \n" if o is not None else f"0000000000 {g:05d} f \n"
+                             for _, o, g in run)
+                run = []
+            if xref is not None:
+                run.append((xref, offset, gen))
+        trailer = [f"/Size {doc.xref_length()}", f"/Root {doc.xref_get_key(-1, 'Root')[1]}", f"/Prev {prev}"]
+        for key in ("Info", "ID"):
+            kind, value = doc.xref_get_key(-1, key)
+            if kind != "null":
+                trailer.append(f"/{key} {value}")
+        lines.append(f"trailer\n<<{' '.join(trailer)}>>\nstartxref\n{position}\n%%EOF\n")
+        chunks.append("".join(lines).encode())
+
+        f.seek(end)
+        f.write(b"".join(chunks))
+
+
+def _deduplicate(doc, first, digests):
+    """
+    Find the objects of doc from xref first on that are identical to one
+    seen before, point every reference at that first copy, and return
+    {duplicate: original}. digests maps the digests of the objects seen
+    so far to their xrefs and is updated; keep it across batches.
+
+    An object's digest covers its content with references to other
+    shareable objects replaced by their digests, so copies of the same
+    font or image match however they are numbered. Pages, page tree
+    nodes, annotations and whatever else has a parent are never shared.
+    """
+    last = doc.xref_length()
+    memo = {}
+
+    def digest(xref):
+        if xref in memo:
+            return memo[xref]
+        memo[xref] = None  # in progress: objects in a reference cycle are not shared
+        text = doc.xref_object(xref, compressed=True)
+        if text == "null" or _UNSHARED.search(text):
+            return None
+
+        def reference(match):
+            target = int(match.group(1))
+            value = digest(target) if first <= target < last else None
+            return value.hex() if value else match.group(0)
+
+        h = hashlib.blake2b(_KID.sub(reference, text).encode(), digest_size=20)
+        if doc.xref_is_stream(xref):
+            h.update(doc.xref_stream_raw(xref))
+        memo[xref] = value = h.digest()
+        return value
+
+    duplicates = {}
+    for xref in range(first, last):
+        value = digest(xref)
+        if value is not None:
+            original = digests.setdefault(value, xref)
+            if original != xref:
+                duplicates[xref] = original
+
+    if duplicates:
+        def reference(match):
+            original = duplicates.get(int(match.group(1)))
+            return match.group(0) if original is None else f"{original} 0 R"
 
-    document.pages = merged_pages
+        for xref in range(first, last):
+            if xref not in duplicates:
+                text = doc.xref_object(xref, compressed=True)
+                changed = _KID.sub(reference, text)
+                if changed != text:
+                    doc.update_object(xref, changed)  # keeps a stream's data
+    return duplicates
+
+
+def _linearize(path):
+    """Rewrite the PDF at path linearized ("fast web view"), with pikepdf."""
+    import pikepdf
+    linear_path = path + ".linear"
+    try:
+        with pikepdf.open(path) as pdf:
+            pdf.save(linear_path, linearize=True,
+                     object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        os.replace(linear_path, path)
+    finally:
+        if os.path.exists(linear_path):
+            os.remove(linear_path)
+
+
+class _Output:
+    """
+    The file _write_pdf() writes, open for one batch at a time: the first
+    batch creates it, every following one reopens it and is appended as
+    an incremental update.
+
+    With optimize, objects identical to ones already written are dropped
+    (see _deduplicate), streams are compressed harder and the first batch
+    packs its objects into object streams.
+    """
+    def __init__(self, path, optimize=False):
+        self.path = path
+        self.optimize = optimize
+        self.doc = None
+        self.pages = 0  # pages appended since the last flush
+        self.written = False
+        self._known = 0
+        self._changed = None
+        self._digests = {}  # digest -> xref of the objects written so far
+
+    def append(self, stage):
+        if self.doc is None:
+            with instrumentation.span("save.reopen"):
+                self.doc = fitz.open(self.path) if self.written else fitz.open()
+            # Everything from here on is new, except the page tree nodes
+            # on the way to the last page
+            self._known = self.doc.xref_length()
+            self._changed = set(_rightmost_path(self.doc))
+        if stage.is_form_pdf:
+            # Merging form fields changes the catalog's /AcroForm and
+            # whatever it refers to: leave finding the changes to MuPDF
+            self._changed = None
+        _append_stage(self.doc, stage)
+        self.pages += len(stage)
+
+    def flush(self):
+        if self.doc is None:
+            if self.written:
+                return
+            self.doc = fitz.open()  # no pages at all: save() reports it
+        try:
+            duplicates = {}
+            if self.optimize:
+                with instrumentation.span("save.deduplicate"):
+                    duplicates = _deduplicate(self.doc, self._known, self._digests)
+                instrumentation.count("save.duplicates", len(duplicates))
+            with instrumentation.span("save.flush", pages=self.pages):
+                if not self.written:
+                    # garbage=1 drops the duplicates but keeps the numbering
+                    # the digests refer to
+                    if self.optimize:
+                        self.doc.save(self.path, garbage=1, deflate=True,
+                                      use_objstms=1, compression_effort=100)
+                    else:
+                        self.doc.save(self.path, garbage=1, deflate=True)
+                elif self._changed is None:
+                    self.doc.saveIncr()
+                else:
+                    new = [xref for xref in range(self._known, self.doc.xref_length())
+                           if xref not in duplicates]
+                    level = 9 if self.optimize else zlib.Z_DEFAULT_COMPRESSION
+                    _append_update(self.doc, self.path, sorted(self._changed) + new, level,
+                                   free=duplicates)
+            self.written = True
+        finally:
+            self.close()
+        instrumentation.count("save.pages", self.pages)
+        self.pages = 0
+
+    def close(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+
+def _write_pdf(pages, output_path, source, rasterize=False, batch_size=WRITE_BATCH_SIZE,
+               after_batch=None, workers=0, progress=None, cancelled=None,
+               optimize=False, linearize=False):
+    """
+    Stream pages into output_path.
+
+    Pages are assembled into stage documents, here or, with workers,
+    by that many worker processes, and a single writer appends the
+    stages to the output in page order. The output is flushed and
+    closed after every batch_size pages; after_batch(), if given, runs
+    in between, e.g. to release source documents. progress(done, total)
+    is called after every stage. cancelled() is asked before every
+    stage; when it returns True, WriteCancelled is raised. optimize
+    drops duplicate objects as the batches are written (see _Output);
+    linearize rewrites the finished file for fast web view.
+
+    The file is written next to the target and moved into place, so
+    writing over one of the source PDFs never reads a half-written file
+    and a failed or cancelled write leaves nothing behind.
+    """
+    if workers:
+        stages = _prepared_stages(pages, rasterize, workers, PREPARE_CHUNK_SIZE)
+    else:
+        size = PREPARE_CHUNK_SIZE if rasterize else batch_size
+        stages = _stages(pages, source, rasterize, size)
+
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".pdf", dir=out_dir)
+    os.close(fd)
+    output = _Output(tmp_path, optimize=optimize)
+    done = 0
+    try:
+        while True:
+            if cancelled is not None and cancelled():
+                raise WriteCancelled(output_path)
+            stage = next(stages, None)
+            if stage is None:
+                break
+            done += len(stage)
+            try:
+                output.append(stage)
+            finally:
+                stage.close()
+            if output.pages >= batch_size:
+                output.flush()
+                if after_batch is not None:
+                    after_batch()
+            if progress is not None:
+                progress(done, len(pages))
+        output.flush()
+        if linearize:
+            with instrumentation.span("save.linearize"):
+                _linearize(tmp_path)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        output.close()
+        stages.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def check_linearize():
+    """Raise ValueError unless linearizing is possible (it needs pikepdf)."""
+    if importlib.util.find_spec("pikepdf") is None:
+        raise ValueError("linearizing needs pikepdf (pip install pikepdf)")
+
+
+# ---------------------------
+# Saving in place
+# ---------------------------
+# Page attributes a page takes from its page tree nodes if it has none
+_INHERITABLE = ("Resources", "MediaBox", "CropBox", "Rotate")
+
+
+def _same_file(path, other):
+    if not (is_file(path) and is_file(other)):
+        return False  # in memory
+    try:
+        return os.path.samefile(path, other)
+    except OSError:
+        return False  # one of them does not exist (yet)
+
+
+def _inherited_attributes(doc, xref, cache, depth=0):
+    """{key: value} of the inheritable attributes the ancestors of xref define."""
+    parent = _parent(doc, xref)
+    if parent is None or depth >= 64:  # guards against Parent loops
+        return {}
+    values = cache.get(parent)
+    if values is None:
+        values = dict(_inherited_attributes(doc, parent, cache, depth + 1))
+        for key in _INHERITABLE:
+            kind, value = doc.xref_get_key(parent, key)
+            if kind != "null":
+                values[key] = value
+        cache[parent] = values
+    return values
+
+
+def _page_rotation(doc, xref, cache):
+    """The /Rotate of page xref, inherited from the page tree if needed."""
+    kind, value = doc.xref_get_key(xref, "Rotate")
+    if kind == "null":
+        value = _inherited_attributes(doc, xref, cache).get("Rotate", "0")
+    try:
+        return int(float(value)) % 360
+    except ValueError:
+        return 0  # not a number, e.g. an indirect reference
+
+
+def _page_tree_leaves(doc, root, page_set):
+    """{node: [page xrefs]} of the page tree nodes that have pages as kids."""
+    leaves = {}
+    stack = [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        kids = _kids(doc, node)
+        pages = [kid for kid in kids if kid in page_set]
+        if pages:
+            leaves[node] = pages
+        if depth < 64:  # guards against Kids loops
+            stack.extend((kid, depth + 1) for kid in kids if kid not in page_set)
+    return leaves
+
+
+def _reorder_pages(doc, indexes, rotations):
+    """
+    Make the pages at indexes, in that order and turned by rotations,
+    the pages of doc. A page used more than once is copied. Returns the
+    xrefs of the existing objects that changed.
+
+    A run of pages that share a page tree node keeps it (the longest
+    run, if there are several), with its kids cut down to the run, so
+    only the nodes around an edit and the nodes above them are
+    rewritten; other pages go into new nodes. Whatever a page or a kept
+    node inherited from nodes that are replaced is set on it. References
+    to existing objects keep their generation numbers.
+    """
+    cache = {}
+    changed = set()
+
+    def set_key(xref, key, value):
+        doc.xref_set_key(xref, key, value)
+        changed.add(xref)
+
+    def keep_inherited(xref):
+        for key, value in _inherited_attributes(doc, xref, cache).items():
+            if doc.xref_get_key(xref, key)[0] == "null":
+                set_key(xref, key, value)
+
+    page_xrefs = [doc.page_xref(i) for i in range(len(doc))]
+    root = int(doc.xref_get_key(doc.pdf_catalog(), "Pages")[1].split()[0])
+    leaves = _page_tree_leaves(doc, root, set(page_xrefs))
+    leaf_of = {page: node for node, pages in leaves.items() for page in pages}
+    generations = {xref: gen for xref, gen in _generations(doc, {root, *page_xrefs, *leaves}).items()
+                   if gen}
+    uses = Counter(indexes)
+    copies = {}  # index -> dictionary text, for pages used more than once
+
+    runs = []  # [node the pages share, or None, [page xrefs]]
+    for index, angle in zip(indexes, rotations):
+        xref = page_xrefs[index]
+        if index in copies:
+            xref = doc.get_new_xref()
+            doc.update_object(xref, copies[index])
+        elif uses[index] > 1:
+            copies[index] = doc.xref_object(xref, compressed=True)
+        if angle % 360:
+            set_key(xref, "Rotate", str((_page_rotation(doc, xref, cache) + angle) % 360))
+        node = leaf_of.get(xref)
+        if runs and runs[-1][0] == node:
+            runs[-1][1].append(xref)
+        else:
+            runs.append([node, [xref]])
+
+    if list(leaves) == [root]:
+        # Flat tree, as MuPDF writes it: it stays flat
+        _set_kids(doc, root, [xref for _, pages in runs for xref in pages], len(indexes),
+                  generations)
+        changed.add(root)
+        return changed
+
+    longest = {}  # node -> its longest run, the one that keeps it
+    for run, (node, pages) in enumerate(runs):
+        if node not in longest or len(pages) > len(runs[longest[node]][1]):
+            longest[node] = run
+    level = []  # (kid, page count) of the nodes that will hold the pages
+    loose = []  # pages without a node yet, in order
+
+    def place_loose():
+        for start in range(0, len(loose), PAGE_TREE_FANOUT):
+            group = loose[start:start + PAGE_TREE_FANOUT]
+            node = _new_node(doc, root, group, len(group), generations)
+            for xref in group:
+                keep_inherited(xref)
+                set_key(xref, "Parent", f"{node} 0 R")
+            level.append((node, len(group)))
+        loose.clear()
+
+    for run, (node, pages) in enumerate(runs):
+        if node is None or node == root or longest[node] != run:
+            loose.extend(pages)
+            continue
+        place_loose()
+        keep_inherited(node)
+        if _kids(doc, node) != pages:
+            _set_kids(doc, node, pages, len(pages), generations)
+            changed.add(node)
+        level.append((node, len(pages)))
+    place_loose()
+
+    # The nodes above: new ones, PAGE_TREE_FANOUT kids each
+    while len(level) > PAGE_TREE_FANOUT:
+        nodes = []
+        for start in range(0, len(level), PAGE_TREE_FANOUT):
+            group = level[start:start + PAGE_TREE_FANOUT]
+            count = sum(n for _, n in group)
+            node = _new_node(doc, root, [kid for kid, _ in group], count, generations)
+            for kid, _ in group:
+                set_key(kid, "Parent", f"{node} 0 R")
+            nodes.append((node, count))
+        level = nodes
+    _set_kids(doc, root, [kid for kid, _ in level], len(indexes), generations)
+    changed.add(root)
+    for kid, _ in level:
+        if _parent(doc, kid) != root:
+            set_key(kid, "Parent", _reference(root, generations))
+    return changed
+
+
+def writes_over(document: Document, output_path) -> bool:
+    """
+    Whether writing to output_path replaces the document's own file. The
+    document then still shows the version it opened: reload it
+    (Document.reload) before editing or writing it again.
+    """
+    return _same_file(output_path, document.file_path)
+
+
+def can_save_in_place(document: Document, pages: list[Page], output_path: str) -> bool:
+    """
+    Whether save_in_place() can write pages to output_path: it is the
+    document's own file, unchanged since it was opened, every page
+    comes from it, and the file can take an incremental update.
+    """
+    if not pages or not writes_over(document, output_path) or document.file_changed():
+        return False
+    doc = document.doc
+    if not doc.is_pdf or doc.is_encrypted or doc.is_repaired:
+        return False
+    if any(p.source_document not in (None, document.file_path) for p in pages):
+        return False
+    indexes = [p.source_page_index for p in pages]
+    if indexes == list(range(len(doc))):
+        return True  # only rotations change
+    if doc.is_form_pdf:
+        return False  # the form would keep the fields of removed pages
+    # A page used twice is copied, and its annotations cannot be shared
+    return not any(
+        uses > 1 and "/Annots" in doc.xref_object(doc.page_xref(index), compressed=True)
+        for index, uses in Counter(indexes).items()
+    )
+
+
+def save_in_place(document: Document, pages: list[Page]) -> int:
+    """
+    Write pages to the document's own file as an incremental update;
+    check can_save_in_place() first, and reload the document afterwards.
+
+    Only what changed is appended: the page dictionaries whose /Rotate
+    changed and, if pages were moved, removed or duplicated, a new page
+    tree. Page contents stay where they are, so a few edits to a large
+    file take milliseconds and a few KB whatever its size. Returns the
+    number of bytes appended.
+    """
+    path = document.file_path
+    size = os.path.getsize(path)
+    # A handle of its own: the document's stays on the version it shows
+    doc = fitz.open(path)
+    try:
+        known = doc.xref_length()
+        indexes = [p.source_page_index for p in pages]
+        rotations = [p.rotation for p in pages]
+        if indexes == list(range(len(doc))):
+            cache = {}
+            changed = set()
+            for index, angle in enumerate(rotations):
+                if angle % 360:
+                    xref = doc.page_xref(index)
+                    rotate = _page_rotation(doc, xref, cache)
+                    doc.xref_set_key(xref, "Rotate", str((rotate + angle) % 360))
+                    changed.add(xref)
+        else:
+            changed = _reorder_pages(doc, indexes, rotations)
+        xrefs = sorted(changed.union(range(known, doc.xref_length())))
+        if xrefs:
+            _append_update(doc, path, xrefs)
+    finally:
+        doc.close()
+    return os.path.getsize(path) - size
+
+
+def write_pages(document: Document, pages: list[Page], output_path: str,
+                rasterize=False, batch_size=WRITE_BATCH_SIZE,
+                workers=None, progress=None, cancelled=None,
+                optimize=False, linearize=False):
+    """
+    Stream the given pages into output_path, batch_size pages at a time.
+
+    Source PDFs come from document.pool, so each one is opened at most
+    once (unless the pool's open-handle limit closes it). rasterize is
+    False, True or anything FlattenOptions.from_value() accepts.
+    Rasterized pages are rendered by default_prepare_workers() worker
+    processes unless workers says otherwise; copying is cheaper than
+    handing pages to another process, so other pages are prepared here
+    by default. See _write_pdf() for progress, cancelled, optimize and
+    linearize; linearizing needs pikepdf (see check_linearize).
+
+    Writing over the document's own file does not reload the document,
+    which keeps showing its old pages; callers reload it (see
+    writes_over). If only pages of that file are written, unflattened
+    and unoptimized, just the changes are appended to it (see
+    save_in_place).
+    """
+    pages = list(pages)
+    rasterize = FlattenOptions.from_value(rasterize)
+    if linearize:
+        check_linearize()
+    if (rasterize is None and not optimize and not linearize
+            and can_save_in_place(document, pages, output_path)):
+        with instrumentation.span("save.in_place", pages=len(pages)):
+            save_in_place(document, pages)
+        if progress is not None:
+            progress(len(pages), len(pages))
+        return
+    if workers is None:
+        workers = default_prepare_workers() if rasterize else 0
+    if workers and not all(is_file(p.source_document or document.file_path) for p in pages):
+        workers = 0  # worker processes cannot open sources held in memory
+    with instrumentation.span("save.write", pages=len(pages), rasterize=rasterize is not None,
+                              workers=workers):
+        _write_pdf(pages, output_path, document.source, rasterize, batch_size,
+                   workers=workers, progress=progress, cancelled=cancelled,
+                   optimize=optimize, linearize=linearize)
+
+
+def save_pages(document: Document, pages: list[Page], output_path: str, rasterize=False):
+    """Write the edited document (all of its logical pages) to output_path."""
+    write_pages(document, pages, output_path, rasterize=rasterize)
 
-    other_doc.close()
 
 # ---------------------------
 # Export Pages as PDF
 # ---------------------------
+def export_selected_pages(document: Document, pages_to_export: list[Page], export_path: str,
+                          rasterize=False):
+    """
+    Export a subset of pages, in the given order, to a new PDF.
+    Each Page is read from its own source_document, so merged pages
+    are exported from the file they came from.
+    """
+    write_pages(document, pages_to_export, export_path, rasterize=rasterize)
+
+
+# ---------------------------
+# Streaming merge of whole files
+# ---------------------------
+def expand_inputs(inputs) -> list[str]:
+    """
+    Input paths in order; glob patterns expand to their matches, sorted.
+    In-memory inputs (see as_source) are kept as they are.
+    """
+    paths = []
+    for item in inputs:
+        item = as_source(item)
+        if isinstance(item, str) and glob.has_magic(item):
+            matches = sorted(glob.glob(item))
+            if not matches:
+                raise FileNotFoundError(f"no files match {item}")
+            paths.extend(matches)
+        else:
+            paths.append(item)
+    return paths
+
+
+def merge_files(inputs, output_path: str, batch_size=WRITE_BATCH_SIZE, optimize=False) -> int:
+    """
+    Concatenate whole PDFs into output_path without loading them into a
+    Document. inputs are paths, glob patterns or in-memory sources
+    (MemorySource or bytes-like data). Returns the page count.
+
+    Pages are copied batch_size at a time and appended with incremental
+    saves. After every batch the output and the sources are closed and
+    MuPDF's object store is emptied, so memory depends on the batch size
+    and the largest pages, not on the size or number of inputs; what
+    grows is the output's cross-reference table, a few dozen bytes per
+    object. optimize drops fonts, images and other objects that are
+    identical to ones already written, e.g. a letterhead every input
+    embeds.
+    """
+    paths = expand_inputs(inputs)
+    pool = DocumentPool(max_open=1)
+    pages = PageTable()
+    for path in paths:
+        pages.insert_run(len(pages), path, 0, pool.page_count(path))
+    pool.close_all()
 
-def export_selected_pages(document: Document, pages_to_export: list[Page], export_path: str):
-    new_doc = fitz.open()
-    for page_obj in pages_to_export:
-        orig_page = document.doc[page_obj.source_page_index]
-        new_page = new_doc.new_page(width=orig_page.rect.width, height=orig_page.rect.height)
-        mat = fitz.Matrix(1, 1).prerotate(page_obj.rotation)
-        pix = orig_page.get_pixmap(matrix=mat)
-        new_page.insert_image(orig_page.rect, pixmap=pix)
+    def release():
+        pool.close_all()
+        fitz.TOOLS.store_shrink(100)
 
-    new_doc.save(export_path)
-    new_doc.close()
+    with instrumentation.span("merge.files", files=len(paths), pages=len(pages)):
+        try:
+            _write_pdf(pages, output_path, pool.get, batch_size=batch_size, after_batch=release,
+                       optimize=optimize)
+        finally:
+            pool.close_all()
+    return len(pages)
@@ -0,0 +1,91 @@
+# edit_mode/save_job.py
+"""
+Saving and exporting in the background.
+
+A SaveJob writes pages with pdf_operations.write_pages() in a process
+of its own, so the editor stays responsive and can keep editing: the
+pages are a snapshot taken when the job starts. A job that writes over
+the open file is the exception: the editor reloads the file when it
+ends, so it blocks edits until then. PyMuPDF is not safe to
+use from several threads, and the GUI keeps using it while the job
+runs, hence a process rather than a thread. The process runs
+save_writer.write(), which does not import Qt. Flattening fans out
+further to worker processes (see pdf_operations.default_prepare_workers).
+"""
+import multiprocessing
+import queue
+import threading
+
+from PySide6.QtCore import QObject, Signal
+
+from document_model import Document
+from edit_mode import save_writer
+
+# How often the listener checks that the writer process is still alive, in s.
+POLL_INTERVAL = 0.5
+
+
+class SaveJob(QObject):
+    """
+    Writes pages of a Document to output_path in a separate process.
+
+    Signals arrive on the GUI thread: progress while pages are written,
+    then exactly one of finished, failed or cancelled.
+    """
+    progress = Signal(int, int)  # pages written, total
+    finished = Signal(str)  # output path
+    failed = Signal(str)  # error message
+    cancelled = Signal()
+
+    def __init__(self, document: Document, pages, output_path, rasterize=False, optimize=False,
+                 parent=None):
+        super().__init__(parent)
+        self.output_path = output_path
+        self.page_count = len(pages)
+        # spawn: the GUI process has Qt loaded, the writer must not inherit
+        # it; the child imports save_writer only, which does not load Qt
+        context = multiprocessing.get_context("spawn")
+        self._messages = context.Queue()
+        self._cancel = context.Event()
+        entries = [(p.source_document, p.source_page_index, p.rotation) for p in pages]
+        self._process = context.Process(
+            target=save_writer.write, name="pdf-editor-save",
+            args=(document.file_path, entries, output_path, rasterize, optimize,
+                  self._messages, self._cancel),
+        )
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+
+    def start(self):
+        self._process.start()
+        self._listener.start()
+
+    def cancel(self):
+        """Ask the writer to stop; the partial file is removed."""
+        self._cancel.set()
+
+    def is_running(self):
+        return self._listener.is_alive()
+
+    def _listen(self):
+        while True:
+            try:
+                message = self._messages.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                try:
+                    message = self._messages.get_nowait()
+                except queue.Empty:
+                    message = ("failed", f"the writer process exited with code {self._process.exitcode}")
+            kind = message[0]
+            if kind == "progress":
+                self.progress.emit(*message[1:])
+                continue
+            self._process.join()
+            if kind == "finished":
+                self.finished.emit(message[1])
+            elif kind == "cancelled":
+                self.cancelled.emit()
+            else:
+                self.failed.emit(message[1])
+            return
@@ -0,0 +1,32 @@
+# edit_mode/save_writer.py
+"""
+Writing that runs inside the save process of a SaveJob.
+
+Nothing here imports Qt: the process is spawned, so it imports only
+this module and what it needs, and starts without loading PySide6.
+"""
+from document_model import Document, Page
+import edit_mode.pdf_operations as pdf_ops
+
+
+def write(file_path, entries, output_path, rasterize, optimize, messages, cancel):
+    """
+    Save process entry point: write the pages entries, as (source,
+    page index, rotation), of the document at file_path to output_path.
+    Reports through the messages queue; cancel is an Event.
+    """
+    document = Document(file_path)
+    try:
+        pdf_ops.write_pages(
+            document, [Page(*entry) for entry in entries], output_path,
+            rasterize=rasterize, optimize=optimize,
+            progress=lambda done, total: messages.put(("progress", done, total)),
+            cancelled=cancel.is_set,
+        )
+        messages.put(("finished", output_path))
+    except pdf_ops.WriteCancelled:
+        messages.put(("cancelled",))
+    except Exception as exc:
+        messages.put(("failed", str(exc) or type(exc).__name__))
+    finally:
+        document.close()
@@ -0,0 +1,250 @@
+# edit_mode/selection.py
+"""
+Page selections as compressed row ranges.
+
+A PageSelection is a sorted list of disjoint half-open (start, stop)
+row ranges, so "1-100000" is a single range whatever the document size,
+and a view can apply it as one selection change.
+
+Selection expressions are comma separated terms, applied in order:
+
+    1,3-5,8            pages and page ranges (1-based)
+    1-100:2            every second page of 1-100
+    5-last, 5-         up to the last page; "last" alone is the last page
+    all, even, odd
+    landscape, portrait, rotated
+    file:NAME          pages taken from a file named NAME (wildcards allowed)
+    !2-5, not 2-5      remove pages from the selection so far
+                       (from all pages when it comes first)
+    1-50 & landscape   pages matching both sides
+    1-50 & !landscape  pages of the left side that do not match the right one
+"""
+import fnmatch
+import os
+import re
+from bisect import bisect_right
+
+_RANGE = re.compile(r"^(\d+|last)?\s*(-)?\s*(\d+|last)?\s*(?::\s*(\d+))?$")
+
+
+class SelectionError(ValueError):
+    """A selection expression that cannot be parsed."""
+
+
+class PageSelection:
+    """Set of rows stored as sorted, disjoint, half-open ranges."""
+    def __init__(self, ranges=()):
+        merged = []
+        for start, stop in sorted(ranges):
+            if start >= stop:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        self._ranges = [tuple(r) for r in merged]
+
+    @classmethod
+    def _from_sorted(cls, ranges):
+        selection = cls.__new__(cls)
+        selection._ranges = ranges
+        return selection
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Selection of the given rows (in any order)."""
+        ranges = []
+        for row in sorted(set(rows)):
+            if ranges and ranges[-1][1] == row:
+                ranges[-1][1] = row + 1
+            else:
+                ranges.append([row, row + 1])
+        return cls._from_sorted([tuple(r) for r in ranges])
+
+    @classmethod
+    def span(cls, start, stop, step=1):
+        """Rows start, start+step, ... below stop."""
+        if start >= stop:
+            return cls()
+        if step == 1:
+            return cls._from_sorted([(start, stop)])
+        return cls._from_sorted([(row, row + 1) for row in range(start, stop, step)])
+
+    @property
+    def ranges(self):
+        return list(self._ranges)
+
+    def __len__(self):
+        return sum(stop - start for start, stop in self._ranges)
+
+    def __bool__(self):
+        return bool(self._ranges)
+
+    def __iter__(self):
+        for start, stop in self._ranges:
+            yield from range(start, stop)
+
+    def __contains__(self, row):
+        i = bisect_right(self._ranges, (row, float("inf"))) - 1
+        return i >= 0 and self._ranges[i][0] <= row < self._ranges[i][1]
+
+    def __eq__(self, other):
+        if not isinstance(other, PageSelection):
+            return NotImplemented
+        return self._ranges == other._ranges
+
+    def __repr__(self):
+        return f"PageSelection({self._ranges!r})"
+
+    def __or__(self, other):
+        return PageSelection(self._ranges + other._ranges)
+
+    def __and__(self, other):
+        result = []
+        a, b = self._ranges, other._ranges
+        i = j = 0
+        while i < len(a) and j < len(b):
+            start = max(a[i][0], b[j][0])
+            stop = min(a[i][1], b[j][1])
+            if start < stop:
+                result.append((start, stop))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return PageSelection._from_sorted(result)
+
+    def __sub__(self, other):
+        result = []
+        removed = other._ranges
+        j = 0
+        for start, stop in self._ranges:
+            while j < len(removed) and removed[j][1] <= start:
+                j += 1
+            k = j
+            while k < len(removed) and removed[k][0] < stop:
+                if removed[k][0] > start:
+                    result.append((start, removed[k][0]))
+                start = max(start, removed[k][1])
+                k += 1
+            if start < stop:
+                result.append((start, stop))
+        return PageSelection._from_sorted(result)
+
+    def invert(self, count):
+        """The rows below count that are not selected."""
+        return PageSelection.span(0, count) - self
+
+
+# ---------------------------
+# Expressions
+# ---------------------------
+def parse_selection(text: str, count: int, document=None) -> PageSelection:
+    """
+    Evaluate a selection expression (see the module docstring) on a
+    document of count pages. Predicates (landscape, file:...) need the
+    Document. Invalid terms, and pages that are not in the document,
+    raise SelectionError; a term that matches no page is not an error.
+    """
+    result = None
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+
+        negate = False
+        if part.startswith("!"):
+            negate, part = True, part[1:].strip()
+        elif part.lower().startswith("not "):
+            negate, part = True, part[4:].strip()
+
+        selected = None
+        for atom in part.split("&"):
+            atom = atom.strip()
+            if atom.startswith("!"):
+                matched = _evaluate(atom[1:].strip(), count, document).invert(count)
+            else:
+                matched = _evaluate(atom, count, document)
+            selected = matched if selected is None else selected & matched
+
+        if negate:
+            base = result if result is not None else PageSelection.span(0, count)
+            result = base - selected
+        else:
+            result = selected if result is None else result | selected
+
+    return result if result is not None else PageSelection()
+
+
+def _evaluate(word, count, document):
+    keyword = word.lower()
+    if keyword == "all":
+        return PageSelection.span(0, count)
+    if keyword == "even":
+        return PageSelection.span(1, count, 2)
+    if keyword == "odd":
+        return PageSelection.span(0, count, 2)
+    if keyword in ("landscape", "portrait", "rotated") or keyword.startswith("file:"):
+        if document is None:
+            raise SelectionError(f"'{word}' needs an open document")
+        return _predicate(keyword, word, count, document)
+    return _page_range(word, count)
+
+
+def _page_range(word, count):
+    match = _RANGE.match(word.lower())
+    if not word or not match or not (match.group(1) or match.group(3)):
+        raise SelectionError(f"invalid page range: {word}")
+    first_text, dash, last_text, step_text = match.groups()
+
+    def number(text, default):
+        if text is None:
+            return default
+        if text == "last":
+            return count
+        if int(text) < 1:
+            raise SelectionError(f"page numbers start at 1: {word}")
+        return int(text)
+
+    first = number(first_text, 1)
+    last = number(last_text, count) if dash else first
+    if not dash and last_text is not None:
+        raise SelectionError(f"invalid page range: {word}")
+    step = int(step_text) if step_text else 1
+    if step < 1:
+        raise SelectionError(f"invalid step in {word}")
+
+    if first > last:
+        first, last = last, first
+    if first > count:
+        raise SelectionError(f"no page {first}, the document has {count}: {word}")
+    # 1-based inclusive pages -> 0-based rows, clamped to the document
+    return PageSelection.span(max(first, 1) - 1, min(last, count), step)
+
+
+def _predicate(keyword, word, count, document):
+    pages = document.pages
+    if keyword == "rotated":
+        rotations = pages.rotations()
+        return PageSelection.from_rows(row for row in range(count) if rotations[row])
+
+    if keyword.startswith("file:"):
+        pattern = word[5:].strip().lower()
+        sources, ids = pages.source_documents()
+        matching = {n for n, source in enumerate(sources) if _file_matches(source, pattern)}
+        return PageSelection.from_rows(row for row in range(count) if ids[row] in matching)
+
+    wanted = keyword == "landscape"
+    rows = []
+    for row in range(count):
+        width, height = document.page_size(pages[row])
+        if (width > height) == wanted:
+            rows.append(row)
+    return PageSelection.from_rows(rows)
+
+
+def _file_matches(source, pattern):
+    path = str(source).lower()
+    name = os.path.basename(path)
+    stem = os.path.splitext(name)[0]
+    return any(fnmatch.fnmatchcase(candidate, pattern) for candidate in (name, stem, path))
@@ -0,0 +1,225 @@
+# instrumentation.py
+"""
+Opt-in timing and counting of the expensive operations.
+
+Code marks what it does with spans and counters:
+
+    with instrumentation.span("render.page", page=3):
+        pix = page.get_pixmap(...)
+    instrumentation.count("cache.viewer.hit")
+
+While recording is off (the default) span() hands back one shared
+object that does nothing and count() returns at once, so the marks can
+stay in hot paths. While it is on, every span updates a per-name
+summary (count, total, max) read by stats(), and is kept as a trace
+event; dump_trace() writes the events as Chrome trace-event JSON, which
+chrome://tracing, Perfetto and speedscope open.
+
+Recording is switched on with enable(), from the GUI, or for a whole
+run by setting PDF_EDITOR_TRACE to the file the trace is written to at
+exit. Nothing here imports Qt.
+"""
+import atexit
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# Trace events kept in memory; the summaries keep counting beyond it.
+MAX_TRACE_EVENTS = 500_000
+
+_enabled = False
+_lock = threading.Lock()
+_origin_ns = time.perf_counter_ns()
+_spans = {}      # name -> [count, total_ns, max_ns]
+_counters = {}   # name -> value
+_events = []     # Chrome trace events
+_dropped = 0
+
+
+# ---------------------------
+# Switching on and off
+# ---------------------------
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget everything recorded so far."""
+    global _dropped
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+        _dropped = 0
+
+
+# ---------------------------
+# Recording
+# ---------------------------
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter_ns(), **self.args)
+        return False
+
+
+def span(name, **args):
+    """Context manager timing the block it wraps under name."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def timed(name):
+    """Decorator: time every call of the function under name."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, start_ns, end_ns, **args):
+    """
+    Record a span that was timed elsewhere, e.g. a render that started
+    when it was handed to a worker process and ended when it came back.
+    start_ns and end_ns are time.perf_counter_ns() values.
+    """
+    global _dropped
+    if not _enabled:
+        return
+    duration = end_ns - start_ns
+    with _lock:
+        summary = _spans.get(name)
+        if summary is None:
+            _spans[name] = [1, duration, duration]
+        else:
+            summary[0] += 1
+            summary[1] += duration
+            if duration > summary[2]:
+                summary[2] = duration
+        if len(_events) < MAX_TRACE_EVENTS:
+            event = {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": (start_ns - _origin_ns) / 1000,
+                "dur": duration / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            }
+            if args:
+                event["args"] = args
+            _events.append(event)
+        else:
+            _dropped += 1
+
+
+def count(name, n=1):
+    """Add n to the counter name."""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+def stats():
+    """
+    {"spans": {name: {count, total_ms, mean_ms, max_ms}},
+     "counters": {name: value}, "events": n, "dropped": n}
+    """
+    with _lock:
+        spans = {
+            name: {
+                "count": n,
+                "total_ms": total / 1e6,
+                "mean_ms": total / n / 1e6,
+                "max_ms": longest / 1e6,
+            }
+            for name, (n, total, longest) in _spans.items()
+        }
+        return {
+            "spans": spans,
+            "counters": dict(_counters),
+            "events": len(_events),
+            "dropped": _dropped,
+        }
+
+
+def dump_trace(path):
+    """Write the recorded events to path as Chrome trace-event JSON."""
+    with _lock:
+        events = list(_events)
+        counters = dict(_counters)
+        dropped = _dropped
+    now = (time.perf_counter_ns() - _origin_ns) / 1000
+    pid = os.getpid()
+    # Final counter values, so the viewer shows them next to the spans
+    for name, value in sorted(counters.items()):
+        events.append({"name": name, "ph": "C", "ts": now, "pid": pid, "args": {"value": value}})
+    trace = {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"dropped_events": dropped},
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    os.replace(tmp, path)
+
+
+def _dump_at_exit(path):
+    try:
+        dump_trace(path)
+    except OSError:
+        pass
+
+
+# Worker processes inherit the variable; only the main process records,
+# renders on workers are timed from the GUI side (see RenderService).
+_trace_path = os.environ.get("PDF_EDITOR_TRACE")
+if _trace_path and multiprocessing.parent_process() is None:
+    enable()
+    atexit.register(_dump_at_exit, _trace_path)
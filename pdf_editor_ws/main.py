@@ -1,9 +1,19 @@
 # main.py
 import sys
-from PySide6.QtWidgets import QApplication
-from viewer import PDFViewer
+import multiprocessing
 
 if __name__ == "__main__":
+    # Thumbnails render in worker processes; needed for frozen builds
+    multiprocessing.freeze_support()
+
+    # With arguments, run headless: the command line never imports Qt
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+
+    from PySide6.QtWidgets import QApplication
+    from viewer import PDFViewer
+
     app = QApplication(sys.argv)
     viewer = PDFViewer()
     viewer.show()
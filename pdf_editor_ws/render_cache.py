@@ -0,0 +1,96 @@
+# render_cache.py
+from collections import OrderedDict
+
+import instrumentation
+
+
+def page_key(page_obj, zoom):
+    """Cache key of a rendered page: everything that changes the image."""
+    return (page_obj.source_document, page_obj.source_page_index, page_obj.rotation, zoom)
+
+
+class RenderCache:
+    """
+    LRU cache for rendered page images with a memory budget.
+
+    Keys are usually (source_document, source_page_index, rotation, zoom)
+    so an entry stays valid for as long as the page it was rendered
+    from is unchanged. Values are opaque (QPixmap, QImage, bytes...);
+    the caller passes their size in bytes when storing them.
+
+    Lookups are counted by instrumentation as cache.<name>.hit/miss.
+    """
+    def __init__(self, max_megabytes=64, name="render"):
+        self.name = name
+        self._hit_counter = f"cache.{name}.hit"
+        self._miss_counter = f"cache.{name}.miss"
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            instrumentation.count(self._miss_counter)
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        instrumentation.count(self._hit_counter)
+        return entry[0]
+
+    def put(self, key, value, nbytes):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[1]
+
+        # An entry bigger than the whole budget would only evict
+        # everything else and then itself.
+        if nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+        self._evict()
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def set_budget(self, max_megabytes):
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.current_bytes -= nbytes
+            self.evictions += 1
+            instrumentation.count(f"cache.{self.name}.eviction")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,158 @@
+# render_service.py
+import os
+import time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtGui import QImage
+
+import render_worker
+from document_model import DocumentPool, is_file
+import instrumentation
+
+
+def default_worker_count():
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+class RenderService(QObject):
+    """
+    Renders pages on a pool of worker processes and delivers the results
+    back on the GUI thread through the `rendered` signal.
+
+    A request is identified by its key, (source_document,
+    source_page_index, rotation, zoom). Requests wait in a queue and only
+    a few per worker are handed to the pool at a time. Views cancel the
+    queue when they scroll (cancel_pending) and then request what they
+    paint, so what is on screen is rendered first. Pages of sources held
+    in memory are rendered here instead: a worker could only get them as
+    a copy. They are opened through pool, e.g. the document's own, so
+    that the GUI process does not open them a second time.
+    """
+    rendered = Signal(object, QImage)  # key, image
+    failed = Signal(object, str)  # key, error message
+
+    # Emitted from the pool's callback thread; queued to the GUI thread.
+    _finished = Signal(object, object, object, object)  # key, generation, result, error
+
+    def __init__(self, workers=None, parent=None, pool=None):
+        super().__init__(parent)
+        self.document_pool = pool if pool is not None else DocumentPool()
+        self.workers = workers or default_worker_count()
+        self.max_in_flight = self.workers * 2
+        self._executor = None
+        self._pending = OrderedDict()  # key -> None, front is rendered first
+        self._in_flight = set()
+        self._submitted = {}  # key -> perf_counter_ns() when handed to the pool
+        self._futures = set()
+        self._generation = 0  # bumped by shutdown(): older results are dropped
+        self._finished.connect(self._on_finished)
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: the GUI process has Qt loaded, workers must not inherit it
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    # --------------------------
+    # Requests
+    # --------------------------
+    def request(self, key):
+        """Queue a render unless it is already queued or running."""
+        if key in self._in_flight or key in self._pending:
+            return
+        self._pending[key] = None
+        instrumentation.count("render.requested")
+        self._pump()
+
+    def is_in_flight(self, key):
+        return key in self._in_flight
+
+    def cancel_pending(self):
+        """Drop everything that has not been handed to a worker yet."""
+        if self._pending:
+            instrumentation.count("render.cancelled", len(self._pending))
+            self._pending.clear()
+
+    def shutdown(self):
+        """
+        Drop every request, queued or running, and stop the workers;
+        results still on their way are ignored. Fresh workers start on
+        the next request, e.g. after a file was saved over: workers keep
+        source files open and would still render its old pages.
+        """
+        self._generation += 1
+        self._pending.clear()
+        self._in_flight.clear()
+        self._submitted.clear()
+        for future in list(self._futures):
+            future.cancel()
+        self._futures.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # --------------------------
+    # Pool plumbing
+    # --------------------------
+    def _pump(self):
+        while self._pending and len(self._in_flight) < self.max_in_flight:
+            key, _ = self._pending.popitem(last=False)
+            self._in_flight.add(key)
+            if not is_file(key[0]):
+                # Rendered from the event loop, so results still arrive after request()
+                QTimer.singleShot(0, lambda key=key, generation=self._generation:
+                                  self._render_here(key, generation))
+                continue
+            self._submitted[key] = time.perf_counter_ns()
+            future = self._pool().submit(render_worker.render_key, key)
+            self._futures.add(future)
+            future.add_done_callback(
+                lambda f, key=key, generation=self._generation: self._deliver(key, generation, f))
+
+    def _deliver(self, key, generation, future):
+        # Pool callback thread: the service may have been shut down, or
+        # deleted along with its window, since the render was submitted
+        self._futures.discard(future)
+        if future.cancelled() or generation != self._generation:
+            return
+        error = future.exception()
+        try:
+            self._finished.emit(key, generation, None if error else future.result(), error)
+        except RuntimeError:
+            pass  # the QObject is gone
+
+    def _render_here(self, key, generation):
+        if generation != self._generation:
+            return
+        try:
+            with instrumentation.span("render.local", page=key[1], zoom=key[3]):
+                result, error = render_worker.render_page_samples(
+                    *key, pool=self.document_pool), None
+        except (RuntimeError, ValueError, IndexError) as exc:
+            result, error = None, exc
+        self._on_finished(key, generation, result, error)
+
+    def _on_finished(self, key, generation, result, error):
+        if generation != self._generation:
+            return  # rendered before shutdown()
+        self._in_flight.discard(key)
+        # Time in the pool, as seen from here: queueing, transfer and render
+        submitted = self._submitted.pop(key, None)
+        if submitted is not None:
+            instrumentation.record("render.worker", submitted, time.perf_counter_ns(),
+                                   page=key[1], zoom=key[3], failed=error is not None)
+        if error is None:
+            width, height, stride, alpha, samples = result
+            fmt = QImage.Format_RGBA8888 if alpha else QImage.Format_RGB888
+            # copy() detaches the image from the Python bytes buffer
+            image = QImage(samples, width, height, stride, fmt).copy()
+            self.rendered.emit(key, image)
+        else:
+            self.failed.emit(key, str(error))
+        self._pump()
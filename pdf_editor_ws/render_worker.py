@@ -0,0 +1,32 @@
+# render_worker.py
+"""
+Page rendering that runs inside worker processes.
+
+Nothing here imports Qt: workers only need PyMuPDF, which keeps their
+start-up cheap. Each worker process keeps its own DocumentPool, since
+fitz handles cannot be shared between processes.
+"""
+import fitz  # PyMuPDF
+from document_model import DocumentPool
+
+_pool = DocumentPool()  # per worker process
+
+
+def render_page_samples(source_document, source_page_index, rotation=0, zoom=0.2,
+                        pool=None):
+    """
+    Render one page and return (width, height, stride, alpha, samples)
+    where samples is the raw pixel buffer as bytes, ready to be wrapped
+    in a QImage by the GUI process. The source is opened through pool,
+    the worker's own by default.
+    """
+    pool = pool if pool is not None else _pool
+    page = pool.get(source_document)[source_page_index]
+    mat = fitz.Matrix(zoom, zoom).prerotate(rotation)
+    pix = page.get_pixmap(matrix=mat)
+    return pix.width, pix.height, pix.stride, bool(pix.alpha), pix.samples
+
+
+def render_key(key):
+    """Process-pool entry point: key is (source, page_index, rotation, zoom)."""
+    return render_page_samples(*key)
@@ -0,0 +1,129 @@
+# stats_panel.py
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget,
+    QTableWidgetItem, QHeaderView, QFileDialog, QLabel, QDockWidget
+)
+from PySide6.QtCore import Qt, QTimer
+import instrumentation
+
+# How often the panel re-reads the statistics while it is shown, in ms.
+REFRESH_INTERVAL_MS = 500
+
+
+class StatsPanel(QWidget):
+    """
+    Live view of instrumentation.stats(): one row per span name (count,
+    total, mean and longest time) and per counter, with buttons to start
+    and stop recording, reset, and save a trace file.
+
+    Recording is global to the process, so every panel shows the same
+    numbers. The panel only refreshes while it is visible.
+    """
+    COLUMNS = ("Name", "Count", "Total ms", "Mean ms", "Max ms")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout(self)
+
+        buttons = QHBoxLayout()
+        self.record_button = QPushButton("Record")
+        self.record_button.setCheckable(True)
+        self.record_button.toggled.connect(self.set_recording)
+        btn_reset = QPushButton("Reset")
+        btn_reset.clicked.connect(self.reset)
+        btn_save = QPushButton("Save Trace...")
+        btn_save.clicked.connect(self.save_trace)
+        buttons.addWidget(self.record_button)
+        buttons.addWidget(btn_reset)
+        buttons.addWidget(btn_save)
+        layout.addLayout(buttons)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.summary = QLabel()
+        layout.addWidget(self.summary)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    # ---------- Recording ----------
+    def set_recording(self, on):
+        if on:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+        self.refresh()
+
+    def reset(self):
+        instrumentation.reset()
+        self.refresh()
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Trace", "pdf-editor-trace.json", "Trace Files (*.json)"
+        )
+        if path:
+            instrumentation.dump_trace(path)
+
+    # ---------- Display ----------
+    def refresh(self):
+        recording = instrumentation.is_enabled()
+        if self.record_button.isChecked() != recording:
+            # Recording may have been switched on elsewhere (another
+            # panel, PDF_EDITOR_TRACE); don't toggle it back.
+            self.record_button.blockSignals(True)
+            self.record_button.setChecked(recording)
+            self.record_button.blockSignals(False)
+        self.record_button.setText("Stop" if recording else "Record")
+
+        stats = instrumentation.stats()
+        rows = [(name, s["count"], s["total_ms"], s["mean_ms"], s["max_ms"])
+                for name, s in sorted(stats["spans"].items())]
+        rows += [(name, value, None, None, None)
+                 for name, value in sorted(stats["counters"].items())]
+
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                if value is None:
+                    text = ""
+                elif isinstance(value, float):
+                    text = f"{value:.2f}"
+                else:
+                    text = str(value)
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                item.setText(text)
+
+        dropped = f", {stats['dropped']} dropped" if stats["dropped"] else ""
+        self.summary.setText(f"{stats['events']} trace events{dropped}")
+
+    def showEvent(self, event):
+        self.refresh()
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+
+def create_stats_dock(parent) -> QDockWidget:
+    """A hidden 'Performance' dock holding a StatsPanel, for parent's View menus."""
+    dock = QDockWidget("Performance", parent)
+    dock.setAllowedAreas(Qt.LeftDockWidgetArea | Qt.RightDockWidgetArea | Qt.BottomDockWidgetArea)
+    dock.setWidget(StatsPanel(dock))
+    parent.addDockWidget(Qt.RightDockWidgetArea, dock)
+    dock.hide()
+    return dock
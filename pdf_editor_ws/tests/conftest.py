@@ -0,0 +1,117 @@
+# tests/conftest.py
+import os
+import re
+import sys
+
+import pytest
+import fitz  # PyMuPDF
+
+# The modules are imported as top-level modules, as main.py does
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def write_pdf(path, count, prefix="P", width=200, height=300):
+    """A PDF of count pages, each showing its prefix and number."""
+    doc = fitz.open()
+    for i in range(count):
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((20, 50), f"{prefix}{i}")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def page_texts(path):
+    """(text, rotation) of every page; fails if MuPDF had to repair the file."""
+    doc = fitz.open(str(path))
+    try:
+        assert not doc.is_repaired
+        return [(page.get_text().strip(), page.rotation) for page in doc]
+    finally:
+        doc.close()
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The QApplication; widgets need one, so it is not a QCoreApplication."""
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    def make(name, count, prefix="P", **kwargs):
+        return write_pdf(tmp_path / name, count, prefix, **kwargs)
+    return make
+
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_TRAILER_PREV = re.compile(rb"/Prev\s+(\d+)")
+_TRAILER_SIZE = re.compile(rb"/Size\s+(\d+)")
+
+
+def xref_entries(path):
+    """
+    {object number: (kind, offset or object stream, generation)} of a
+    PDF, read from its cross-reference sections the way a strict reader
+    does (newest first, no repair), and its /Size. kind is "n" (in
+    use), "f" (free) or "o" (in an object stream). Every in-use offset
+    is checked to point at the object's header, generation included.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    doc = fitz.open(str(path))
+    entries = {}
+    size = None
+    offset = int(_STARTXREF.findall(data[-1024:])[-1])
+    while offset is not None:
+        if data.startswith(b"xref", offset):
+            position = offset + 4
+            end = data.index(b"trailer", position)
+            lines = data[position:end].split()
+            i = 0
+            while i < len(lines):
+                start, count = int(lines[i]), int(lines[i + 1])
+                i += 2
+                for number in range(start, start + count):
+                    value, generation, kind = lines[i:i + 3]
+                    entries.setdefault(number, (kind.decode(), int(value), int(generation)))
+                    i += 3
+            trailer = data[end:data.index(b"startxref", end)]
+        else:
+            number = int(re.match(rb"\s*(\d+)\s+\d+\s+obj", data[offset:]).group(1))
+            trailer = doc.xref_object(number, compressed=True).encode()
+            widths = [int(w) for w in re.search(rb"/W\s*\[([^\]]*)\]", trailer).group(1).split()]
+            index = re.search(rb"/Index\s*\[([^\]]*)\]", trailer)
+            stream_size = int(_TRAILER_SIZE.search(trailer).group(1))
+            ranges = [int(n) for n in index.group(1).split()] if index else [0, stream_size]
+            raw = doc.xref_stream(number)
+            position = 0
+            for start, count in zip(ranges[::2], ranges[1::2]):
+                for number in range(start, start + count):
+                    fields = []
+                    for width in widths:
+                        fields.append(int.from_bytes(raw[position:position + width], "big")
+                                      if width else None)
+                        position += width
+                    kind = {0: "f", 1: "n", 2: "o"}[1 if fields[0] is None else fields[0]]
+                    entries.setdefault(number, (kind, fields[1], fields[2] or 0))
+        if size is None:
+            size = int(_TRAILER_SIZE.search(trailer).group(1))
+        prev = _TRAILER_PREV.search(trailer)
+        offset = int(prev.group(1)) if prev else None
+    doc.close()
+    for number, (kind, value, generation) in entries.items():
+        if kind == "n" and number:
+            header = re.match(rb"\s*(\d+)\s+(\d+)\s+obj", data[value:value + 32])
+            assert header and int(header.group(1)) == number, (number, value)
+            assert int(header.group(2)) == generation, (number, generation)
+    return entries, size
+
+
+def assert_xref_complete(path):
+    """Every object number below /Size has an entry, as strict readers require."""
+    entries, size = xref_entries(path)
+    missing = sorted(set(range(size)) - entries.keys())
+    assert not missing, f"no xref entry for objects {missing[:10]}"
@@ -0,0 +1,30 @@
+# tests/test_batch.py
+import json
+import os
+
+import batch
+from conftest import page_texts
+
+
+def test_paths_are_relative_to_the_manifest(tmp_path, make_pdf, monkeypatch):
+    jobs_dir = tmp_path / "jobs" / "sub"
+    jobs_dir.mkdir(parents=True)
+    make_pdf("jobs/sub/in.pdf", 2, "A")
+    make_pdf("jobs/b.pdf", 1, "B")  # ../b.pdf from the manifest, not from the CWD
+    manifest = jobs_dir / "manifest.json"
+    manifest.write_text(json.dumps({"jobs": [{
+        "id": "one",
+        "input": "in.pdf",
+        "operations": ["merge ../b.pdf start", "export out/first.pdf"],
+        "output": "out/all.pdf",
+    }]}))
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+
+    summary = batch.run_batch(batch.load_manifest(str(manifest)), workers=1)
+
+    assert [result.ok for result in summary.results] == [True], summary.results[0].error
+    assert [text for text, _ in page_texts(jobs_dir / "out" / "all.pdf")] == ["B0", "A0", "A1"]
+    assert os.path.exists(jobs_dir / "out" / "first.pdf")
+    assert os.listdir(elsewhere) == []
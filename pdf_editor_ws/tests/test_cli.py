@@ -0,0 +1,106 @@
+# tests/test_cli.py
+import pytest
+
+import cli
+from conftest import page_texts
+from document_model import Document
+
+
+def test_operations_after_a_save_over_the_input(make_pdf, tmp_path):
+    path = make_pdf("in.pdf", 2)
+    after = str(tmp_path / "after.pdf")
+    document = Document(path)
+    try:
+        cli.run_operations(document, [("select", ["1"]), ("rotate", ["90"]), ("save", [path]),
+                                      ("rotate", ["90"]), ("save", [after])])
+    finally:
+        document.close()
+    assert page_texts(path) == [("P0", 90), ("P1", 0)]
+    assert page_texts(after) == [("P0", 180), ("P1", 90)]  # every page selected after the save
+
+
+def test_export_over_the_input_then_edit(make_pdf, tmp_path):
+    path = make_pdf("in.pdf", 3)
+    after = str(tmp_path / "after.pdf")
+    assert cli.main([path, "-q", "--select", "2-3", "--export", path,
+                     "--select", "1", "--delete", "--save", after]) == 0
+    assert [text for text, _ in page_texts(path)] == ["P1", "P2"]
+    assert [text for text, _ in page_texts(after)] == ["P2"]
+
+
+def test_parse_script():
+    script = [
+        "# a comment line",
+        "select 1-3,8   # trailing comment",
+        "",
+        "ROTATE 180",
+        "merge 'my scans/extra file.pdf' after 2",
+        'export "out dir/selected.pdf"',
+    ]
+    assert cli.parse_script(script) == [
+        ("select", ["1-3,8"]),
+        ("rotate", ["180"]),
+        ("merge", ["my scans/extra file.pdf", "after", "2"]),
+        ("export", ["out dir/selected.pdf"]),
+    ]
+    with pytest.raises(cli.OperationError, match="line 2"):
+        cli.parse_script(["select 1", "save 'unterminated.pdf"])
+
+
+def test_options_keep_their_order():
+    options = cli.build_parser().parse_args([
+        "in.pdf", "--select", "2", "--rotate", "--merge-after", "3", "x.pdf",
+        "--select", "odd", "--delete", "--merge-start", "y.pdf", "-o", "out.pdf",
+    ])
+    assert [cli._normalize(name, args) for name, args in options.operations] == [
+        ("select", ["2"]),
+        ("rotate", []),
+        ("merge", ["x.pdf", "after", "3"]),
+        ("select", ["odd"]),
+        ("delete", []),
+        ("merge", ["y.pdf", "start"]),
+        ("save", ["out.pdf"]),
+    ]
+
+
+@pytest.mark.parametrize("operations, message", [
+    ([("explode", [])], "unknown operation"),
+    ([("rotate", ["45"])], "multiple of 90"),
+    ([("rotate", ["ninety"])], "invalid angle"),
+    ([("select", ["1", "2"])], "one page range"),
+    ([("select", ["9"])], "no page 9"),
+    ([("merge", ["x.pdf", "before", "2"])], "invalid merge position"),
+    ([("save", [])], "needs an output file"),
+    ([("select", ["1"]), ("delete", []), ("export", ["x.pdf"])], "no pages"),
+])
+def test_operation_errors(make_pdf, operations, message):
+    document = Document(make_pdf("in.pdf", 3))
+    try:
+        with pytest.raises(cli.OperationError, match=message):
+            cli.run_operations(document, operations)
+    finally:
+        document.close()
+
+
+def test_main(make_pdf, tmp_path, capsys):
+    path = make_pdf("in.pdf", 4)
+    extra = make_pdf("extra.pdf", 1, "X")
+    out = tmp_path / "out.pdf"
+    selected = tmp_path / "selected.pdf"
+    script = tmp_path / "ops.txt"
+    script.write_text(f"select even\nrotate 270\nexport '{selected}'\n")
+
+    assert cli.main([path, "--merge-after", "1", extra, "--script", str(script),
+                     "--select", "last", "--delete", "-o", str(out)]) == 0
+    # The script runs after the options
+    assert page_texts(out) == [("P0", 0), ("X0", 0), ("P1", 0), ("P2", 0)]
+    assert page_texts(selected) == [("X0", 270), ("P2", 270)]
+    assert "wrote 4 pages" in capsys.readouterr().err
+
+    assert cli.main([path, "-q", "--select", "7", "-o", str(out)]) == 2
+    assert "no page 7" in capsys.readouterr().err
+    assert cli.main([str(tmp_path / "missing.pdf"), "-q", "-o", str(out)]) == 1
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([path])  # no operations
+    assert exit_info.value.code == 2
+    assert page_texts(path) == [(f"P{n}", 0) for n in range(4)]  # input untouched
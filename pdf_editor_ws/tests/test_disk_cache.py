@@ -0,0 +1,48 @@
+# tests/test_disk_cache.py
+import time
+
+from disk_cache import DiskThumbnailCache
+
+
+def wait_for_digest(cache, source, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        digest = cache.source_digest(source)
+        if digest is not None:
+            return digest
+        time.sleep(0.01)
+    raise AssertionError("the source was never hashed")
+
+
+def test_hashing_does_not_block_and_is_kept_across_sessions(tmp_path, make_pdf):
+    source = make_pdf("a.pdf", 3)
+    cache = DiskThumbnailCache(str(tmp_path / "cache"))
+    key = (source, 0, 0, 0.2)
+
+    # Not known yet: a miss, hashed in the background
+    assert cache.get(key) is None
+    digest = wait_for_digest(cache, source)
+    cache.put(key, b"thumbnail")
+    assert cache.get(key) == b"thumbnail"
+
+    # A new session finds the hash on disk without reading the file
+    later = DiskThumbnailCache(str(tmp_path / "cache"))
+    assert later.source_digest(source) == digest
+    assert later.get(key) == b"thumbnail"
+
+
+def test_modified_file_does_not_match_old_thumbnails(tmp_path, make_pdf):
+    source = make_pdf("a.pdf", 3)
+    cache = DiskThumbnailCache(str(tmp_path / "cache"))
+    key = (source, 0, 0, 0.2)
+    wait_for_digest(cache, source)
+    cache.put(key, b"old")
+
+    make_pdf("a.pdf", 4)
+    wait_for_digest(cache, source)
+    assert cache.get(key) is None
+
+
+def test_memory_sources_are_not_cached(tmp_path):
+    cache = DiskThumbnailCache(str(tmp_path / "cache"))
+    assert cache.source_digest(b"%PDF-1.7") is None
@@ -0,0 +1,61 @@
+# tests/test_editor.py
+import time
+
+import pytest
+
+from conftest import page_texts
+from document_model import Document
+
+
+@pytest.fixture
+def editor(app, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_EDITOR_CACHE_DIR", str(tmp_path / "cache"))
+    from edit_mode.editor import PDFEditor
+
+    document = Document(make_pdf("a.pdf", 4))
+    window = PDFEditor(document)
+    yield window
+    window.renderer.shutdown()
+    window.deleteLater()
+    document.close()
+
+
+def wait_for_save(app, editor, timeout=60):
+    deadline = time.monotonic() + timeout
+    while editor.save_job is not None and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.02)
+    assert editor.save_job is None
+
+
+def test_edits_are_blocked_while_saving_over_the_open_file(app, editor):
+    document = editor.document
+    path = document.file_path
+    editor.select_pages("all")
+    editor.rotate_selected(90)
+    editor.optimize_action.setChecked(True)  # a full rewrite, in the writer process
+    editor._start_save(document.pages, path, "Saving")
+    assert editor.save_job is not None
+
+    assert not editor.undo_action.isEnabled()
+    assert not any(button.isEnabled() for button in editor._edit_buttons)
+    editor.delete_selected()
+    editor.undo()
+    assert [page.rotation for page in document.pages] == [90] * 4
+
+    wait_for_save(app, editor)
+    assert all(button.isEnabled() for button in editor._edit_buttons)
+    assert [page.rotation for page in document.pages] == [0] * 4  # reloaded
+    assert page_texts(path) == [(f"P{n}", 90) for n in range(4)]
+
+
+def test_saving_elsewhere_keeps_editing_and_history(app, editor, tmp_path):
+    document = editor.document
+    editor.select_pages("all")
+    editor.rotate_selected(90)
+    editor.optimize_action.setChecked(True)
+    editor._start_save(document.pages, str(tmp_path / "out.pdf"), "Saving")
+    assert all(button.isEnabled() for button in editor._edit_buttons)
+    wait_for_save(app, editor)
+    assert editor.history.can_undo()
+    assert page_texts(tmp_path / "out.pdf") == [(f"P{n}", 90) for n in range(4)]
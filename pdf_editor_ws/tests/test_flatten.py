@@ -0,0 +1,113 @@
+# tests/test_flatten.py
+import importlib.util
+
+import pytest
+import fitz  # PyMuPDF
+
+from document_model import Document
+import edit_mode.pdf_operations as pdf_ops
+from edit_mode.pdf_operations import FlattenOptions
+
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+
+@pytest.fixture
+def document(tmp_path):
+    """Page 1 has colour, page 2 is black text on white; both 144 x 216 pt."""
+    doc = fitz.open()
+    page = doc.new_page(width=144, height=216)
+    page.draw_rect(fitz.Rect(20, 20, 120, 120), color=(1, 0, 0), fill=(0, 0, 1))
+    page = doc.new_page(width=144, height=216)
+    page.insert_text((20, 50), "Gray page")
+    path = str(tmp_path / "in.pdf")
+    doc.save(path)
+    doc.close()
+    document = Document(path)
+    yield document
+    document.close()
+
+
+def flatten(document, tmp_path, workers=0, **options):
+    """(width, height, "rgb" or "gray", filter, stream size) of each page's image."""
+    out = str(tmp_path / "flat.pdf")
+    pdf_ops.write_pages(document, list(document.pages), out,
+                        rasterize=FlattenOptions(**options), workers=workers)
+    doc = fitz.open(out)
+    try:
+        images = []
+        for page in doc:
+            (xref, _, width, height, _, _, _, _, image_filter, _), = page.get_images(full=True)
+            assert not page.get_text().strip()  # only the image is left
+            # MuPDF stores ICC-based colour spaces: tell them by their components
+            colorspace = {1: "gray", 3: "rgb"}[fitz.Pixmap(doc, xref).colorspace.n]
+            images.append((width, height, colorspace, image_filter, len(doc.xref_stream_raw(xref))))
+        return images
+    finally:
+        doc.close()
+
+
+def test_defaults(document, tmp_path):
+    (colour, gray) = flatten(document, tmp_path)
+    assert colour[:4] == (300, 450, "rgb", "DCTDecode")  # 150 dpi
+    assert gray[:4] == (300, 450, "gray", "DCTDecode")  # auto: no colour shown
+
+
+@pytest.mark.parametrize("dpi, size", [(72, (144, 216)), (300, (600, 900))])
+def test_dpi(document, tmp_path, dpi, size):
+    assert [image[:2] for image in flatten(document, tmp_path, dpi=dpi)] == [size, size]
+
+
+@pytest.mark.parametrize("colorspace, expected", [
+    ("rgb", ["rgb", "rgb"]),
+    ("gray", ["gray", "gray"]),
+    ("auto", ["rgb", "gray"]),
+])
+def test_colorspace(document, tmp_path, colorspace, expected):
+    assert [image[2] for image in flatten(document, tmp_path, colorspace=colorspace)] == expected
+
+
+def test_flate_compression(document, tmp_path):
+    assert [image[3] for image in flatten(document, tmp_path, compression="flate")] == \
+        ["FlateDecode", "FlateDecode"]
+
+
+def test_quality(document, tmp_path):
+    low = flatten(document, tmp_path, quality=5, colorspace="rgb")
+    high = flatten(document, tmp_path, quality=95, colorspace="rgb")
+    assert all(l[4] < h[4] for l, h in zip(low, high))
+
+
+def test_rotated_pages_are_rendered_turned(document, tmp_path):
+    document.pages[0].rotation = 90
+    colour, gray = flatten(document, tmp_path, dpi=72)
+    assert colour[:2] == (216, 144) and gray[:2] == (144, 216)
+
+
+def test_worker_processes_render_the_same(document, tmp_path):
+    assert [image[:4] for image in flatten(document, tmp_path, workers=1)] == \
+        [image[:4] for image in flatten(document, tmp_path)]
+
+
+@pytest.mark.skipif(not HAS_PILLOW, reason="JPEG 2000 needs Pillow")
+def test_jpx_compression(document, tmp_path):
+    assert [image[3] for image in flatten(document, tmp_path, compression="jpx")] == \
+        ["JPXDecode", "JPXDecode"]
+
+
+@pytest.mark.parametrize("options", [
+    {"dpi": 10}, {"dpi": 5000}, {"colorspace": "cmyk"}, {"compression": "png"},
+    {"quality": 0}, {"quality": 101},
+] + ([] if HAS_PILLOW else [{"compression": "jpx"}]))
+def test_invalid_options(options):
+    with pytest.raises(ValueError):
+        FlattenOptions(**options)
+
+
+def test_from_value():
+    assert FlattenOptions.from_value(False) is None
+    assert FlattenOptions.from_value(None) is None
+    assert FlattenOptions.from_value(True).dpi == 150
+    options = FlattenOptions.from_value({"dpi": 200, "colorspace": "gray"})
+    assert (options.dpi, options.colorspace, options.compression) == (200, "gray", "jpeg")
+    with pytest.raises(ValueError):
+        FlattenOptions.from_value({"dpl": 200})
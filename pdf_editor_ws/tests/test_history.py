@@ -0,0 +1,74 @@
+# tests/test_history.py
+from PySide6.QtCore import QModelIndex
+
+from document_model import Document, PageTable
+from edit_mode.history import EditHistory, MoveGroup, MoveStep
+from edit_mode.pdf_operations import to_ranges
+
+
+def order(pages):
+    return [page.source_page_index for page in pages]
+
+
+def test_move_group_is_undone_as_one(make_pdf):
+    document = Document(make_pdf("a.pdf", 6))
+    try:
+        pages = document.pages
+        page = pages[4]
+        moves = [MoveStep("Move Pages", 4, 1, 0), MoveStep("Move Pages", 5, 1, 1)]
+        for move in moves:
+            move.redo(pages)
+        assert order(pages) == [4, 5, 0, 1, 2, 3]
+
+        history = EditHistory(document)
+        history.push(MoveGroup("Move Pages", moves))
+        diff = history.undo()
+        assert order(pages) == [0, 1, 2, 3, 4, 5]
+        assert diff.removed == diff.inserted == [(0, 6)]
+        assert not history.can_undo()
+        history.redo()
+        assert order(pages) == [4, 5, 0, 1, 2, 3]
+        assert pages.index(page) == 0
+    finally:
+        document.close()
+
+
+def test_multi_row_drag_is_one_undo_step(app, make_pdf, tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_EDITOR_CACHE_DIR", str(tmp_path / "cache"))
+    from edit_mode.editor import PDFEditor
+
+    document = Document(make_pdf("a.pdf", 6))
+    editor = PDFEditor(document)
+    try:
+        # What QListView does on an internal drop of rows 3 and 5 before row 1
+        editor.page_model.moveRows(QModelIndex(), 3, 1, QModelIndex(), 1)
+        editor.page_model.moveRows(QModelIndex(), 5, 1, QModelIndex(), 2)
+        app.processEvents()
+        assert order(document.pages) == [0, 3, 5, 1, 2, 4]
+        assert editor.undo_action.text() == "Undo Move Pages"
+
+        editor.undo()
+        assert order(document.pages) == [0, 1, 2, 3, 4, 5]
+        assert not editor.history.can_undo()
+        editor.redo()
+        assert order(document.pages) == [0, 3, 5, 1, 2, 4]
+    finally:
+        editor.renderer.shutdown()
+        editor.deleteLater()
+        document.close()
+
+
+def test_slices_share_the_source_list():
+    table = PageTable()
+    for n in range(50):
+        table.insert_run(len(table), f"{n}.pdf", 0, 2)
+    segment = table[10:12]
+    assert segment._sources is table._sources
+    del table[10:12]
+    table[0:0] = segment
+    assert [page.source_document for page in table[:2]] == ["5.pdf", "5.pdf"]
+
+
+def test_to_ranges():
+    assert to_ranges([]) == []
+    assert to_ranges([0, 1, 2, 5, 7, 8]) == [(0, 3), (5, 6), (7, 9)]
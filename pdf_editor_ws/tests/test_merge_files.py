@@ -0,0 +1,70 @@
+# tests/test_merge_files.py
+import os
+
+import pytest
+
+import cli
+from conftest import assert_xref_complete, page_texts
+import edit_mode.pdf_operations as pdf_ops
+
+
+def texts(path):
+    return [text for text, _ in page_texts(path)]
+
+
+def test_pages_keep_the_input_order(make_pdf, tmp_path):
+    inputs = [make_pdf("c.pdf", 3, "C"), make_pdf("a.pdf", 1, "A"), make_pdf("b.pdf", 4, "B")]
+    with open(inputs[1], "rb") as f:
+        data = f.read()
+    out = str(tmp_path / "out.pdf")
+    # Batches of 2 pages cut across the inputs
+    assert pdf_ops.merge_files(inputs + [data], out, batch_size=2) == 9
+    assert texts(out) == ["C0", "C1", "C2", "A0", "B0", "B1", "B2", "B3", "A0"]
+    assert_xref_complete(out)
+
+
+def test_globs_expand_sorted(make_pdf, tmp_path):
+    (tmp_path / "in").mkdir()
+    for name in ("b10", "b2", "a", "b1"):
+        make_pdf(f"in/{name}.pdf", 1, name)
+    extra = make_pdf("extra.pdf", 1, "x")
+    pattern = str(tmp_path / "in" / "b*.pdf")
+    assert pdf_ops.expand_inputs([extra, pattern]) == [
+        extra, *(str(tmp_path / "in" / f"{name}.pdf") for name in ("b1", "b10", "b2"))]
+    out = str(tmp_path / "out.pdf")
+    pdf_ops.merge_files([pattern, extra], out)
+    assert texts(out) == ["b10", "b100", "b20", "x0"]
+
+
+def test_missing_inputs(make_pdf, tmp_path):
+    good = make_pdf("a.pdf", 2)
+    out = tmp_path / "out.pdf"
+    with pytest.raises(FileNotFoundError):
+        pdf_ops.expand_inputs([good, str(tmp_path / "none-*.pdf")])
+    with pytest.raises((OSError, RuntimeError)):
+        pdf_ops.merge_files([good, str(tmp_path / "missing.pdf")], str(out))
+    assert not out.exists()
+    assert cli.main(["merge", "-q", "-o", str(out), good, str(tmp_path / "missing.pdf")]) == 1
+    assert os.listdir(tmp_path) == ["a.pdf"]  # no output, no temporary file
+
+
+def test_output_is_replaced_only_when_complete(make_pdf, tmp_path, monkeypatch):
+    inputs = [make_pdf("a.pdf", 3, "A"), make_pdf("b.pdf", 3, "B")]
+    out = tmp_path / "out.pdf"
+    pdf_ops.merge_files(inputs[:1], str(out))
+    before = out.read_bytes()
+
+    flush = pdf_ops._Output.flush
+    flushes = []
+
+    def failing_flush(self):
+        flushes.append(self)
+        if len(flushes) == 2:
+            raise OSError("disk full")
+        flush(self)
+
+    monkeypatch.setattr(pdf_ops._Output, "flush", failing_flush)
+    with pytest.raises(OSError, match="disk full"):
+        pdf_ops.merge_files(inputs, str(out), batch_size=2)
+    assert out.read_bytes() == before
+    assert sorted(os.listdir(tmp_path)) == ["a.pdf", "b.pdf", "out.pdf"]
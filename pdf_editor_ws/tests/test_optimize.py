@@ -0,0 +1,59 @@
+# tests/test_optimize.py
+import fitz  # PyMuPDF
+
+from document_model import Document
+import edit_mode.pdf_operations as pdf_ops
+from conftest import assert_xref_complete, page_texts
+
+
+def write_letterhead_pdf(path, count, prefix):
+    """Pages that all show the same image, embedded once per file."""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), False)
+    pix.set_rect(pix.irect, (200, 30, 30))
+    image = pix.tobytes("png")
+    doc = fitz.open()
+    for i in range(count):
+        page = doc.new_page(width=200, height=300)
+        page.insert_image(fitz.Rect(10, 10, 74, 74), stream=image)
+        page.insert_text((20, 150), f"{prefix}{i}")
+    doc.save(str(path), garbage=3)
+    doc.close()
+    return str(path)
+
+
+def image_count(path):
+    doc = fitz.open(str(path))
+    try:
+        return sum(1 for xref in range(1, doc.xref_length())
+                   if doc.xref_get_key(xref, "Subtype")[1] == "/Image")
+    finally:
+        doc.close()
+
+
+def test_optimized_merge_stores_shared_images_once(tmp_path):
+    inputs = [write_letterhead_pdf(tmp_path / f"in{i}.pdf", 3, f"F{i}-") for i in range(5)]
+    plain, optimized = tmp_path / "plain.pdf", tmp_path / "optimized.pdf"
+
+    pdf_ops.merge_files(inputs, str(plain), batch_size=4)
+    pdf_ops.merge_files(inputs, str(optimized), batch_size=4, optimize=True)
+
+    assert image_count(plain) >= 5  # once per input and batch
+    assert image_count(optimized) == 1
+    assert page_texts(optimized) == page_texts(plain)
+    assert_xref_complete(plain)
+    assert_xref_complete(optimized)
+
+
+def test_optimized_save_reopens_without_repair(tmp_path):
+    source = write_letterhead_pdf(tmp_path / "in.pdf", 4, "P")
+    document = Document(source)
+    pdf_ops.merge_pdf(document, write_letterhead_pdf(tmp_path / "more.pdf", 4, "M"))
+    output = tmp_path / "out.pdf"
+
+    pdf_ops.write_pages(document, document.pages, str(output), batch_size=3, optimize=True)
+    document.close()
+
+    assert [text for text, _ in page_texts(output)] == [f"P{i}" for i in range(4)] + [
+        f"M{i}" for i in range(4)]
+    assert image_count(output) == 1
+    assert_xref_complete(output)
@@ -0,0 +1,26 @@
+# tests/test_page_list_model.py
+import pytest
+from PySide6.QtCore import QRect, Qt
+from PySide6.QtGui import QColor, QImage, QPainter, QStandardItem, QStandardItemModel
+from PySide6.QtWidgets import QStyleOptionViewItem
+
+from edit_mode.page_list_model import PageDelegate
+
+
+def test_paint_restores_the_painter_when_it_fails(app):
+    model = QStandardItemModel()
+    item = QStandardItem()
+    item.setData(7, Qt.DisplayRole)  # not text: drawing it fails
+    model.appendRow(item)
+    delegate = PageDelegate()
+    option = QStyleOptionViewItem()
+    option.rect = QRect(0, 0, 120, 170)
+    image = QImage(120, 170, QImage.Format_RGB32)
+    painter = QPainter(image)
+    try:
+        painter.setPen(QColor(1, 2, 3))
+        with pytest.raises(TypeError):
+            delegate.paint(painter, option, model.index(0, 0))
+        assert painter.pen().color() == QColor(1, 2, 3)
+    finally:
+        painter.end()
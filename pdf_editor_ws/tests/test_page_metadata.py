@@ -0,0 +1,108 @@
+# tests/test_page_metadata.py
+import pytest
+import fitz  # PyMuPDF
+
+from document_model import Document, DocumentPool
+
+
+def write_page_tree_pdf(path, object_streams=False):
+    """
+    Eight pages in two page tree nodes that hand down values:
+    node A sets /MediaBox [0 0 400 500] and /Rotate 90, node B an
+    indirect /Rotate 180. Pages override some of them, with direct and
+    indirect values, crop boxes and nested dictionaries.
+    """
+    doc = fitz.open()
+    for n in range(8):
+        doc.new_page(width=200 + 10 * n, height=300)
+    root = int(doc.xref_get_key(doc.pdf_catalog(), "Pages")[1].split()[0])
+    pages = [doc.page_xref(i) for i in range(8)]
+    for xref in pages:
+        doc.xref_set_key(xref, "Rotate", "null")
+    rotate_180 = doc.get_new_xref()
+    doc.update_object(rotate_180, "180")
+    media = doc.get_new_xref()
+    doc.update_object(media, "[0 0 612 792]")
+
+    node_a = doc.get_new_xref()
+    doc.update_object(node_a, f"<</Type/Pages/Parent {root} 0 R/Kids[{pages[0]} 0 R {pages[1]} 0 R "
+                              f"{pages[2]} 0 R {pages[3]} 0 R]/Count 4/MediaBox[0 0 400 500]/Rotate 90>>")
+    inner = doc.get_new_xref()  # under B, without values of its own
+    doc.update_object(inner, f"<</Type/Pages/Parent 0 0 R/Kids[{pages[6]} 0 R {pages[7]} 0 R]/Count 2>>")
+    node_b = doc.get_new_xref()
+    doc.update_object(node_b, f"<</Type/Pages/Parent {root} 0 R/Kids[{pages[4]} 0 R {pages[5]} 0 R "
+                              f"{inner} 0 R]/Count 4/Rotate {rotate_180} 0 R>>")
+    doc.xref_set_key(inner, "Parent", f"{node_b} 0 R")
+    doc.xref_set_key(root, "Kids", f"[{node_a} 0 R {node_b} 0 R]")
+    for xref in pages[:4]:
+        doc.xref_set_key(xref, "Parent", f"{node_a} 0 R")
+    for xref in pages[4:6]:
+        doc.xref_set_key(xref, "Parent", f"{node_b} 0 R")
+    for xref in pages[6:]:
+        doc.xref_set_key(xref, "Parent", f"{inner} 0 R")
+
+    doc.xref_set_key(pages[0], "MediaBox", "null")  # all from A
+    doc.xref_set_key(pages[1], "MediaBox", "null")
+    doc.xref_set_key(pages[1], "CropBox", "[50 60 350 400]")  # inside the inherited box
+    doc.xref_set_key(pages[2], "Rotate", "0")  # overrides A's 90
+    doc.xref_set_key(pages[3], "CropBox", "[-20 -20 100 5000]")  # clipped to the media box
+    doc.xref_set_key(pages[4], "MediaBox", f"{media} 0 R")  # indirect box
+    doc.xref_set_key(pages[5], "Rotate", "-90")
+    doc.xref_set_key(pages[6], "PieceInfo", "<</Editor<</Rotate 270/MediaBox[0 0 1 1]>>>>")
+    doc.xref_set_key(pages[7], "MediaBox", "[300 400 0 0]")  # corners swapped
+    if object_streams:
+        doc.save(str(path), use_objstms=1, garbage=1)
+    else:
+        doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.mark.parametrize("object_streams", [False, True])
+def test_matches_mupdf(tmp_path, object_streams):
+    path = write_page_tree_pdf(tmp_path / "tree.pdf", object_streams)
+    pool = DocumentPool()
+    metadata = pool.metadata(path)
+    doc = fitz.open(path)
+    try:
+        assert not doc.is_repaired
+        for index, page in enumerate(doc):
+            width, height = metadata.size(index)
+            assert metadata.rotation(index) == page.rotation, index
+            if page.rotation % 180:
+                width, height = height, width
+            assert (width, height) == pytest.approx((page.rect.width, page.rect.height)), index
+        assert metadata.reads == len(doc)
+    finally:
+        doc.close()
+        pool.close_all()
+
+
+def test_expected_values(tmp_path):
+    path = write_page_tree_pdf(tmp_path / "tree.pdf")
+    pool = DocumentPool()
+    metadata = pool.metadata(path)
+    try:
+        assert metadata.size(0) == (400, 500)
+        assert metadata.size(1) == (300, 340)
+        assert metadata.size(4) == (612, 792)
+        assert metadata.size(6) == (260, 300)
+        assert metadata.size(7) == (300, 400)
+        metadata.size(7)
+        assert metadata.reads == 5  # every page once, only when asked for
+        assert [metadata.rotation(i) for i in range(8)] == [90, 90, 0, 90, 180, 270, 180, 180]
+        assert metadata.reads == 8
+    finally:
+        pool.close_all()
+
+
+def test_document_page_size_turns_with_the_page(tmp_path):
+    document = Document(write_page_tree_pdf(tmp_path / "tree.pdf"))
+    try:
+        page = document.pages[2]  # 220 x 300, not rotated
+        assert document.page_size(page) == (220, 300)
+        page.rotation = 90
+        assert document.page_size(page) == (300, 220)
+        assert document.page_size(document.pages[0]) == (500, 400)  # /Rotate 90 inherited
+    finally:
+        document.close()
@@ -0,0 +1,136 @@
+# tests/test_page_table.py
+import pytest
+
+from document_model import Document, Page, PageTable
+
+
+def values(table):
+    return [(page.source_document, page.source_page_index, page.rotation) for page in table]
+
+
+def make_table(count=6, source="a.pdf"):
+    table = PageTable()
+    table.insert_run(0, source, 0, count)
+    return table
+
+
+def test_behaves_like_a_list_of_pages():
+    table = make_table(3)
+    table.append(Page("b.pdf", 7, 90))
+    table.insert(0, Page("c.pdf", 1))
+    assert len(table) == 5
+    assert values(table) == [("c.pdf", 1, 0), ("a.pdf", 0, 0), ("a.pdf", 1, 0),
+                             ("a.pdf", 2, 0), ("b.pdf", 7, 90)]
+    assert values(table[-2:]) == [("a.pdf", 2, 0), ("b.pdf", 7, 90)]
+    assert values(table[::2]) == [("c.pdf", 1, 0), ("a.pdf", 1, 0), ("b.pdf", 7, 90)]
+    del table[1:3]
+    assert [page.source_page_index for page in table] == [1, 2, 7]
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_views_follow_their_page_across_edits():
+    table = make_table(6)
+    page = table[3]
+    table.delete_rows([0, 1])
+    table.insert_run(0, "b.pdf", 0, 4)
+    table.duplicate_rows([5])
+    table.move_rows(4, 2, 0)
+    assert page.source_page_index == 3
+    assert table.index(page) == table.row_of(page)
+    page.rotation = 450
+    assert table[table.index(page)].rotation == 90
+
+
+def test_views_of_removed_pages_raise():
+    table = make_table(3)
+    page = table[1]
+    del table[1]
+    assert page not in table
+    with pytest.raises(LookupError):
+        page.source_page_index
+
+
+def test_slice_put_back_is_a_move_that_keeps_identities():
+    table = make_table(6)
+    moved = table[4]
+    segment = table[4:6]
+    del table[4:6]
+    table[0:0] = segment
+    assert [page.source_page_index for page in table] == [4, 5, 0, 1, 2, 3]
+    assert table.index(moved) == 0
+
+    reversed_pages = list(table)[::-1]
+    table[:] = reversed_pages
+    assert [page.source_page_index for page in table] == [3, 2, 1, 0, 5, 4]
+    assert table.index(moved) == 5
+
+
+def test_rows_still_in_the_table_come_back_as_copies():
+    table = make_table(3)
+    first = table[0]
+    table.extend(table[0:2])
+    assert [page.source_page_index for page in table] == [0, 1, 2, 0, 1]
+    assert table.index(first) == 0
+    assert len({table[row] for row in range(5)}) == 5  # every row its own page
+
+
+def test_overlays_are_sparse_and_follow_their_page():
+    table = make_table(4)
+    assert all(page.overlays == () for page in table)
+    assert table._overlays == {}  # reading allocates nothing
+    page = table[2]
+    page.overlays = ["signature"]
+    assert list(table._overlays.values()) == [["signature"]]
+    table.move_rows(2, 1, 0)
+    assert table[0].overlays == ["signature"]
+    copies = table.duplicate_rows([0])
+    assert table[copies[0]].overlays == ()
+    signed = table._uid[0]
+    del table[0]
+    assert signed not in table._overlays
+    with pytest.raises(LookupError):
+        page.overlays
+    table[1].overlays = []
+    assert table._overlays == {}
+
+
+def test_compares_and_adds_like_a_list():
+    table = make_table(3)
+    pages = [Page("a.pdf", 0), Page("a.pdf", 1), Page("a.pdf", 2)]
+    assert table == PageTable(pages) == pages
+    assert table == table.copy() and table[:2] != table
+    assert table != make_table(3, source="b.pdf")
+    rotated = table.copy()
+    rotated[0].rotation = 90
+    assert rotated != table
+    signed = table.copy()
+    signed[1].overlays = ["signature"]
+    assert signed != table
+    assert table != "not pages"
+    with pytest.raises(TypeError):
+        hash(table)
+
+    longer = table + [Page("b.pdf", 4)]
+    assert isinstance(longer, PageTable) and len(table) == 3
+    assert values(longer)[-1] == ("b.pdf", 4, 0)
+    assert values([Page("b.pdf", 4)] + table)[0] == ("b.pdf", 4, 0)
+    assert values(table + table) == values(table) * 2
+    table += [Page("c.pdf", 1)]
+    assert len(table) == 4
+
+
+def test_document_pages_setter_keeps_views_attached(make_pdf):
+    document = Document(make_pdf("a.pdf", 4))
+    try:
+        page = document.pages[1]
+        table = document.pages
+        document.pages = list(document.pages)[::-1]
+        assert document.pages is table
+        assert [p.source_page_index for p in document.pages] == [3, 2, 1, 0]
+        assert document.pages.index(page) == 2
+        document.pages = [Page(document.file_path, 0)]
+        with pytest.raises(LookupError):
+            page.rotation
+    finally:
+        document.close()
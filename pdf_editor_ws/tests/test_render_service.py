@@ -0,0 +1,70 @@
+# tests/test_render_service.py
+import logging
+import time
+
+import shiboken6
+
+import render_worker
+from document_model import DocumentPool, MemorySource
+from render_service import RenderService
+
+
+def process_events_until(app, done, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not done() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return done()
+
+
+def test_renders_arrive_on_the_gui_thread(app, make_pdf):
+    source = make_pdf("a.pdf", 2)
+    service = RenderService(workers=1)
+    rendered = []
+    service.rendered.connect(lambda key, image: rendered.append((key, image.width())))
+    try:
+        service.request((source, 1, 0, 0.5))
+        assert process_events_until(app, lambda: rendered)
+        assert rendered == [((source, 1, 0, 0.5), 100)]
+    finally:
+        service.shutdown()
+
+
+def test_results_after_shutdown_are_dropped(app, make_pdf, caplog):
+    source = make_pdf("a.pdf", 8)
+    service = RenderService(workers=1)
+    rendered = []
+    service.rendered.connect(lambda key, image: rendered.append(key))
+    for index in range(8):
+        service.request((source, index, 0, 1.0))
+    # Let the worker start rendering, then close the service and its window
+    futures = set(service._futures)
+    time.sleep(1.0)
+    service.shutdown()
+    shiboken6.delete(service)
+
+    with caplog.at_level(logging.ERROR, logger="concurrent.futures"):
+        assert process_events_until(app, lambda: all(f.done() for f in futures))
+        process_events_until(app, lambda: False, timeout=0.3)
+    assert rendered == []
+    assert "exception calling callback" not in caplog.text
+
+
+def test_memory_sources_render_through_the_given_pool(app, make_pdf):
+    with open(make_pdf("a.pdf", 2), "rb") as f:
+        source = MemorySource(f.read(), name="a.pdf")
+    pool = DocumentPool()
+    pool.get(source)
+    service = RenderService(workers=1, pool=pool)
+    rendered = []
+    service.rendered.connect(lambda key, image: rendered.append(key))
+    try:
+        service.request((source, 1, 0, 0.5))
+        assert process_events_until(app, lambda: rendered)
+        assert rendered == [(source, 1, 0, 0.5)]
+        # Opened once, by the document's pool; never by the worker's
+        assert pool.opens == 1
+        assert source not in render_worker._pool
+        assert service._executor is None
+    finally:
+        service.shutdown()
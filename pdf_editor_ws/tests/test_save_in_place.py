@@ -0,0 +1,158 @@
+# tests/test_save_in_place.py
+import re
+
+import pytest
+import fitz  # PyMuPDF
+
+from conftest import assert_xref_complete, page_texts, write_pdf, xref_entries
+from document_model import Document, Page
+import edit_mode.pdf_operations as pdf_ops
+
+
+def nest_page_tree(path, rotate):
+    """Split the flat page tree of path into two nodes; the second one sets /Rotate."""
+    doc = fitz.open(path)
+    root = int(doc.xref_get_key(doc.pdf_catalog(), "Pages")[1].split()[0])
+    pages = [doc.page_xref(i) for i in range(len(doc))]
+    half = len(pages) // 2
+    nodes = []
+    for group in (pages[:half], pages[half:]):
+        node = pdf_ops._new_node(doc, root, group, len(group))
+        for xref in group:
+            doc.xref_set_key(xref, "Parent", f"{node} 0 R")
+            doc.xref_set_key(xref, "Rotate", "null")
+        nodes.append(node)
+    doc.xref_set_key(nodes[1], "Rotate", str(rotate))
+    pdf_ops._set_kids(doc, root, nodes, len(pages))
+    doc.saveIncr()
+    doc.close()
+
+
+def bump_generation(path, xref, gen):
+    """Rewrite path so that object xref has generation gen."""
+    with open(path, "rb") as f:
+        data = f.read()
+    data = data.replace(b"\n%d 0 obj" % xref, b"\n%d %d obj" % (xref, gen))
+    data = data.replace(b" %d 0 R" % xref, b" %d %d R" % (xref, gen))
+    start = data.rindex(b"\nxref\n") + 6
+    table = data[start:data.index(b"trailer", start)].split(b"\n")
+    first = int(table[0].split()[0])
+    table[1 + xref - first] = table[1 + xref - first].replace(b" 00000 n", b" %05d n" % gen)
+    data = data[:start] + b"\n".join(table) + data[data.index(b"trailer", start):]
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def edited_file(kind, tmp_path):
+    path = write_pdf(tmp_path / f"{kind}.pdf", 6)
+    if kind == "nested":
+        nest_page_tree(path, 90)
+    elif kind == "xref-stream":
+        nest_page_tree(path, 90)
+        doc = fitz.open(path)
+        doc.save(str(tmp_path / "packed.pdf"), use_objstms=1, garbage=1)
+        doc.close()
+        path = str(tmp_path / "packed.pdf")
+    elif kind == "generation":
+        doc = fitz.open(path)
+        xref = doc.page_xref(2)
+        doc.close()
+        bump_generation(path, xref, 3)
+    return path
+
+
+@pytest.mark.parametrize("kind", ["flat", "nested", "xref-stream", "generation"])
+@pytest.mark.parametrize("order", [[0, 1, 2, 3, 4, 5], [5, 0, 1, 2, 4], [3, 2, 2, 4, 0]])
+def test_in_place_matches_a_full_rewrite(tmp_path, kind, order):
+    path = edited_file(kind, tmp_path)
+    before, _ = xref_entries(path)
+    document = Document(path)
+    try:
+        pages = [Page(path, index) for index in order]
+        pages[1].rotation = 90
+        expected = tmp_path / "expected.pdf"
+        pdf_ops.write_pages(document, pages, str(expected))
+        assert pdf_ops.can_save_in_place(document, pages, path)
+        size = len(open(path, "rb").read())
+        pdf_ops.write_pages(document, pages, path)
+    finally:
+        document.close()
+
+    with open(path, "rb") as f:
+        assert len(f.read()) > size  # appended to, not rewritten
+    assert page_texts(path) == page_texts(expected)
+    assert_xref_complete(path)
+    after, _ = xref_entries(path)
+    for number, (kind, _, generation) in before.items():
+        if kind == "n" and after[number][0] == "n":
+            assert after[number][2] == generation, number
+
+
+def test_inherited_rotation_is_kept(tmp_path):
+    path = edited_file("nested", tmp_path)
+    assert [rotation for _, rotation in page_texts(path)] == [0, 0, 0, 90, 90, 90]
+    document = Document(path)
+    try:
+        pages = list(document.pages)
+        pdf_ops.write_pages(document, [pages[4], pages[0], pages[3]], path)
+    finally:
+        document.close()
+    assert page_texts(path) == [("P4", 90), ("P0", 0), ("P3", 90)]
+
+
+def test_generation_numbers_are_kept(tmp_path):
+    path = edited_file("generation", tmp_path)
+    doc = fitz.open(path)
+    xref = doc.page_xref(2)
+    doc.close()
+    document = Document(path)
+    try:
+        pages = list(document.pages)
+        pages[2].rotation = 180
+        pdf_ops.write_pages(document, pages[::-1], path)
+    finally:
+        document.close()
+    entries, _ = xref_entries(path)
+    assert entries[xref] == ("n", entries[xref][1], 3)
+    with open(path, "rb") as f:
+        assert re.search(rb"Kids\[[^\]]*\b%d 3 R" % xref, f.read().rsplit(b"%%EOF", 2)[-2])
+    assert page_texts(path)[3] == ("P2", 180)
+
+
+def test_can_save_in_place(tmp_path, make_pdf):
+    path = make_pdf("a.pdf", 3)
+    other = make_pdf("b.pdf", 2)
+    document = Document(path)
+    try:
+        pages = list(document.pages)
+        assert pdf_ops.can_save_in_place(document, pages[::-1], path)
+        assert not pdf_ops.can_save_in_place(document, pages, str(tmp_path / "copy.pdf"))
+        assert not pdf_ops.can_save_in_place(document, [], path)
+        pdf_ops.merge_pdf(document, other)
+        assert not pdf_ops.can_save_in_place(document, list(document.pages), path)
+    finally:
+        document.close()
+    with open(path, "rb") as f:
+        data = f.read()
+    memory = Document(data)
+    try:
+        assert not pdf_ops.can_save_in_place(memory, list(memory.pages), path)
+    finally:
+        memory.close()
+
+
+def test_document_must_be_reloaded_after_writing_over_it(make_pdf):
+    path = make_pdf("a.pdf", 3)
+    document = Document(path)
+    try:
+        pages = list(document.pages)
+        pdf_ops.write_pages(document, pages[::-1], path)
+        assert pdf_ops.writes_over(document, path)
+        # Not reloaded: the document still shows the old version
+        assert [page.source_page_index for page in document.pages] == [0, 1, 2]
+        assert not pdf_ops.can_save_in_place(document, list(document.pages), path)
+        document.reload()
+        assert pdf_ops.can_save_in_place(document, list(document.pages), path)
+    finally:
+        document.close()
+    assert [text for text, _ in page_texts(path)] == ["P2", "P1", "P0"]
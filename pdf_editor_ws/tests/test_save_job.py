@@ -0,0 +1,37 @@
+# tests/test_save_job.py
+import os
+import subprocess
+import sys
+import time
+
+from conftest import page_texts
+from document_model import Document
+from edit_mode.save_job import SaveJob
+
+
+def test_writer_does_not_import_qt():
+    code = ("import sys; import edit_mode.save_writer; "
+            "sys.exit(any(name.startswith('PySide6') for name in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
+
+
+def test_job_writes_in_another_process(app, make_pdf, tmp_path):
+    document = Document(make_pdf("a.pdf", 4))
+    try:
+        pages = list(document.pages)[::-1]
+        pages[0].rotation = 90
+        output = str(tmp_path / "out.pdf")
+        job = SaveJob(document, pages, output)
+        results = []
+        job.finished.connect(results.append)
+        job.failed.connect(results.append)
+        job.start()
+        deadline = time.monotonic() + 60
+        while not results and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.02)
+    finally:
+        document.close()
+    assert results == [output]
+    assert page_texts(output) == [("P3", 90), ("P2", 0), ("P1", 0), ("P0", 0)]
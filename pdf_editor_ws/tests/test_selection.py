@@ -0,0 +1,81 @@
+# tests/test_selection.py
+import pytest
+
+from document_model import Document
+import edit_mode.pdf_operations as pdf_ops
+from edit_mode.selection import PageSelection, SelectionError, parse_selection
+
+
+@pytest.fixture
+def document(make_pdf):
+    """Pages 1-6 portrait, 7-8 landscape, 9-10 from scan.pdf; page 2 rotated."""
+    document = Document(make_pdf("main.pdf", 6))
+    pdf_ops.merge_pdf(document, make_pdf("wide.pdf", 2, "W", width=300, height=200))
+    pdf_ops.merge_pdf(document, make_pdf("scan.pdf", 2, "S"))
+    document.pages[1].rotation = 90
+    yield document
+    document.close()
+
+
+def pages(text, document):
+    """The 1-based page numbers text selects."""
+    return [row + 1 for row in parse_selection(text, len(document.pages), document)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1,3-5,8", [1, 3, 4, 5, 8]),
+    ("5-3", [3, 4, 5]),
+    ("1-10:3", [1, 4, 7, 10]),
+    ("2-:4", [2, 6, 10]),
+    ("last", [10]),
+    ("8-last", [8, 9, 10]),
+    ("9-", [9, 10]),
+    ("1-100", list(range(1, 11))),  # clamped to the document
+    ("all", list(range(1, 11))),
+    ("even", [2, 4, 6, 8, 10]),
+    ("odd", [1, 3, 5, 7, 9]),
+    ("!2-9", [1, 10]),
+    ("not odd", [2, 4, 6, 8, 10]),
+    ("1-6, !3, 9", [1, 2, 4, 5, 6, 9]),
+    ("odd & 1-5", [1, 3, 5]),
+    ("1-8 & !landscape", [1, 3, 4, 5, 6]),
+    ("landscape", [2, 7, 8]),  # page 2 is turned by 90 degrees
+    ("portrait", [1, 3, 4, 5, 6, 9, 10]),
+    ("rotated", [2]),
+    ("file:scan", [9, 10]),
+    ("file:SCAN.PDF", [9, 10]),
+    ("file:w*", [7, 8]),
+    ("LAST , Even & Landscape", [2, 8, 10]),
+])
+def test_expressions(document, text, expected):
+    assert pages(text, document) == expected
+
+
+@pytest.mark.parametrize("text", ["1-2-3", "abc", "1-5:x", "1-5:0", "-", "0", "0-3", "11", "12-20"])
+def test_invalid_or_out_of_range_pages(document, text):
+    with pytest.raises(SelectionError):
+        parse_selection(text, len(document.pages), document)
+
+
+def test_predicates_need_a_document():
+    with pytest.raises(SelectionError):
+        parse_selection("landscape", 4)
+    with pytest.raises(SelectionError):
+        parse_selection("file:a", 4)
+
+
+def test_empty_results(document):
+    assert pages("", document) == []
+    assert pages("file:nothing", document) == []
+    assert pages("!all", document) == []
+    assert pages("landscape & file:scan", document) == []
+    assert parse_selection("last", 0) == PageSelection()
+
+
+def test_selections_are_compressed_ranges():
+    selection = parse_selection("1-100000, !50", 100000)
+    assert selection.ranges == [(0, 49), (50, 100000)]
+    assert len(selection) == 99999 and 49 not in selection and 50 in selection
+    assert PageSelection.from_rows([5, 3, 4, 9]).ranges == [(3, 6), (9, 10)]
+    assert (PageSelection([(0, 10)]) - PageSelection([(2, 4), (6, 8)])).ranges == [(0, 2), (4, 6), (8, 10)]
+    assert PageSelection([(0, 5)]).invert(8).ranges == [(5, 8)]
@@ -0,0 +1,78 @@
+# tile_view.py
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QImage, QPainter, QColor
+from PySide6.QtCore import QSize
+from render_cache import RenderCache
+import instrumentation
+import fitz  # PyMuPDF
+
+TILE_SIZE = 512  # pixels
+# Memory budget for rendered tiles, in megabytes.
+TILE_CACHE_MB = 96
+
+
+class TiledPageView(QWidget):
+    """
+    Shows one page at a high zoom without rendering it as a whole.
+
+    The widget has the size of the full rendered page, but only the
+    tiles inside the exposed area are rendered (with a clip rectangle),
+    when they are first painted. Tiles are kept in an LRU cache, so
+    peak memory depends on the viewport and the cache budget, not on
+    the zoom or the page dimensions.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tile_cache = RenderCache(max_megabytes=TILE_CACHE_MB, name="tiles")
+        self._page = None
+        self._matrix = None
+        self._origin = (0, 0)
+        self._key = None
+
+    def set_page(self, page: fitz.Page, rotation, zoom, key):
+        """key identifies the rendered page, e.g. render_cache.page_key()."""
+        self._page = page
+        self._matrix = fitz.Matrix(zoom, zoom).prerotate(rotation)
+        bbox = (page.rect * self._matrix).irect
+        # Rotation can move the rendered page to negative coordinates
+        self._origin = (bbox.x0, bbox.y0)
+        self._key = key
+        self.setFixedSize(QSize(bbox.width, bbox.height))
+        self.update()
+
+    def clear(self):
+        self.tile_cache.clear()
+
+    def _render_tile(self, tx, ty):
+        ox, oy = self._origin
+        x0, y0 = tx * TILE_SIZE + ox, ty * TILE_SIZE + oy
+        device_rect = fitz.Rect(x0, y0, x0 + TILE_SIZE, y0 + TILE_SIZE)
+        clip = device_rect * ~self._matrix
+        with instrumentation.span("render.tile", tile=(tx, ty)):
+            pix = self._page.get_pixmap(matrix=self._matrix, clip=clip)
+
+        fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
+        image = QImage(pix.samples, pix.width, pix.height, pix.stride, fmt).copy()
+        return (pix.x - ox, pix.y - oy, image)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), QColor(255, 255, 255))
+        if self._page is None:
+            painter.end()
+            return
+
+        exposed = event.rect()
+        first_tx, last_tx = exposed.left() // TILE_SIZE, exposed.right() // TILE_SIZE
+        first_ty, last_ty = exposed.top() // TILE_SIZE, exposed.bottom() // TILE_SIZE
+
+        for ty in range(first_ty, last_ty + 1):
+            for tx in range(first_tx, last_tx + 1):
+                tile_key = self._key + (tx, ty)
+                tile = self.tile_cache.get(tile_key)
+                if tile is None:
+                    tile = self._render_tile(tx, ty)
+                    self.tile_cache.put(tile_key, tile, tile[2].sizeInBytes())
+                x, y, image = tile
+                painter.drawImage(x, y, image)
+        painter.end()
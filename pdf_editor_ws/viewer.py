@@ -6,8 +6,22 @@ from PySide6.QtWidgets import (
 from PySide6.QtGui import QAction, QImage, QPixmap
 from PySide6.QtCore import Qt
 from document_model import Document
+from render_cache import RenderCache, page_key
+from render_service import RenderService
+from tile_view import TiledPageView
+from stats_panel import create_stats_dock
+import instrumentation
 import fitz  # PyMuPDF
 
+# Memory budget for rendered pages kept by the viewer, in megabytes.
+VIEWER_CACHE_MB = 256
+# How many pages before and after the current one are rendered ahead.
+PREFETCH_DISTANCE = 1
+# From this zoom on, or when a whole page would need more pixels than
+# TILE_PIXEL_THRESHOLD, only the visible tiles of the page are rendered.
+TILE_ZOOM_THRESHOLD = 4.0
+TILE_PIXEL_THRESHOLD = 4096 * 4096
+
 class AboutDialog(QDialog):
     def __init__(self):
         super().__init__()
@@ -56,18 +70,31 @@ class PDFViewer(QMainWindow):
         # ---------- State ----------
         self.document = None
         self.zoom = 1.0
+        # Source of the page on screen, kept open in the pool while shown
+        self._shown_source = None
+
+        # Pages rendered at the current zoom; neighbours of the current
+        # page are rendered ahead of time on a worker process.
+        self.render_cache = RenderCache(max_megabytes=VIEWER_CACHE_MB, name="viewer")
+        self._cache_zoom = self.zoom
+        self.prefetcher = RenderService(workers=1, parent=self)
+        self.prefetcher.rendered.connect(self.on_page_prefetched)
 
         # ---------- Central Widget ----------
         self.label = QLabel()
         self.label.setAlignment(Qt.AlignCenter)
 
+        self.tile_view = TiledPageView()
+
         self.scroll = QScrollArea()
         self.scroll.setWidgetResizable(True)
+        self.scroll.setAlignment(Qt.AlignCenter)
         self.scroll.setWidget(self.label)
 
         self.setCentralWidget(self.scroll)
 
         # ---------- UI ----------
+        self.stats_dock = create_stats_dock(self)
         self._create_toolbar()
         self._create_menu()
 
@@ -126,6 +153,9 @@ class PDFViewer(QMainWindow):
         about_action.triggered.connect(self.show_about)
         file_menu.addAction(about_action)
 
+        view_menu = self.menuBar().addMenu("View")
+        view_menu.addAction(self.stats_dock.toggleViewAction())
+
     # ---------- PDF ----------
     def open_pdf(self):
         file_path, _ = QFileDialog.getOpenFileName(
@@ -133,24 +163,52 @@ class PDFViewer(QMainWindow):
         )
         if file_path:
             self.document = Document(file_path)
+            self._shown_source = None
             self.zoom = 1.0
+            self.prefetcher.cancel_pending()
+            self.render_cache.clear()
             self.render_page()
             self.setFocus()
 
     def render_page(self):
         if not self.document:
             return
+        with instrumentation.span("viewer.render_page", page=self.document.current_index):
+            self._render_page()
 
-        page_obj = self.document.pages[self.document.current_index]
-        page = self.document.doc[page_obj.source_page_index]
-
-        mat = fitz.Matrix(self.zoom, self.zoom).prerotate(page_obj.rotation)
-        pix = page.get_pixmap(matrix=mat)
+    def _render_page(self):
 
-        fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
-        img = QImage(pix.samples, pix.width, pix.height, pix.stride, fmt)
+        if self.zoom != self._cache_zoom:
+            # Pages rendered at another zoom are of no use any more
+            self.prefetcher.cancel_pending()
+            self.render_cache.clear()
+            self.tile_view.clear()
+            self._cache_zoom = self.zoom
 
-        self.label.setPixmap(QPixmap.fromImage(img))
+        page_obj = self.document.pages[self.document.current_index]
+        key = page_key(page_obj, self.zoom)
+        tiled = self._use_tiles(page_obj)
+
+        if tiled:
+            page = self._current_page()
+            self.tile_view.set_page(page, page_obj.rotation, self.zoom, key)
+            self._show_widget(self.tile_view)
+        else:
+            # A cached page is shown without loading the fitz page
+            pixmap = self.render_cache.get(key)
+            if pixmap is None:
+                page = self._current_page()
+                mat = fitz.Matrix(self.zoom, self.zoom).prerotate(page_obj.rotation)
+                with instrumentation.span("render.page", zoom=self.zoom):
+                    pix = page.get_pixmap(matrix=mat)
+
+                fmt = QImage.Format_RGBA8888 if pix.alpha else QImage.Format_RGB888
+                img = QImage(pix.samples, pix.width, pix.height, pix.stride, fmt)
+                pixmap = QPixmap.fromImage(img)
+                self._cache_pixmap(key, pixmap)
+
+            self.label.setPixmap(pixmap)
+            self._show_widget(self.label)
 
         self.page_input.setText(str(self.document.current_index + 1))
         self.zoom_input.setText(str(int(self.zoom * 100)))
@@ -159,6 +217,56 @@ class PDFViewer(QMainWindow):
             f"Page {self.document.current_index + 1}/{len(self.document.pages)} | "
             f"Zoom {int(self.zoom * 100)}%"
         )
+        # Whole-page renders at tiling zoom are exactly what tiling avoids
+        if not tiled:
+            self._prefetch_neighbours()
+
+    def _current_page(self) -> fitz.Page:
+        """
+        The fitz page shown now, read from the page's own source PDF
+        (merged pages come from other files than document.doc).
+        """
+        page_obj = self.document.pages[self.document.current_index]
+        source = page_obj.source_document or self.document.file_path
+        if source != self._shown_source:
+            # The tiled view renders from this page later on; keep its
+            # document from being closed by the pool's handle limit.
+            self.document.pool.pin(source)
+            if self._shown_source is not None:
+                self.document.pool.unpin(self._shown_source)
+            self._shown_source = source
+        return self.document.load_page(page_obj)
+
+    def _use_tiles(self, page_obj):
+        if self.zoom >= TILE_ZOOM_THRESHOLD:
+            return True
+        width, height = self.document.page_size(page_obj)
+        return width * height * self.zoom * self.zoom > TILE_PIXEL_THRESHOLD
+
+    def _show_widget(self, widget):
+        if self.scroll.widget() is not widget:
+            # takeWidget() keeps the current widget alive for later reuse
+            self.scroll.takeWidget()
+            self.scroll.setWidget(widget)
+
+    # ---------- Render cache ----------
+    def _cache_pixmap(self, key, pixmap):
+        self.render_cache.put(key, pixmap, pixmap.width() * pixmap.height() * pixmap.depth() // 8)
+
+    def _prefetch_neighbours(self):
+        self.prefetcher.cancel_pending()
+        index = self.document.current_index
+        for distance in range(1, PREFETCH_DISTANCE + 1):
+            for neighbour in (index + distance, index - distance):
+                if 0 <= neighbour < len(self.document.pages):
+                    key = page_key(self.document.pages[neighbour], self.zoom)
+                    if key not in self.render_cache:
+                        self.prefetcher.request(key)
+
+    def on_page_prefetched(self, key, image: QImage):
+        # Drop results that arrive after a zoom change
+        if key[3] == self.zoom:
+            self._cache_pixmap(key, QPixmap.fromImage(image))
 
     # ---------- Navigation ----------
     def next_page(self):
@@ -211,24 +319,25 @@ class PDFViewer(QMainWindow):
         if not self.document:
             return
 
-        page = self.document.doc[self.document.pages[self.document.current_index].source_page_index]
+        width, _ = self.document.page_size(self.document.pages[self.document.current_index])
         view_width = self.scroll.viewport().width()
-        self.zoom = view_width / page.rect.width
+        self.zoom = view_width / width
         self.render_page()
 
     def fit_height(self):
         if not self.document:
             return
 
-        page = self.document.doc[self.document.pages[self.document.current_index].source_page_index]
+        _, height = self.document.page_size(self.document.pages[self.document.current_index])
         view_height = self.scroll.viewport().height()
-        self.zoom = view_height / page.rect.height
+        self.zoom = view_height / height
         self.render_page()
 
     # ---------- Rotate ----------
     def rotate_page(self):
         if self.document:
             page = self.document.pages[self.document.current_index]
+            self.render_cache.discard(page_key(page, self.zoom))
             page.rotation = (page.rotation + 90) % 360
             self.render_page()
 
@@ -250,8 +359,22 @@ class PDFViewer(QMainWindow):
             return
         from edit_mode.editor import PDFEditor
         self.editor_window = PDFEditor(self.document)
+        self.editor_window.document_reloaded.connect(self.on_document_reloaded)
         self.editor_window.show()
 
+    def on_document_reloaded(self):
+        """The editor saved over the open file: renders of its old pages are stale."""
+        if self._shown_source == self.document.file_path:
+            self._shown_source = None  # the pool dropped its pins on reload
+        self.prefetcher.shutdown()
+        self.render_cache.clear()
+        self.tile_view.clear()
+        self.render_page()
+
+    def closeEvent(self, event):
+        self.prefetcher.shutdown()
+        super().closeEvent(event)
+
     def show_about(self):
         dlg = AboutDialog()
         dlg.exec()  # Modal dialog